@@ -0,0 +1,25 @@
+"""Added Studio.last_schedule_report attribute
+
+Revision ID: 3be540ad3a93
+Revises: bf67e6a234b4
+Create Date: 2026-10-18 10:12:41.372519
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '3be540ad3a93'
+down_revision = 'bf67e6a234b4'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.add_column(
+        'Studios',
+        sa.Column('last_schedule_report', sa.JSON(), nullable=True)
+    )
+
+
+def downgrade():
+    op.drop_column('Studios', 'last_schedule_report')
@@ -0,0 +1,36 @@
+"""Added Project statistics columns
+
+Revision ID: 5f1c2d7a9e3b
+Revises: bcde9b81e6d9
+Create Date: 2026-10-18 15:21:08.437190
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '5f1c2d7a9e3b'
+down_revision = 'bcde9b81e6d9'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    # the statistics are computed when they are first needed
+    op.add_column(
+        'Projects',
+        sa.Column('schedule_seconds', sa.Integer(), nullable=True)
+    )
+    op.add_column(
+        'Projects',
+        sa.Column('total_logged_seconds', sa.Integer(), nullable=True)
+    )
+    op.add_column(
+        'Projects',
+        sa.Column('task_status_counts', sa.JSON(), nullable=True)
+    )
+
+
+def downgrade():
+    op.drop_column('Projects', 'task_status_counts')
+    op.drop_column('Projects', 'total_logged_seconds')
+    op.drop_column('Projects', 'schedule_seconds')
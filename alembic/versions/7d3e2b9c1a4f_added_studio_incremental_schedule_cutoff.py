@@ -0,0 +1,29 @@
+"""Added Studio.incremental_schedule_cutoff attribute
+
+Revision ID: 7d3e2b9c1a4f
+Revises: 5f1c2d7a9e3b
+Create Date: 2026-10-19 06:12:27.538914
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '7d3e2b9c1a4f'
+down_revision = '5f1c2d7a9e3b'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    # left empty, so the next incremental schedule schedules all the projects
+    op.add_column(
+        'Studios',
+        sa.Column(
+            'incremental_schedule_cutoff', sa.DateTime(timezone=True),
+            nullable=True
+        )
+    )
+
+
+def downgrade():
+    op.drop_column('Studios', 'incremental_schedule_cutoff')
@@ -0,0 +1,44 @@
+"""Added Task.hierarchy_path attribute
+
+Revision ID: bcde9b81e6d9
+Revises: 3be540ad3a93
+Create Date: 2026-10-18 12:04:27.912536
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'bcde9b81e6d9'
+down_revision = '3be540ad3a93'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.add_column(
+        'Tasks',
+        sa.Column('hierarchy_path', sa.Text(), nullable=True)
+    )
+    op.create_index(
+        'ix_Tasks_hierarchy_path', 'Tasks', ['hierarchy_path'],
+        postgresql_ops={'hierarchy_path': 'text_pattern_ops'}
+    )
+
+    # fill the paths of the existing tasks
+    op.execute(
+        'with recursive paths (id, path) as ('
+        '    select id, cast(id as text) || \'/\' '
+        '    from "Tasks" where parent_id is null '
+        '  union all '
+        '    select "Tasks".id, '
+        '           paths.path || cast("Tasks".id as text) || \'/\' '
+        '    from "Tasks" join paths on "Tasks".parent_id = paths.id'
+        ') '
+        'update "Tasks" set hierarchy_path = paths.path '
+        'from paths where "Tasks".id = paths.id'
+    )
+
+
+def downgrade():
+    op.drop_index('ix_Tasks_hierarchy_path', table_name='Tasks')
+    op.drop_column('Tasks', 'hierarchy_path')
@@ -51,6 +51,7 @@ defaults = config.Config()
 
 from stalker.models.auth import (Group, Permission, User, LocalSession, Role,
                                  AuthenticationLog)
+from stalker.models.analysis import CriticalPathAnalysis
 from stalker.models.asset import Asset
 from stalker.models.budget import (Budget, BudgetEntry, Good, PriceList,
                                    Invoice, Payment)
@@ -71,7 +72,8 @@ from stalker.models.project import (Project, ProjectUser, ProjectClient,
 from stalker.models.review import Review, Daily, DailyLink
 from stalker.models.repository import Repository
 from stalker.models.scene import Scene
-from stalker.models.schedulers import SchedulerBase, TaskJugglerScheduler
+from stalker.models.schedulers import (SchedulerBase, TaskJugglerScheduler,
+                                      PythonScheduler, ScheduleJob)
 from stalker.models.sequence import Sequence
 from stalker.models.shot import Shot
 from stalker.models.status import Status, StatusList
@@ -507,6 +507,10 @@ taskreport breakdown "{{csv_file_name}}"{
 
         tj_command='tj3' if os.name == 'nt' else '/usr/local/bin/tj3',
 
+        # the maximum number of results kept in the TaskJugglerScheduler
+        # results cache
+        tj_results_cache_size=16,
+
         path_template='{{project.code}}/{%- for parent_task in parent_tasks -%}{{parent_task.nice_name}}/{%- endfor -%}',
         filename_template='{{task.entity_type}}_{{task.id}}_{{version.take_name}}_v{{"%03d"|format(version.version_number)}}',
 
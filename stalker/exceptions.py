@@ -80,3 +80,15 @@ class DependencyViolationError(Exception):
 
     def __str__(self):
         return self.value
+
+
+class ScheduleCancelledError(Exception):
+    """Raised when a running scheduling job is cancelled
+    """
+
+    def __init__(self, value=""):
+        super(ScheduleCancelledError, self).__init__(value)
+        self.value = value
+
+    def __str__(self):
+        return self.value
@@ -34,7 +34,7 @@ def make_plural(name):
     return plural_name
 
 
-def walk_hierarchy(entity, attr, method=0):
+def walk_hierarchy(entity, attr, method=0, prefetch=False):
     """Walks the entity hierarchy over the given attribute and yields the
     entity.
 
@@ -44,44 +44,346 @@ def walk_hierarchy(entity, attr, method=0):
     The default mode is Depth First Search (DFS), to walk with Breadth First
     Search (BFS) set the direction to 1.
 
+    .. versionadded:: 0.2.25
+       The ``prefetch`` argument
+
+       If ``prefetch`` is True the whole hierarchy is loaded with
+       :func:`.prefetch_hierarchy` before walking it, instead of lazy loading
+       the ``attr`` of each visited entity one by one.
+
     :param entity: Starting Entity
     :param attr: The attribute name to walk over
     :param method: 0:Depth first or 1:Breadth First
+    :param bool prefetch: Load the whole hierarchy with one query before
+      walking it.
     :return:
     """
-    entity_to_visit = [entity]
+    from collections import deque
+    if prefetch:
+        prefetch_hierarchy(entity, attr)
+
+    entity_to_visit = deque([entity])
     if not method:  # DFS
-        while len(entity_to_visit):
-            current_entity = entity_to_visit.pop(0)
-            for child in reversed(getattr(current_entity, attr)):
-                entity_to_visit.insert(0, child)
+        while entity_to_visit:
+            current_entity = entity_to_visit.pop()
+            entity_to_visit.extend(reversed(getattr(current_entity, attr)))
             yield current_entity
     else:  # BFS
-        while len(entity_to_visit):
-            current_entity = entity_to_visit.pop(0)
+        while entity_to_visit:
+            current_entity = entity_to_visit.popleft()
             entity_to_visit.extend(getattr(current_entity, attr))
             yield current_entity
 
 
+def prefetch_hierarchy(entity, attr, exclude_ids=None):
+    """Loads all the entities that are reachable from the given entity over
+    the given attribute with one recursive query and fills the ``attr``
+    values of them, so walking the hierarchy afterwards doesn't run a query
+    per entity.
+
+    The ``attr`` can be a relationship (like ``children`` or ``inputs``) or
+    an association proxy over an association object (like ``depends`` or
+    ``dependent_of``). The attributes that are already loaded are not
+    changed, so the pending changes in the session are respected. The
+    prefetched collections are ordered by the ids of their items.
+
+    It does nothing if the entity is not persisted yet.
+
+    :param entity: Starting Entity
+    :param attr: The attribute name to walk over
+    :param exclude_ids: The ids of the entities that are not walked over, the
+      ``attr`` values of them are not loaded. Use it to skip the parts of the
+      hierarchy that are already loaded.
+    :returns: The list of the loaded entities.
+    """
+    from sqlalchemy import inspect, select
+    from sqlalchemy.ext.associationproxy import AssociationProxy
+    from sqlalchemy.orm.attributes import set_committed_value
+
+    state = inspect(entity)
+    if not state.persistent:
+        return []
+
+    session = state.session
+    mapper = state.mapper
+    descriptor = mapper.all_orm_descriptors[attr]
+    value_attr = None
+    collection_attr = attr
+    if isinstance(descriptor, AssociationProxy):
+        collection_attr = descriptor.target_collection
+        value_attr = descriptor.value_attr
+    prop = mapper.get_property(collection_attr)
+
+    association_class = None
+    if prop.secondary is not None:
+        # many to many
+        edges_table = prop.secondary
+        edge_source = prop.synchronize_pairs[0][1]
+        target_key, edge_target = prop.secondary_synchronize_pairs[0]
+        target_class = prop.mapper.class_
+    elif value_attr is None:
+        # one to many
+        edge_source = prop.synchronize_pairs[0][1]
+        edges_table = edge_source.table
+        edge_target = target_key = list(edges_table.primary_key)[0]
+        target_class = prop.mapper.class_
+    else:
+        # one to many to an association object
+        association_class = prop.mapper.class_
+        value_prop = prop.mapper.get_property(value_attr)
+        edge_source = prop.synchronize_pairs[0][1]
+        edges_table = edge_source.table
+        target_key, edge_target = value_prop.synchronize_pairs[0]
+        target_class = value_prop.mapper.class_
+
+    edges = select([
+        edge_source.label('source_id'),
+        edge_target.label('target_id'),
+    ]).where(edge_source == entity.id).cte('edges', recursive=True)
+    edges_alias = edges_table.alias()
+    alias_source = edges_alias.corresponding_column(edge_source)
+    next_edges = select([
+        alias_source,
+        edges_alias.corresponding_column(edge_target),
+    ]).where(alias_source == edges.c.target_id)
+    if exclude_ids:
+        next_edges = next_edges.where(~alias_source.in_(list(exclude_ids)))
+    edges = edges.union(next_edges)
+
+    if association_class is None:
+        query = session.query(target_class, edges.c.source_id)
+    else:
+        query = session.query(target_class, edges.c.source_id,
+                              association_class)\
+            .filter(edge_source == edges.c.source_id)\
+            .filter(edge_target == edges.c.target_id)
+
+    values = {}
+    loaded = []
+    for row in query.filter(target_key == edges.c.target_id)\
+            .order_by(edges.c.source_id, edges.c.target_id):
+        target, source_id = row[0], row[1]
+        value = target
+        if association_class is not None:
+            value = row[2]
+            if value_attr not in value.__dict__:
+                set_committed_value(value, value_attr, target)
+        values.setdefault(source_id, []).append(value)
+        loaded.append(target)
+
+    exclude_ids = exclude_ids or ()
+    for node in [entity] + loaded:
+        if collection_attr not in node.__dict__ \
+           and hasattr(node.__class__, collection_attr) \
+           and node.id not in exclude_ids:
+            set_committed_value(
+                node, collection_attr, values.get(node.id, [])
+            )
+    return loaded
+
+
 def check_circular_dependency(entity, other_entity, attr_name):
     """Checks the circular dependency in entity if it has other_entity in its
     dependency attr which is specified with attr_name
     """
     for e in walk_hierarchy(entity, attr_name):
         if e is other_entity:
-            from stalker.exceptions import CircularDependencyError
-            raise CircularDependencyError(
-                '%(entity_name)s (%(entity_class)s) and '
-                '%(other_entity_name)s (%(other_entity_class)s) creates a '
-                'circular dependency in their "%(attr_name)s" attribute' %
-                {
-                    'entity_name': entity,
-                    'entity_class': entity.__class__.__name__,
-                    'other_entity_name': other_entity,
-                    'other_entity_class': other_entity.__class__.__name__,
-                    'attr_name': attr_name
-                }
+            raise_circular_dependency_error(entity, other_entity, attr_name)
+
+
+def check_circular_hierarchy(entity, other_entity):
+    """Checks if the other_entity is the entity itself or one of its children,
+    by walking up the parents of the other_entity.
+
+    It gives the same result with
+    ``check_circular_dependency(entity, other_entity, 'children')`` but it
+    only visits the parents of the other_entity instead of the whole
+    hierarchy under the entity.
+    """
+    current_entity = other_entity
+    while current_entity is not None:
+        if current_entity is entity:
+            raise_circular_dependency_error(entity, other_entity, 'children')
+        current_entity = current_entity.parent
+
+
+def raise_circular_dependency_error(entity, other_entity, attr_name):
+    """raises a CircularDependencyError for the given entities
+    """
+    from stalker.exceptions import CircularDependencyError
+    raise CircularDependencyError(
+        '%(entity_name)s (%(entity_class)s) and '
+        '%(other_entity_name)s (%(other_entity_class)s) creates a '
+        'circular dependency in their "%(attr_name)s" attribute' %
+        {
+            'entity_name': entity,
+            'entity_class': entity.__class__.__name__,
+            'other_entity_name': other_entity,
+            'other_entity_class': other_entity.__class__.__name__,
+            'attr_name': attr_name
+        }
+    )
+
+
+class TopologicalOrder(object):
+    """Maintains a topological order of the entities of a directed acyclic
+    graph, to check the cycles that a new edge would create without walking
+    the whole graph.
+
+    The graph is defined by the ``attr`` (the entities that an entity points
+    to, like ``depends``) and the ``reverse_attr`` (the entities pointing to
+    an entity, like ``dependent_of``) attributes. Every entity ``a`` pointing
+    to an entity ``b`` has a greater order value than ``b``. So an entity can
+    only be reached from the entities with greater order values and a search
+    only needs to visit the entities between the two ends of the new edge.
+    When a new edge doesn't fit in the current order only the entities in
+    that region are reordered (Pearce-Kelly dynamic topological sort).
+
+    The entities are added to the order when they are first seen, together
+    with all the entities that they point to. If the ``attr`` of the entity
+    is not loaded yet they are loaded with :func:`.prefetch_hierarchy`,
+    which doesn't walk over the entities that are already in the order.
+
+    :param str attr: The attribute name of the edges.
+    :param str reverse_attr: The attribute name of the reverse edges.
+    """
+
+    def __init__(self, attr, reverse_attr):
+        self.attr = attr
+        self.reverse_attr = reverse_attr
+        # keyed by the python id of the entities, the entities are stored to
+        # keep them alive
+        self.order = {}
+        self.entities = {}
+        # the database ids of the persistent entities in the order
+        self.ids = set()
+        self.next_order = 0
+
+    def __len__(self):
+        return len(self.order)
+
+    def __contains__(self, entity):
+        return id(entity) in self.order
+
+    def order_of(self, entity):
+        """returns the order value of the given entity, the entity is added to
+        the order if it is not added yet
+        """
+        try:
+            return self.order[id(entity)]
+        except KeyError:
+            self._add(entity)
+            return self.order[id(entity)]
+
+    def _add(self, entity):
+        """adds the given entity and all the entities that are reachable from
+        it and are not added yet to the order, they are placed after all the
+        entities in the order
+        """
+        from sqlalchemy import inspect
+        state = inspect(entity, raiseerr=False)
+        if state is not None and state.session is not None \
+           and not self._is_loaded(state):
+            with state.session.no_autoflush:
+                prefetch_hierarchy(entity, self.attr, exclude_ids=self.ids)
+
+        # iterative post order depth first search
+        visiting = set([id(entity)])
+        stack = [(entity, iter(getattr(entity, self.attr)))]
+        while stack:
+            current_entity, targets = stack[-1]
+            for target in targets:
+                if id(target) in self.order or id(target) in visiting:
+                    continue
+                visiting.add(id(target))
+                stack.append((target, iter(getattr(target, self.attr))))
+                break
+            else:
+                stack.pop()
+                self.order[id(current_entity)] = self.next_order
+                self.entities[id(current_entity)] = current_entity
+                self.next_order += 1
+                current_state = inspect(current_entity, raiseerr=False)
+                if current_state is not None \
+                   and current_state.identity is not None:
+                    self.ids.add(current_state.identity[0])
+
+    def _is_loaded(self, state):
+        """returns True if the ``attr`` of the entity with the given state is
+        already loaded
+        """
+        descriptor = state.mapper.all_orm_descriptors[self.attr]
+        collection_attr = getattr(descriptor, 'target_collection', self.attr)
+        return collection_attr not in state.unloaded
+
+    def _search(self, entity, attr, accept):
+        """returns the list of entities that are reachable from the given
+        entity over the given attribute, by only visiting the already ordered
+        entities that have an order value accepted by the given callable
+        """
+        visited = set([id(entity)])
+        found = [entity]
+        stack = [entity]
+        while stack:
+            current_entity = stack.pop()
+            for target in getattr(current_entity, attr):
+                target_id = id(target)
+                if target_id in visited or target_id not in self.order \
+                   or not accept(self.order[target_id]):
+                    continue
+                visited.add(target_id)
+                found.append(target)
+                stack.append(target)
+        return found
+
+    def is_reachable(self, entity, other_entity):
+        """returns True if the other_entity is the entity itself or it can be
+        reached from the entity
+        """
+        if entity is other_entity:
+            return True
+        lower_bound = self.order_of(other_entity)
+        if self.order_of(entity) < lower_bound:
+            return False
+        return any(
+            e is other_entity for e in self._search(
+                entity, self.attr, lambda x: x >= lower_bound
             )
+        )
+
+    def add_edge(self, entity, other_entity):
+        """updates the order for a new edge from the entity to the
+        other_entity. Returns False without changing anything if the edge
+        creates a cycle.
+        """
+        if entity is other_entity:
+            return False
+        lower_bound = self.order_of(entity)
+        upper_bound = self.order_of(other_entity)
+        if upper_bound < lower_bound:
+            # already in order
+            return True
+
+        forward = self._search(
+            other_entity, self.attr, lambda x: x >= lower_bound
+        )
+        if any(e is entity for e in forward):
+            return False
+        backward = self._search(
+            entity, self.reverse_attr, lambda x: x <= upper_bound
+        )
+
+        # place the entities reachable from the other_entity before the
+        # entities reaching to the entity, by reusing their order values
+        def sort_key(e):
+            return self.order[id(e)]
+
+        forward.sort(key=sort_key)
+        backward.sort(key=sort_key)
+        affected = forward + backward
+        for e, order in zip(affected, sorted(map(sort_key, affected))):
+            self.order[id(e)] = order
+        return True
 
 
 def utc_to_local(utc_dt):
@@ -0,0 +1,413 @@
+# -*- coding: utf-8 -*-
+# Stalker a Production Asset Management System
+# Copyright (C) 2009-2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stalker.
+#
+# Stalker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stalker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stalker.  If not, see <http://www.gnu.org/licenses/>
+
+import datetime
+from array import array
+
+import pytz
+
+from stalker.log import logging_level
+
+import logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging_level)
+
+
+class CriticalPathAnalysis(object):
+    """Computes the critical path and the slack of the tasks of a project.
+
+    The tasks and the :class:`.TaskDependency` instances of the project are
+    read with two bulk queries (no :class:`.Task` instance is loaded) and
+    converted to a compact array based network of the leaf tasks:
+
+      * The duration of each leaf task is its scheduled duration, which is
+        the time between the :attr:`.Task.start` and :attr:`.Task.end` values
+        (which are equal to the ``computed_start`` and ``computed_end`` values
+        of a scheduled task).
+      * The dependencies are stored as flat arrays of predecessor indices and
+        lags, the dependencies of the container tasks are inherited by their
+        leaf tasks and a dependency to a container task is a dependency to all
+        of its leaf tasks. A ``onend`` dependency means the successor can
+        start ``gap`` seconds after the predecessor ends and a ``onstart``
+        dependency means the successor can start ``gap`` seconds after the
+        predecessor starts. The ``gap_timing`` and ``gap_unit`` values are
+        converted to seconds with :meth:`.ScheduleMixin.to_seconds` by using
+        the ``gap_model`` of the dependency.
+
+    The earliest start/finish values are computed with a single forward pass
+    and the latest start/finish values with a single backward pass over the
+    topologically sorted network, so the analysis is linear in the number of
+    tasks and dependencies. All the values are in seconds relative to the
+    :attr:`.start` of the analysis, which is the earliest scheduled start
+    of the leaf tasks. The analysis doesn't take the resources and the
+    working hours in to account, so the result is the classical resource
+    unconstrained critical path of the scheduled durations.
+
+    Dependencies to the tasks of other projects are ignored.
+
+    Usage::
+
+      from stalker import CriticalPathAnalysis
+
+      analysis = CriticalPathAnalysis(project)
+      analysis.analyze()
+      for task_id in analysis.critical_path:
+          print(task_id, analysis.total_float[analysis.index[task_id]])
+
+    :param project: The :class:`.Project` instance to analyze.
+    """
+
+    def __init__(self, project=None):
+        self._project = None
+        self.project = project
+        self._reset()
+
+    def _reset(self):
+        """resets the arrays of the analysis
+        """
+        self.start = None
+        self.task_ids = array('l')
+        self.index = {}
+        self.durations = array('d')
+        self.pred_offsets = array('l', [0])
+        self.pred_indices = array('l')
+        self.lags = array('d')
+        self.order = array('l')
+        self.earliest_start = array('d')
+        self.earliest_finish = array('d')
+        self.latest_start = array('d')
+        self.latest_finish = array('d')
+        self.total_float = array('d')
+        self.project_duration = 0.0
+        self.critical_path = []
+
+    def _validate_project(self, project):
+        """validates the given project value
+        """
+        from stalker import Project
+        if not isinstance(project, Project):
+            raise TypeError(
+                '%s.project should be a stalker.models.project.Project '
+                'instance, not %s' % (
+                    self.__class__.__name__, project.__class__.__name__
+                )
+            )
+        return project
+
+    @property
+    def project(self):
+        """The :class:`.Project` instance to analyze
+        """
+        return self._project
+
+    @project.setter
+    def project(self, project):
+        self._project = self._validate_project(project)
+
+    @classmethod
+    def _to_utc(cls, dt):
+        """returns the given datetime instance in UTC
+        """
+        if dt.tzinfo is None:
+            return dt.replace(tzinfo=pytz.utc)
+        return dt.astimezone(pytz.utc)
+
+    def _collect_data(self):
+        """reads the tasks and dependencies of the project and returns the
+        leaf task dates, the children and the dependencies
+        """
+        from sqlalchemy import select
+        from stalker import Task, TaskDependency
+        from stalker.db.session import DBSession
+
+        # make sure the pending changes are visible to the queries below
+        DBSession.flush()
+        connection = DBSession.connection()
+        tasks_table = Task.__table__
+        deps_table = TaskDependency.__table__
+
+        dates = {}
+        parents = {}
+        children = {}
+        result = connection.execute(
+            select([
+                tasks_table.c.id,
+                tasks_table.c.parent_id,
+                tasks_table.c.start,
+                tasks_table.c.end,
+            ])
+            .where(tasks_table.c.project_id == self.project.id)
+            .order_by(tasks_table.c.id)
+        )
+        for task_id, parent_id, start, end in result:
+            dates[task_id] = (self._to_utc(start), self._to_utc(end))
+            parents[task_id] = parent_id
+            children.setdefault(parent_id, []).append(task_id)
+
+        dependencies = {}
+        result = connection.execute(
+            select([
+                deps_table.c.task_id,
+                deps_table.c.depends_to_id,
+                deps_table.c.dependency_target,
+                deps_table.c.gap_timing,
+                deps_table.c.gap_unit,
+                deps_table.c.gap_model,
+            ]).where(
+                deps_table.c.task_id.in_(
+                    select([tasks_table.c.id])
+                    .where(tasks_table.c.project_id == self.project.id)
+                )
+            ).order_by(deps_table.c.task_id, deps_table.c.depends_to_id)
+        )
+        for r in result:
+            if r[1] in dates:
+                dependencies.setdefault(r[0], []).append(r[1:])
+
+        return dates, parents, children, dependencies
+
+    def _build_network(self, dates, parents, children, dependencies):
+        """builds the compact array representation of the leaf task network
+        """
+        from stalker import Task
+
+        leaves_cache = {}
+
+        def leaves_of(task_id):
+            if task_id not in leaves_cache:
+                leaves = []
+                to_visit = [task_id]
+                while to_visit:
+                    current = to_visit.pop()
+                    if current in children:
+                        to_visit.extend(children[current])
+                    else:
+                        leaves.append(current)
+                leaves_cache[task_id] = sorted(leaves)
+            return leaves_cache[task_id]
+
+        leaf_ids = [task_id for task_id in sorted(dates)
+                    if task_id not in children]
+        if not leaf_ids:
+            return
+
+        self.start = min(dates[task_id][0] for task_id in leaf_ids)
+        for i, task_id in enumerate(leaf_ids):
+            start, end = dates[task_id]
+            self.task_ids.append(task_id)
+            self.index[task_id] = i
+            self.durations.append(
+                max((end - start).total_seconds(), 0.0)
+            )
+
+        for task_id in leaf_ids:
+            # collect the dependencies of the task and its parents, keeping
+            # the largest lag of each predecessor
+            lags = {}
+            ancestor_id = task_id
+            while ancestor_id is not None:
+                for depends_to_id, target, gap_timing, gap_unit, gap_model \
+                        in dependencies.get(ancestor_id, []):
+                    gap = 0
+                    if gap_timing and gap_unit:
+                        gap = Task.to_seconds(gap_timing, gap_unit, gap_model)
+                    for pred_id in leaves_of(depends_to_id):
+                        pred_index = self.index[pred_id]
+                        lag = gap
+                        if target != 'onstart':
+                            lag += self.durations[pred_index]
+                        if pred_index not in lags or \
+                           lag > lags[pred_index]:
+                            lags[pred_index] = lag
+                ancestor_id = parents[ancestor_id]
+
+            for pred_index in sorted(lags):
+                self.pred_indices.append(pred_index)
+                self.lags.append(lags[pred_index])
+            self.pred_offsets.append(len(self.pred_indices))
+
+    def _sort_network(self):
+        """sorts the leaf tasks topologically and fills the order array
+        """
+        from stalker.exceptions import CircularDependencyError
+        count = len(self.task_ids)
+        offsets = self.pred_offsets
+        pred_indices = self.pred_indices
+
+        in_degrees = array('l', [0]) * count
+        succ_offsets = array('l', [0]) * (count + 1)
+        for j in range(count):
+            in_degrees[j] = offsets[j + 1] - offsets[j]
+        for i in pred_indices:
+            succ_offsets[i + 1] += 1
+        for i in range(count):
+            succ_offsets[i + 1] += succ_offsets[i]
+        successors = array('l', [0]) * len(pred_indices)
+        cursors = array('l', succ_offsets)
+        for j in range(count):
+            for k in range(offsets[j], offsets[j + 1]):
+                i = pred_indices[k]
+                successors[cursors[i]] = j
+                cursors[i] += 1
+
+        order = array('l', [j for j in range(count) if not in_degrees[j]])
+        position = 0
+        while position < len(order):
+            i = order[position]
+            position += 1
+            for k in range(succ_offsets[i], succ_offsets[i + 1]):
+                j = successors[k]
+                in_degrees[j] -= 1
+                if not in_degrees[j]:
+                    order.append(j)
+
+        if len(order) != count:
+            task_ids = sorted(
+                self.task_ids[j] for j in range(count) if in_degrees[j]
+            )
+            raise CircularDependencyError(
+                'The dependencies of the tasks with the ids %s create a '
+                'circular dependency' % task_ids
+            )
+
+        self.order = order
+
+    def _compute(self):
+        """computes the earliest and latest start and finish values, the total
+        float and the critical path with a forward and a backward pass
+        """
+        count = len(self.task_ids)
+        offsets = self.pred_offsets
+        pred_indices = self.pred_indices
+        lags = self.lags
+        durations = self.durations
+
+        # forward pass
+        earliest_start = array('d', [0.0]) * count
+        for j in self.order:
+            for k in range(offsets[j], offsets[j + 1]):
+                value = earliest_start[pred_indices[k]] + lags[k]
+                if value > earliest_start[j]:
+                    earliest_start[j] = value
+        earliest_finish = array(
+            'd', [earliest_start[j] + durations[j] for j in range(count)]
+        )
+        self.project_duration = max(earliest_finish) if count else 0.0
+
+        # backward pass
+        latest_start = array(
+            'd', [self.project_duration - durations[j] for j in range(count)]
+        )
+        for j in reversed(self.order):
+            for k in range(offsets[j], offsets[j + 1]):
+                i = pred_indices[k]
+                value = latest_start[j] - lags[k]
+                if value < latest_start[i]:
+                    latest_start[i] = value
+        latest_finish = array(
+            'd', [latest_start[j] + durations[j] for j in range(count)]
+        )
+        total_float = array(
+            'd', [latest_start[j] - earliest_start[j] for j in range(count)]
+        )
+
+        self.earliest_start = earliest_start
+        self.earliest_finish = earliest_finish
+        self.latest_start = latest_start
+        self.latest_finish = latest_finish
+        self.total_float = total_float
+
+        # walk back from the task finishing last along the driving critical
+        # predecessors
+        critical_path = []
+        if count:
+            j = min(
+                (j for j in range(count)
+                 if earliest_finish[j] == self.project_duration),
+                key=lambda x: self.task_ids[x]
+            )
+            while j is not None:
+                critical_path.append(self.task_ids[j])
+                driving = None
+                for k in range(offsets[j], offsets[j + 1]):
+                    i = pred_indices[k]
+                    if not total_float[i] and \
+                       earliest_start[i] + lags[k] == earliest_start[j]:
+                        driving = i
+                        break
+                j = driving
+            critical_path.reverse()
+        self.critical_path = critical_path
+
+    def analyze(self):
+        """reads the project data from the database and computes the
+        analysis, returns the analysis itself
+        """
+        self._reset()
+        self._build_network(*self._collect_data())
+        self._sort_network()
+        self._compute()
+        logger.debug(
+            'analyzed %s tasks of %s, critical path: %s' % (
+                len(self.task_ids), self.project, self.critical_path
+            )
+        )
+        return self
+
+    @property
+    def critical_tasks(self):
+        """returns the ids of the leaf tasks with no total float, in the order
+        of their earliest start
+        """
+        return [
+            self.task_ids[j]
+            for j in sorted(
+                range(len(self.task_ids)),
+                key=lambda x: (self.earliest_start[x], self.task_ids[x])
+            )
+            if not self.total_float[j]
+        ]
+
+    def results(self):
+        """returns a dictionary of task ids and dictionaries with the
+        ``earliest_start``, ``earliest_finish``, ``latest_start`` and
+        ``latest_finish`` values as datetime instances, the ``total_float``
+        value as a :class:`datetime.timedelta` instance and the ``critical``
+        value as a bool
+        """
+        results = {}
+        for j, task_id in enumerate(self.task_ids):
+            results[task_id] = {
+                'earliest_start': self.start + datetime.timedelta(
+                    seconds=self.earliest_start[j]
+                ),
+                'earliest_finish': self.start + datetime.timedelta(
+                    seconds=self.earliest_finish[j]
+                ),
+                'latest_start': self.start + datetime.timedelta(
+                    seconds=self.latest_start[j]
+                ),
+                'latest_finish': self.start + datetime.timedelta(
+                    seconds=self.latest_finish[j]
+                ),
+                'total_float': datetime.timedelta(
+                    seconds=self.total_float[j]
+                ),
+                'critical': not self.total_float[j],
+            }
+        return results
@@ -271,9 +271,8 @@ class StatusMixin(object):
                 try:
                     # try to get a StatusList with the target_entity_type is
                     # matching the class name
-                    status_list = StatusList.query\
-                        .filter_by(target_entity_type=self.__class__.__name__)\
-                        .first()
+                    status_list = \
+                        StatusList.for_entity_type(self.__class__.__name__)
                 except (UnboundExecutionError, OperationalError):
                     # it is not mapped just skip it
                     pass
@@ -1432,8 +1431,8 @@ class DAGMixin(object):
                     }
                 )
 
-            from stalker.models import check_circular_dependency
-            check_circular_dependency(self, parent, 'children')
+            from stalker.models import check_circular_hierarchy
+            check_circular_hierarchy(self, parent)
 
         return parent
 
@@ -1486,13 +1485,16 @@ class DAGMixin(object):
         parents.reverse()
         return parents
 
-    def walk_hierarchy(self, method=0):
+    def walk_hierarchy(self, method=0, prefetch=False):
         """Walks the hierarchy of this task.
 
         :param method: The walk method, 0: Depth First, 1: Breadth First
+        :param bool prefetch: Load the whole hierarchy with one query before
+          walking it.
         """
         from stalker.models import walk_hierarchy
-        for c in walk_hierarchy(self, 'children', method=method):
+        for c in walk_hierarchy(self, 'children', method=method,
+                                prefetch=prefetch):
             yield c
 
 
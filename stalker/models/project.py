@@ -24,6 +24,7 @@ from sqlalchemy.ext.orderinglist import ordering_list
 from sqlalchemy.orm import relationship, validates
 
 from stalker.db.declarative import Base
+from stalker.db.types import GenericJSON
 from stalker.models.entity import Entity
 from stalker.models.mixins import (StatusMixin, DateRangeMixin, ReferenceMixin,
                                    CodeMixin)
@@ -148,6 +149,24 @@ class Project(Entity, ReferenceMixin, StatusMixin, DateRangeMixin, CodeMixin):
        by using the :attr:`.ProjectClient.role` attribute of the
        :class:`.ProjectClient` class.
 
+    **Statistics**
+
+    .. versionadded:: 0.2.25
+       Persistent project statistics
+
+       The total schedule and logged seconds of the project and the number of
+       tasks per status code are stored in the ``Projects`` table and are
+       updated incrementally whenever TimeLogs, the schedule values of leaf
+       tasks or the statuses of tasks are flushed to the database (the
+       statistics are cleared when tasks are created, deleted or moved).
+       So :attr:`.total_logged_seconds`, :attr:`.schedule_seconds`,
+       :attr:`.percent_complete` and :attr:`.statistics` are simple reads.
+       Reading them never writes to the database or flushes the session, so
+       they reflect the changes that are flushed to the database, and the
+       cleared statistics are computed on every read. Use
+       :meth:`.update_statistics` to flush the session and recompute and
+       store them from scratch.
+
     **Deleting a Project**
 
     Deleting a :class:`.Project` instance will cascade the delete operation to
@@ -304,6 +323,24 @@ class Project(Entity, ReferenceMixin, StatusMixin, DateRangeMixin, CodeMixin):
         cascade="all, delete-orphan"
     )
 
+    _schedule_seconds = Column(
+        "schedule_seconds",
+        Integer, nullable=True,
+        doc='cache column for schedule_seconds'
+    )
+
+    _total_logged_seconds = Column(
+        "total_logged_seconds",
+        Integer, nullable=True,
+        doc='cache column for total_logged_seconds'
+    )
+
+    _task_status_counts = Column(
+        "task_status_counts",
+        GenericJSON, nullable=True,
+        doc='cache column for the number of tasks per status code'
+    )
+
     def __init__(self,
                  name=None,
                  code=None,
@@ -481,19 +518,210 @@ class Project(Entity, ReferenceMixin, StatusMixin, DateRangeMixin, CodeMixin):
         """
         return self.active
 
-    @property
-    def total_logged_seconds(self):
-        """returns an integer representing the total TimeLog seconds recorded
-        in child tasks.
+    def update_schedule_info(self):
+        """updates the total_logged_seconds and schedule_seconds attributes of
+        all the tasks of this project at once, with one aggregate query and a
+        single bottom-up pass over the task hierarchy.
+
+        The pending changes are flushed first. Returns a tuple of the total
+        schedule_seconds and total_logged_seconds values of this project, or
+        None if this project is not persisted yet.
+        """
+        from sqlalchemy import inspect
+        state = inspect(self)
+        if not state.persistent:
+            return None
+
+        from stalker import Task
+        state.session.flush()
+        root_values = Task._update_schedule_info_in_bulk(self.id)
+        schedule_seconds = 0
+        total_logged_seconds = 0
+        for task_schedule_seconds, task_logged_seconds \
+                in root_values.values():
+            schedule_seconds += task_schedule_seconds
+            total_logged_seconds += task_logged_seconds
+        return schedule_seconds, total_logged_seconds
+
+    @classmethod
+    def _update_statistics_in_bulk(cls, project_id):
+        """recomputes and stores the statistics of the project with the given
+        id, by using one aggregate query for the schedule info of the tasks
+        and one for the task statuses
+
+        :param int project_id: The id of the project.
+        :returns: A tuple of schedule_seconds, total_logged_seconds and the
+          dictionary of task counts per status code.
         """
+        from stalker import Task
+        schedule_seconds, total_logged_seconds, status_counts = \
+            cls._compute_statistics(
+                project_id,
+                Task._update_schedule_info_in_bulk(project_id).values()
+            )
+        cls._store_statistics(
+            project_id, schedule_seconds, total_logged_seconds, status_counts
+        )
+        return schedule_seconds, total_logged_seconds, status_counts
+
+    @classmethod
+    def _compute_statistics(cls, project_id, root_values=None):
+        """computes the statistics of the project with the given id from the
+        database without changing anything
+
+        :param int project_id: The id of the project.
+        :param root_values: The (schedule_seconds, total_logged_seconds)
+          values of the root tasks of the project, if skipped they are
+          computed with :meth:`.Task._compute_schedule_info_in_bulk`.
+        :returns: A tuple of schedule_seconds, total_logged_seconds and the
+          dictionary of task counts per status code.
+        """
+        from sqlalchemy import func, select
+        from stalker import Status, Task
+        from stalker.db.session import DBSession
+
+        if root_values is None:
+            root_values = [
+                values for _, parent_id, _, _, values
+                in Task._compute_schedule_info_in_bulk(project_id)
+                if parent_id is None
+            ]
+
+        schedule_seconds = 0
         total_logged_seconds = 0
+        for task_schedule_seconds, task_logged_seconds in root_values:
+            schedule_seconds += task_schedule_seconds
+            total_logged_seconds += task_logged_seconds
+
+        connection = DBSession.connection()
+        tasks_table = Task.__table__
+        statuses_table = Status.__table__
+        status_counts = dict(
+            (code, count) for code, count in connection.execute(
+                select([statuses_table.c.code, func.count(tasks_table.c.id)])
+                .select_from(
+                    tasks_table.join(
+                        statuses_table,
+                        tasks_table.c.status_id == statuses_table.c.id
+                    )
+                )
+                .where(tasks_table.c.project_id == project_id)
+                .group_by(statuses_table.c.code)
+            )
+        )
+        return schedule_seconds, total_logged_seconds, status_counts
+
+    @classmethod
+    def _store_statistics(cls, project_id, schedule_seconds,
+                          total_logged_seconds, status_counts):
+        """writes the given statistics values to the database and to the
+        project instance if it is loaded
+        """
+        from sqlalchemy.orm.attributes import set_committed_value
+        from sqlalchemy.orm.util import identity_key
+        from stalker.db.session import DBSession
+
+        projects_table = cls.__table__
+        DBSession.connection().execute(
+            projects_table.update()
+            .where(projects_table.c.id == project_id)
+            .values(
+                schedule_seconds=schedule_seconds,
+                total_logged_seconds=total_logged_seconds,
+                task_status_counts=status_counts
+            )
+        )
+
+        project = DBSession.identity_map.get(identity_key(cls, project_id))
+        if project is not None:
+            set_committed_value(project, '_schedule_seconds', schedule_seconds)
+            set_committed_value(
+                project, '_total_logged_seconds', total_logged_seconds
+            )
+            set_committed_value(project, '_task_status_counts', status_counts)
+
+    def update_statistics(self):
+        """recomputes the statistics of this project from scratch and stores
+        them, the pending changes are flushed first. Returns the
+        :attr:`.statistics` of this project.
+        """
+        from sqlalchemy import inspect
+        state = inspect(self)
+        if state.persistent:
+            state.session.flush()
+            self._update_statistics_in_bulk(self.id)
+        return self.statistics
+
+    def _schedule_info(self):
+        """returns the schedule_seconds, total_logged_seconds and task status
+        counts of this project from the stored statistics, the statistics
+        are computed from the database without storing them if they are not
+        stored yet. For a project which is not persisted yet the values of
+        the root tasks are summed up.
+
+        Nothing is written and the session is not flushed, so the changes
+        that are not flushed yet are not included, use
+        :meth:`.update_statistics` to flush and store them.
+        """
+        from sqlalchemy import inspect
+        state = inspect(self)
+        if state.persistent:
+            if self._schedule_seconds is None \
+               or self._total_logged_seconds is None \
+               or self._task_status_counts is None:
+                return self._compute_statistics(self.id)
+            return self._schedule_seconds, self._total_logged_seconds, \
+                self._task_status_counts
+
+        schedule_seconds = 0
+        total_logged_seconds = 0
+        status_counts = {}
         for task in self.root_tasks:
-            if task.total_logged_seconds is None:
+            if task.total_logged_seconds is None or \
+               task.schedule_seconds is None:
                 task.update_schedule_info()
+            schedule_seconds += task.schedule_seconds
             total_logged_seconds += task.total_logged_seconds
+            for child in task.walk_hierarchy():
+                if child.status:
+                    status_counts[child.status.code] = \
+                        status_counts.get(child.status.code, 0) + 1
+        return schedule_seconds, total_logged_seconds, status_counts
 
-        logger.debug('project.total_logged_seconds: %s' % total_logged_seconds)
+    @property
+    def statistics(self):
+        """returns a dictionary with the ``schedule_seconds``,
+        ``total_logged_seconds``, ``percent_complete`` and
+        ``task_status_counts`` (a dictionary of status codes and number of
+        tasks) values of this project.
+        """
+        schedule_seconds, total_logged_seconds, status_counts = \
+            self._schedule_info()
+        return {
+            'schedule_seconds': schedule_seconds,
+            'total_logged_seconds': total_logged_seconds,
+            'percent_complete': self._percent_complete(
+                schedule_seconds, total_logged_seconds
+            ),
+            'task_status_counts': dict(status_counts),
+        }
+
+    @classmethod
+    def _percent_complete(cls, schedule_seconds, total_logged_seconds):
+        """returns the percent complete value from the given values
+        """
+        if schedule_seconds > 0:
+            return total_logged_seconds / schedule_seconds * 100
+        else:
+            return 0
 
+    @property
+    def total_logged_seconds(self):
+        """returns an integer representing the total TimeLog seconds recorded
+        in child tasks.
+        """
+        total_logged_seconds = self._schedule_info()[1]
+        logger.debug('project.total_logged_seconds: %s' % total_logged_seconds)
         return total_logged_seconds
 
     @property
@@ -501,14 +729,8 @@ class Project(Entity, ReferenceMixin, StatusMixin, DateRangeMixin, CodeMixin):
         """returns an integer showing the total amount of schedule timing of
         the in child tasks in seconds
         """
-        schedule_seconds = 0
-        for task in self.root_tasks:
-            if task.schedule_seconds is None:
-                task.update_schedule_info()
-            schedule_seconds += task.schedule_seconds
-
+        schedule_seconds = self._schedule_info()[0]
         logger.debug('project.schedule_seconds: %s' % schedule_seconds)
-
         return schedule_seconds
 
     @property
@@ -516,12 +738,9 @@ class Project(Entity, ReferenceMixin, StatusMixin, DateRangeMixin, CodeMixin):
         """returns the percent_complete based on the total_logged_seconds and
         schedule_seconds of the root tasks.
         """
-        total_logged_seconds = self.total_logged_seconds
-        schedule_seconds = self.schedule_seconds
-        if schedule_seconds > 0:
-            return total_logged_seconds / schedule_seconds * 100
-        else:
-            return 0
+        schedule_seconds, total_logged_seconds, status_counts = \
+            self._schedule_info()
+        return self._percent_complete(schedule_seconds, total_logged_seconds)
 
     @property
     def open_tickets(self):
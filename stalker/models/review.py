@@ -281,29 +281,37 @@ class Review(SimpleEntity, ScheduleMixin, StatusMixin):
                 self.task.schedule_timing = timing
                 self.task.schedule_unit = unit
 
-            # update task parent statuses
-            self.task.update_parent_statuses()
-
-            from stalker import TaskDependency
-            # update dependent task statuses
-
-            for dep in walk_hierarchy(self.task, 'dependent_of', method=1):
-                logger.debug('current TaskDependency object: %s' % dep)
-                dep.update_status_with_dependent_statuses()
+            # update the statuses of the task, its dependent tasks and their
+            # parents, once per task
+            deps = []
+            with self.task.batch_status_updates():
+                # update task parent statuses
+                self.task.update_parent_statuses()
+
+                # update dependent task statuses
+                dep_ids = set()
+                with DBSession.no_autoflush:
+                    for dep in walk_hierarchy(self.task, 'dependent_of',
+                                              method=1, prefetch=True):
+                        if id(dep) in dep_ids:
+                            continue
+                        dep_ids.add(id(dep))
+                        deps.append(dep)
+                        logger.debug('current dependent task: %s' % dep)
+                        dep.update_status_with_dependent_statuses()
+
+                        # also update the status of parents of dependencies
+                        dep.update_parent_statuses()
+
+            for dep in deps:
                 if dep.status.code in ['HREV', 'PREV', 'DREV', 'OH', 'STOP']:
                     # for tasks that are still be able to continue to work,
                     # change the dependency_target to "onstart" to allow
                     # the two of the tasks to work together and still let the
                     # TJ to be able to schedule the tasks correctly
-                    with DBSession.no_autoflush:
-                        tdeps = TaskDependency.query\
-                            .filter_by(depends_to=dep).all()
-                    for tdep in tdeps:
+                    for tdep in dep.task_dependent_of:
                         tdep.dependency_target = 'onstart'
 
-                # also update the status of parents of dependencies
-                dep.update_parent_statuses()
-
         else:
             logger.debug('not all reviews are finalized yet!')
 
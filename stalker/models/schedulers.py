@@ -19,9 +19,12 @@
 import os
 import subprocess
 import tempfile
+import threading
 import datetime
 import time
 import csv
+import hashlib
+from collections import OrderedDict
 
 import pytz
 
@@ -36,12 +39,150 @@ class SchedulerBase(object):
     """This is the base class for schedulers.
 
     All the schedulers should be derived from this class.
+
+    :param studio: The :class:`.Studio` instance that the scheduler is going
+      to use.
+    :param projects: A list of :class:`.Project` instances to schedule. If
+      skipped all the projects in the database will be scheduled.
+    :param bool incremental: When set to True only the projects that are
+      changed since the :attr:`.Studio.incremental_schedule_cutoff` and the
+      projects that are sharing resources or dependencies with them are
+      scheduled. A project is considered as changed if the project itself,
+      one of its tasks (including its resources and dependencies) or one of
+      the time logs of its tasks is created, updated or deleted since the
+      last successful schedule. A created, updated or deleted
+      :class:`.Vacation` or :class:`.User`, a created or updated
+      :class:`.WorkingHours`, a change in the dates or working hours of the
+      :class:`.Studio` or a studio without a
+      :attr:`.Studio.incremental_schedule_cutoff` value causes all the
+      projects to be scheduled. The changes are tracked through the
+      ``date_updated`` values which are updated when the changes are done
+      through the ORM, changes done with raw SQL require a full schedule.
+      The default is False.
+
+    The ``job`` attribute holds the :class:`.ScheduleJob` that the scheduler
+    is running for, if it is started with :meth:`.Studio.schedule_async`, and
+    None otherwise. The schedulers report their progress to it and stop at
+    the beginning of the next stage when the job is cancelled.
+
+    The ``report`` attribute holds a JSON serializable dictionary with the
+    timings and counts of the last call to :meth:`.schedule`, it is None
+    before the first schedule. It is also stored in
+    :attr:`.Studio.last_schedule_report` by :meth:`.Studio.schedule`. It has
+    the following keys:
+
+      * ``scheduler``: The class name of the scheduler.
+      * ``started_at``: The start date of the scheduling in ISO 8601 format.
+      * ``total``: The total wall time in seconds.
+      * ``stages``: A dictionary of stage names and their wall time in
+        seconds. :class:`.TaskJugglerScheduler` has ``export``, ``tj3``,
+        ``parse`` and ``write`` stages and :class:`.PythonScheduler` has
+        ``export``, ``solve`` and ``write`` stages.
+      * ``projects``: The number of scheduled projects.
+      * ``exported_rows``: The number of exported tasks.
+      * ``rows_updated``: A dictionary with ``tasks``, ``projects``,
+        ``computed_resources_inserted`` and ``computed_resources_deleted``
+        keys showing the number of database rows changed by the scheduler.
+
+    :class:`.TaskJugglerScheduler` also adds ``tjp_bytes`` (the total size
+    of the tjp files), ``tj3_runs`` (the number of tj3 processes run) and
+    ``tj3_peak_memory_kb`` (the maximum resident memory of the tj3 processes
+    in kilobytes, None if it is not available on the current platform) keys.
     """
 
-    def __init__(self, studio=None):
+    # the names of the arguments of __init__ that are copied by _settings()
+    __settings__ = ['incremental']
+
+    def __init__(self, studio=None, projects=None, incremental=False):
         self._studio = None
         self.studio = studio
 
+        self._projects = []
+        self.projects = projects
+
+        self.incremental = incremental
+        self.job = None
+
+        self.report = None
+        self._simulation_results = None
+        self._report_lock = threading.Lock()
+        self._report_start = None
+        self._stage = None
+        self._stage_start = None
+
+    def _start_report(self):
+        """starts a new report
+        """
+        self.report = {
+            'scheduler': self.__class__.__name__,
+            'started_at': datetime.datetime.now(pytz.utc).isoformat(),
+            'total': 0,
+            'stages': {},
+            'projects': 0,
+            'exported_rows': 0,
+            'rows_updated': {
+                'tasks': 0,
+                'projects': 0,
+                'computed_resources_inserted': 0,
+                'computed_resources_deleted': 0,
+            },
+        }
+        self._stage = None
+        self._stage_start = time.time()
+        self._report_start = self._stage_start
+
+    def _end_stage(self):
+        """adds the wall time of the current stage to the report
+        """
+        now = time.time()
+        if self.report is not None and self._stage is not None:
+            stages = self.report['stages']
+            stages[self._stage] = \
+                stages.get(self._stage, 0) + now - self._stage_start
+            logger.debug(
+                '%s stage took: %s seconds' %
+                (self._stage, now - self._stage_start)
+            )
+        self._stage = None
+        self._stage_start = now
+
+    def _finish_report(self):
+        """ends the current stage and sets the total time of the report
+        """
+        self._end_stage()
+        if self.report is not None:
+            self.report['total'] = time.time() - self._report_start
+            logger.debug('schedule report: %s' % self.report)
+
+    def _add_to_report(self, key, value, sub_key=None):
+        """adds the given value to the given key of the report
+
+        :param str key: The key in the report.
+        :param value: The value to add.
+        :param str sub_key: If given the value is added to the given key of
+          the dictionary under ``key``.
+        """
+        if self.report is None:
+            return
+        with self._report_lock:
+            data = self.report
+            if sub_key is not None:
+                data = data[key]
+                key = sub_key
+            data[key] = (data.get(key) or 0) + value
+
+    def _set_stage(self, stage):
+        """reports the given stage to the current job and the report, raises
+        a :class:`.ScheduleCancelledError` if the job is cancelled
+
+        :param str stage: The name of the stage that is about to start.
+        """
+        logger.debug('scheduling stage: %s' % stage)
+        if self.job is not None:
+            self.job._set_stage(stage)
+        self._end_stage()
+        self._stage = stage
+
     def _validate_studio(self, studio_in):
         """validates the given studio_in value
         """
@@ -73,6 +214,647 @@ class SchedulerBase(object):
         """
         raise NotImplementedError
 
+    def simulate(self, scenario=None):
+        """Runs the scheduler without writing anything to the database and
+        returns the results.
+
+        It can be used to compare what-if scenarios. The given ``scenario``
+        is called before scheduling and can freely change the data in the
+        current session (add resources to tasks, change the schedule timing
+        of a task or the end of the studio etc.). The changes are flushed in
+        to a savepoint, which is rolled back after the scheduling, so neither
+        the scenario changes nor the scheduling results are written to the
+        database::
+
+          >>> def add_artist():
+          ...     task.resources.append(new_artist)
+          >>> results = scheduler.simulate(add_artist)
+          >>> start, end, resource_ids = results[task.id]
+
+        As :data:`.DBSession` is thread local, several scenarios can be
+        simulated concurrently by running each of them in a separate thread
+        with its own scheduler instance.
+
+        :param scenario: A callable without any arguments, which is called
+          before scheduling. Can be skipped.
+        :returns: A dictionary with the task and project ids as keys and a
+          tuple of (computed_start, computed_end, resource_ids) as values. The
+          ``resource_ids`` is a list of user ids for tasks if
+          ``compute_resources`` is True, and None otherwise and for projects.
+        """
+        from stalker.db.session import DBSession
+
+        if scenario is not None and not callable(scenario):
+            raise TypeError(
+                '%s.simulate() scenario should be a callable, not %s' %
+                (self.__class__.__name__, scenario.__class__.__name__)
+            )
+
+        savepoint = DBSession.begin_nested()
+        self._simulation_results = {}
+        try:
+            if scenario is not None:
+                scenario()
+            DBSession.flush()
+            self.schedule()
+            return self._simulation_results
+        finally:
+            self._simulation_results = None
+            savepoint.rollback()
+
+    def _validate_projects(self, projects):
+        """validates the given projects value
+        """
+        if projects is None:
+            projects = []
+
+        msg = '%(class)s.projects should be a list of ' \
+            'stalker.models.project.Project instances, not ' \
+            '%(projects_class)s'
+
+        if not isinstance(projects, list):
+            raise TypeError(
+                msg % {
+                    'class': self.__class__.__name__,
+                    'projects_class': projects.__class__.__name__
+                }
+            )
+
+        from stalker import Project
+        for item in projects:
+            if not isinstance(item, Project):
+                raise TypeError(
+                    msg % {
+                        'class': self.__class__.__name__,
+                        'projects_class': item.__class__.__name__
+                    }
+                )
+
+        return projects
+
+    @property
+    def projects(self):
+        """getter for the _project attribute
+        """
+        return self._projects
+
+    @projects.setter
+    def projects(self, projects):
+        """setter for the _project attribute
+        """
+        self._projects = self._validate_projects(projects)
+
+    def _settings(self):
+        """returns a dictionary of the settings of this scheduler, which can
+        be passed to the __init__ of the scheduler class to create a copy of
+        it without the studio and the projects
+        """
+        return dict((key, getattr(self, key)) for key in self.__settings__)
+
+    def _project_ids(self):
+        """returns the ids of the projects that are going to be scheduled, if
+        there are no projects specified it will return the ids of all the
+        projects in the database.
+        """
+        if self.projects:
+            project_ids = [project.id for project in self.projects]
+        else:
+            from stalker import Project
+            from stalker.db.session import DBSession
+            project_ids = [
+                r[0] for r in DBSession.connection().execute(
+                    Project.__table__.select()
+                    .with_only_columns([Project.__table__.c.id])
+                ).fetchall()
+            ]
+
+        if self.incremental and self.studio \
+           and self.studio.incremental_schedule_cutoff:
+            changed_project_ids = self._changed_project_ids(
+                self.studio.incremental_schedule_cutoff
+            )
+            if changed_project_ids is not None:
+                project_ids = [
+                    project_id for project_id in project_ids
+                    if project_id in changed_project_ids
+                ]
+
+        return project_ids
+
+    @classmethod
+    def _changed_project_ids(cls, since):
+        """returns the ids of the projects that are changed after the given
+        date and the projects that are sharing resources or dependencies with
+        them. Returns None if all of the projects should be scheduled.
+
+        :param since: A datetime.datetime instance
+        """
+        from sqlalchemy import select, or_, union
+        from stalker import (SimpleEntity, Project, Studio, Task, TimeLog,
+                             User, Vacation, WorkingHours)
+        from stalker.db.session import DBSession
+
+        connection = DBSession.connection()
+        simple_entities = SimpleEntity.__table__
+        tasks = Task.__table__
+        time_logs = TimeLog.__table__
+
+        def is_changed(id_column):
+            return id_column.in_(
+                select([simple_entities.c.id]).where(
+                    or_(
+                        simple_entities.c.date_created > since,
+                        simple_entities.c.date_updated > since
+                    )
+                )
+            )
+
+        # the studio, working hours, users and vacations affect every project
+        for table in [Studio.__table__, WorkingHours.__table__,
+                      User.__table__, Vacation.__table__]:
+            changed_row = connection.execute(
+                select([table.c.id]).where(is_changed(table.c.id)).limit(1)
+            ).fetchone()
+            if changed_row:
+                return None
+
+        changed_projects_query = union(
+            select([Project.__table__.c.id])
+            .where(is_changed(Project.__table__.c.id)),
+            select([tasks.c.project_id]).where(is_changed(tasks.c.id)),
+            select([tasks.c.project_id]).select_from(
+                tasks.join(time_logs, time_logs.c.task_id == tasks.c.id)
+            ).where(is_changed(time_logs.c.id))
+        )
+        project_ids = set(
+            r[0] for r in connection.execute(changed_projects_query)
+        )
+
+        if not project_ids:
+            return project_ids
+
+        # extend it with the projects sharing resources or dependencies
+        all_project_ids = [
+            r[0] for r in connection.execute(
+                select([Project.__table__.c.id])
+            )
+        ]
+        related_project_ids = set()
+        for group in cls._project_groups(all_project_ids):
+            if project_ids.intersection(group):
+                related_project_ids.update(group)
+
+        return related_project_ids
+
+    @classmethod
+    def _project_groups(cls, project_ids):
+        """Partitions the given projects in to independent groups. The
+        projects in different groups do not share any resources (including
+        the alternative resources and the resources of the time logs) and do
+        not have any dependencies between their tasks, so each group can be
+        scheduled separately.
+
+        Returns a list of sorted project id lists ordered by their first
+        project id.
+
+        :param list project_ids: A list of project ids
+        """
+        from sqlalchemy import select, union
+        from stalker import Task, TaskDependency, TimeLog
+        from stalker.db.session import DBSession
+        from stalker.models.task import (Task_Resources,
+                                         Task_Alternative_Resources)
+
+        project_ids = list(project_ids)
+        if not project_ids:
+            return []
+
+        connection = DBSession.connection()
+        tasks = Task.__table__
+        time_logs = TimeLog.__table__
+        dependencies = TaskDependency.__table__
+        dependent_tasks = tasks.alias('dependent_tasks')
+
+        # a simple union find
+        parents = dict((project_id, project_id) for project_id in project_ids)
+
+        def find(node):
+            root = node
+            while parents[root] != root:
+                root = parents[root]
+            # compress the path
+            while parents[node] != root:
+                parents[node], node = root, parents[node]
+            return root
+
+        def merge(node1, node2):
+            root1 = find(node1)
+            root2 = find(node2)
+            if root1 != root2:
+                parents[root2] = root1
+
+        # projects sharing resources
+        resource_pairs_query = union(*[
+            select([tasks.c.project_id, table.c.resource_id]).select_from(
+                tasks.join(table, table.c.task_id == tasks.c.id)
+            ).where(tasks.c.project_id.in_(project_ids))
+            for table in [Task_Resources, Task_Alternative_Resources,
+                          time_logs]
+        ])
+        for project_id, resource_id in \
+                connection.execute(resource_pairs_query):
+            resource_node = ('resource', resource_id)
+            if resource_node not in parents:
+                parents[resource_node] = resource_node
+            merge(project_id, resource_node)
+
+        # projects having dependencies between their tasks
+        dependency_pairs_query = select([
+            dependent_tasks.c.project_id, tasks.c.project_id
+        ]).select_from(
+            dependencies.join(
+                dependent_tasks,
+                dependencies.c.task_id == dependent_tasks.c.id
+            ).join(tasks, dependencies.c.depends_to_id == tasks.c.id)
+        ).where(dependent_tasks.c.project_id != tasks.c.project_id)\
+            .where(dependent_tasks.c.project_id.in_(project_ids))\
+            .where(tasks.c.project_id.in_(project_ids))\
+            .distinct()
+        for project_id1, project_id2 in \
+                connection.execute(dependency_pairs_query):
+            merge(project_id1, project_id2)
+
+        groups = {}
+        for project_id in project_ids:
+            groups.setdefault(find(project_id), []).append(project_id)
+
+        return sorted(sorted(group) for group in groups.values())
+
+    def _update_db(self, task_data, project_data):
+        """updates the Tasks, Projects and Task_Computed_Resources tables with
+        the given computed data.
+
+        With PostgreSQL the data is first loaded in to a temporary table with
+        multi row inserts and then each table is updated with a single
+        ``UPDATE ... FROM`` statement. For the other databases an
+        ``executemany`` update is used.
+
+        :param dict task_data: A dictionary with task ids as keys and a tuple
+          of (computed_start, computed_end, resource_ids) as values. Setting
+          the resource_ids to None will leave the computed resources of that
+          task untouched.
+        :param dict project_data: A dictionary with project ids as keys and a
+          tuple of (computed_start, computed_end) as values.
+        """
+        from sqlalchemy import bindparam
+        from stalker import Task, Project
+        from stalker.db.session import DBSession
+
+        self._set_stage('write')
+        if self._simulation_results is not None:
+            # simulating, do not touch the database
+            self._simulation_results.update(task_data)
+            self._simulation_results.update(
+                (project_id, (start, end, None))
+                for project_id, (start, end) in project_data.items()
+            )
+            return
+
+        connection = DBSession.connection()
+
+        computed_resources = dict(
+            (task_id, resource_ids)
+            for task_id, (_, _, resource_ids) in task_data.items()
+            if resource_ids is not None
+        )
+
+        project_data = dict(
+            (project_id, (start, end, None))
+            for project_id, (start, end) in project_data.items()
+        )
+
+        for key, table, data in [('tasks', Task.__table__, task_data),
+                                 ('projects', Project.__table__,
+                                  project_data)]:
+            if not data:
+                continue
+            if connection.engine.dialect.name == 'postgresql':
+                row_count = self._update_db_with_temp_table(
+                    connection, table, data
+                )
+            else:
+                update_statement = table.update()\
+                    .where(table.c.id == bindparam('b_id'))\
+                    .values(
+                        start=bindparam('start'),
+                        end=bindparam('end'),
+                        computed_start=bindparam('start'),
+                        computed_end=bindparam('end')
+                    )
+                row_count = connection.execute(
+                    update_statement,
+                    [{'b_id': entity_id, 'start': start, 'end': end}
+                     for entity_id, (start, end, _) in data.items()]
+                ).rowcount
+            self._add_to_report('rows_updated', row_count, key)
+
+        deleted, inserted = \
+            self._update_computed_resources(connection, computed_resources)
+        self._add_to_report(
+            'rows_updated', deleted, 'computed_resources_deleted'
+        )
+        self._add_to_report(
+            'rows_updated', inserted, 'computed_resources_inserted'
+        )
+
+    @classmethod
+    def _update_computed_resources(cls, connection, computed_resources,
+                                   chunk_size=500):
+        """Updates the Task_Computed_Resources table by only deleting and
+        inserting the rows that are actually changed. Rows of tasks that are
+        not in the given data are not touched.
+
+        :param connection: The connection to use.
+        :param dict computed_resources: A dictionary with task ids as keys
+          and a list of resource ids as values.
+        :param int chunk_size: The maximum number of task ids used in one
+          ``IN`` clause.
+        :returns: A tuple of the number of deleted and inserted rows.
+        """
+        if not computed_resources:
+            return 0, 0
+
+        from sqlalchemy import bindparam, select, and_
+        from stalker.models.task import Task_Computed_Resources
+
+        table = Task_Computed_Resources
+        task_ids = sorted(computed_resources)
+
+        current_rows = set()
+        for i in range(0, len(task_ids), chunk_size):
+            result = connection.execute(
+                select([table.c.task_id, table.c.resource_id]).where(
+                    table.c.task_id.in_(task_ids[i:i + chunk_size])
+                )
+            )
+            current_rows.update(tuple(row) for row in result)
+
+        new_rows = set(
+            (task_id, resource_id)
+            for task_id, resource_ids in computed_resources.items()
+            for resource_id in resource_ids
+        )
+
+        rows_to_delete = current_rows - new_rows
+        rows_to_insert = new_rows - current_rows
+
+        if rows_to_delete:
+            connection.execute(
+                table.delete().where(
+                    and_(
+                        table.c.task_id == bindparam('b_task_id'),
+                        table.c.resource_id == bindparam('b_resource_id')
+                    )
+                ),
+                [{'b_task_id': task_id, 'b_resource_id': resource_id}
+                 for task_id, resource_id in sorted(rows_to_delete)]
+            )
+
+        if rows_to_insert:
+            connection.execute(
+                table.insert(),
+                [{'task_id': task_id, 'resource_id': resource_id}
+                 for task_id, resource_id in sorted(rows_to_insert)]
+            )
+
+        return len(rows_to_delete), len(rows_to_insert)
+
+    @classmethod
+    def _update_db_with_temp_table(cls, connection, table, data,
+                                   chunk_size=1000):
+        """Updates the start, end, computed_start and computed_end columns of
+        the given table by loading the data in to a temporary table and
+        running one ``UPDATE ... FROM`` statement. Only works with PostgreSQL.
+
+        :param connection: The connection to use.
+        :param table: The table to update, either ``Tasks`` or ``Projects``.
+        :param dict data: A dictionary with ids as keys and a tuple of
+          (start, end, ...) as values.
+        :param int chunk_size: The number of rows inserted with one multi row
+          insert statement.
+        :returns: The number of updated rows.
+        """
+        if not data:
+            return 0
+
+        from sqlalchemy import MetaData, Table, Column, Integer
+        from stalker.db.types import GenericDateTime
+
+        temp_table = Table(
+            'Temp_Schedule_Results', MetaData(),
+            Column('id', Integer, primary_key=True),
+            Column('start', GenericDateTime),
+            Column('end', GenericDateTime),
+            prefixes=['TEMPORARY'],
+            postgresql_on_commit='DROP'
+        )
+        temp_table.create(connection)
+
+        rows = [
+            {'id': entity_id, 'start': values[0], 'end': values[1]}
+            for entity_id, values in data.items()
+        ]
+        for i in range(0, len(rows), chunk_size):
+            connection.execute(
+                temp_table.insert().values(rows[i:i + chunk_size])
+            )
+
+        result = connection.execute(
+            table.update()
+            .where(table.c.id == temp_table.c.id)
+            .values(
+                start=temp_table.c.start,
+                end=temp_table.c.end,
+                computed_start=temp_table.c.start,
+                computed_end=temp_table.c.end
+            )
+        )
+        temp_table.drop(connection)
+        return result.rowcount
+
+
+class ScheduleJob(object):
+    """A handle to a scheduling running in a background thread.
+
+    It is returned by :meth:`.Studio.schedule_async` and let the caller follow
+    the progress of the scheduling, read the stderr output of tj3 while it is
+    running, cancel the scheduling and get the final result::
+
+      >>> job = studio.schedule_async(scheduled_by=user)
+      >>> job.stage
+      'tj3'
+      >>> job.stderr_lines
+      ['Reading file /tmp/...tjp', ...]
+      >>> job.result(timeout=60)
+      'Scheduled 120 tasks in 2 projects'
+
+    The :attr:`.stage` attribute is ``'pending'`` until the scheduler starts,
+    then it is the name of the current stage of the scheduler (
+    :class:`.TaskJugglerScheduler` has ``'export'``, ``'tj3'``, ``'parse'``
+    and ``'write'`` stages and :class:`.PythonScheduler` has ``'export'``,
+    ``'solve'`` and ``'write'`` stages), and finally it is one of ``'done'``,
+    ``'failed'`` or ``'cancelled'``.
+
+    The handle is not bound to any event loop. To use it with asyncio wait
+    for the result in an executor::
+
+      >>> result = await loop.run_in_executor(None, job.result)
+    """
+
+    def __init__(self):
+        self.stage = 'pending'
+        self.stderr_lines = []
+        self._cancelled = False
+        self._result = None
+        self._exception = None
+        self._processes = []
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+        self._thread = None
+
+    def start(self, target):
+        """starts running the given callable in a daemon thread. The return
+        value of the callable is the result of the job.
+
+        :param target: A callable without any arguments.
+        """
+        if self._thread is not None:
+            raise RuntimeError('%s is already started' %
+                               self.__class__.__name__)
+        self._thread = threading.Thread(target=self._run, args=(target,))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self, target):
+        """runs the target and stores its result or exception
+        """
+        from stalker.exceptions import ScheduleCancelledError
+        try:
+            result = target()
+        except ScheduleCancelledError as e:
+            self._exception = e
+            self.stage = 'cancelled'
+        except Exception as e:
+            logger.debug('scheduling failed: %s' % e)
+            self._exception = e
+            self.stage = 'cancelled' if self._cancelled else 'failed'
+        else:
+            self._result = result
+            self.stage = 'done'
+
+        with self._lock:
+            self._finished.set()
+            callbacks = list(self._callbacks)
+
+        for callback in callbacks:
+            callback(self)
+
+    def _set_stage(self, stage):
+        """sets the current stage, raises a ScheduleCancelledError if the job
+        is cancelled
+        """
+        if self._cancelled:
+            from stalker.exceptions import ScheduleCancelledError
+            raise ScheduleCancelledError(
+                'Scheduling is cancelled before the %s stage' % stage
+            )
+        self.stage = stage
+
+    def _add_process(self, process):
+        """registers a tj3 process to be terminated when the job is cancelled
+        """
+        with self._lock:
+            self._processes.append(process)
+            if self._cancelled:
+                self._terminate(process)
+
+    @classmethod
+    def _terminate(cls, process):
+        """terminates the given process if it is still running
+        """
+        if process.poll() is None:
+            try:
+                process.terminate()
+            except OSError:
+                # already finished
+                pass
+
+    def cancel(self):
+        """cancels the job. Running tj3 processes are terminated and the
+        scheduler stops at the beginning of its next stage without writing
+        anything to the database.
+
+        :returns: False if the job is already finished, True otherwise.
+        """
+        with self._lock:
+            if self._finished.is_set():
+                return False
+            self._cancelled = True
+            for process in self._processes:
+                self._terminate(process)
+        return True
+
+    @property
+    def cancelled(self):
+        """returns True if the job is cancelled
+        """
+        return self.stage == 'cancelled'
+
+    def done(self):
+        """returns True if the job is finished, either successfully, with an
+        error or by cancellation
+        """
+        return self._finished.is_set()
+
+    def wait(self, timeout=None):
+        """waits the job to finish
+
+        :param timeout: The maximum time to wait in seconds, None means wait
+          forever.
+        :returns: True if the job is finished, False otherwise.
+        """
+        self._finished.wait(timeout)
+        return self._finished.is_set()
+
+    def result(self, timeout=None):
+        """waits the job to finish and returns the result of the scheduling,
+        raises the exception of the scheduler if the scheduling failed or a
+        :class:`.ScheduleCancelledError` if it is cancelled.
+
+        :param timeout: The maximum time to wait in seconds, None means wait
+          forever. A RuntimeError is raised if the job doesn't finish in time.
+        """
+        if not self.wait(timeout):
+            raise RuntimeError(
+                '%s did not finish in %s seconds' %
+                (self.__class__.__name__, timeout)
+            )
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def add_done_callback(self, callback):
+        """adds a callable to be called with the job as its only argument
+        when the job is finished. If the job is already finished the
+        callback is called immediately.
+        """
+        with self._lock:
+            if not self._finished.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
 
 class TaskJugglerScheduler(SchedulerBase):
     """This is the main scheduler for Stalker right now.
@@ -168,16 +950,48 @@ class TaskJugglerScheduler(SchedulerBase):
       is False.
     :param int parsing_method: Choose between SQL (0) or Pure Python (1)
       parsing. The default is SQL.
+    :param bool incremental: When set to True only the projects that are
+      changed since the last schedule and the projects sharing resources or
+      dependencies with them will be exported to TaskJuggler. See
+      :class:`.SchedulerBase` for details. The default is False.
+    :param bool parallel: When set to True the projects are partitioned in to
+      independent groups, where the projects in different groups do not share
+      any resources and do not have any dependencies between their tasks, and
+      each group is scheduled with a separate tj3 process running
+      concurrently. The results of all the groups are written to the
+      database at once. As tj3 is single threaded, this allows using all the
+      CPU cores of the machine. The default is False.
+    :param bool use_cache: When set to True the parsed results of each tj3
+      run are kept in an in-memory cache keyed by the SHA-1 digest of the
+      generated tjp content. If a later schedule generates exactly the same
+      tjp content, tj3 is not run again and the cached results are written
+      to the database directly. As the tjp content contains all the
+      scheduling inputs (including the :attr:`.Studio.now` value rounded to
+      the timing resolution) any change affecting the scheduling will cause
+      a new tj3 run. The cache is shared between all the TaskJugglerScheduler
+      instances in the same process and holds at most
+      ``defaults.tj_results_cache_size`` results. The default is False.
     """
 
+    __settings__ = ['compute_resources', 'parsing_method', 'incremental',
+                    'parallel', 'use_cache']
+
+    _results_cache = OrderedDict()
+    _results_cache_lock = threading.Lock()
+
     def __init__(self,
                  studio=None,
                  compute_resources=False,
                  parsing_method=0,
-                 projects=None):
-        super(TaskJugglerScheduler, self).__init__(studio)
-
-        self.tjp_content = ''
+                 projects=None,
+                 incremental=False,
+                 parallel=False,
+                 use_cache=False):
+        super(TaskJugglerScheduler, self).__init__(
+            studio, projects, incremental
+        )
+        self.parallel = parallel
+        self.use_cache = use_cache
 
         self.temp_file_full_path = None
         self.temp_file_path = None
@@ -185,6 +999,8 @@ class TaskJugglerScheduler(SchedulerBase):
 
         self.tjp_file_full_path = None
         self.tjp_file = None
+        self.tjp_digest = None
+        self._tjp_content = None
 
         self.csv_file_full_path = None
         self.csv_file = None
@@ -192,9 +1008,6 @@ class TaskJugglerScheduler(SchedulerBase):
         self.compute_resources = compute_resources
         self.parsing_method = parsing_method
 
-        self._projects = []
-        self.projects = projects
-
     def _create_tjp_file(self):
         """creates the tjp file
         """
@@ -204,39 +1017,336 @@ class TaskJugglerScheduler(SchedulerBase):
         self.tjp_file_full_path = self.temp_file_full_path + ".tjp"
         self.csv_file_full_path = self.temp_file_full_path + ".csv"
 
-    def _create_tjp_file_content(self):
+    def _create_tjp_file_content(self, project_ids=None):
         """creates the tjp file content
+
+        :param list project_ids: The ids of the projects to export, if
+          skipped :meth:`._project_ids` will be used.
         """
         from jinja2 import Template
 
         start = time.time()
 
-        # use new way of doing it, it will just work with PostgreSQL
-        import json
         from stalker import defaults
-        from stalker.db.session import DBSession
         template = Template(defaults.tjp_main_template2)
 
-        if not self.projects:
-            project_ids = DBSession.connection().execute(
-                'select id, code from "Projects"'
-            ).fetchall()
-        else:
-            project_ids = [[project.id] for project in self.projects]
+        if project_ids is None:
+            project_ids = self._project_ids()
+        project_ids = sorted(project_ids)
 
-        sql_query = """select
+        import stalker
+        marker = '<<Stalker Tasks>>'
+        header, _, footer = template.render({
+            'stalker': stalker,
+            'studio': self.studio,
+            'csv_file_name': self.temp_file_name,
+            'csv_file_full_path': self.temp_file_full_path,
+            'compute_resources': self.compute_resources,
+            'tasks_buffer': marker
+        }).partition(marker)
+
+        if self.tjp_file_full_path is None:
+            self._create_tjp_file()
+
+        # the digest of the content, excluding the temp file name
+        digest = hashlib.sha1()
+
+        def update_digest(data):
+            if not isinstance(data, bytes):
+                data = data.encode('utf-8')
+            digest.update(data)
+
+        num_of_records = 0
+        self._tjp_content = None
+        with open(self.tjp_file_full_path, 'w') as self.tjp_file:
+            self.tjp_file.write(header)
+            update_digest(header)
+            separator = ''
+            row_count = [0]
+
+            def count_rows(rows):
+                for row in rows:
+                    row_count[0] += 1
+                    yield row
+
+            task_rows = count_rows(self._fetch_task_rows(project_ids))
+            for line in self._tjp_task_lines(project_ids, task_rows):
+                self.tjp_file.write(separator)
+                self.tjp_file.write(line)
+                update_digest(separator)
+                update_digest(line)
+                separator = '\n'
+                num_of_records += 1
+            self.tjp_file.write(footer)
+            update_digest(footer.replace(self.temp_file_name, ''))
+
+        self.tjp_digest = digest.hexdigest()
+        self._add_to_report('exported_rows', row_count[0])
+        self._add_to_report(
+            'tjp_bytes', os.path.getsize(self.tjp_file_full_path)
+        )
+
+        logger.debug(
+            'total number of lines: %s' % num_of_records
+        )
+
+        end = time.time()
+        logger.debug(
+            'rendering the whole tjp file took : %s seconds' % (end - start)
+        )
+
+    @classmethod
+    def _fetch_task_rows(cls, project_ids):
+        """returns an iterable of the data of the tasks of the given projects,
+        ordered by their project ids and their hierarchy.
+
+        Each item is a tuple of::
+
+          (task_id, project_id, depth, priority, schedule_timing,
+           schedule_unit, schedule_model, allocation_strategy,
+           persistent_allocation, resource_ids, alternative_resource_ids,
+           time_logs, dependencies, is_leaf)
+
+        where ``depth`` is 0 for root tasks, ``time_logs`` is a list of
+        ``(resource_id, start, end)`` tuples with start and end are formatted
+        for TaskJuggler, and ``dependencies`` is a list of ``(path,
+        dependency_target, gap_timing, gap_unit, gap_model)`` tuples where
+        ``path`` is a list containing the project id and the task ids from the
+        root to the depended task.
+
+        With PostgreSQL the data is fetched with a single query, for the other
+        databases the flat tables are fetched with a couple of bulk queries
+        and the hierarchy is build in Python.
+
+        :param list project_ids: A sorted list of project ids
+        """
+        from stalker.db.session import DBSession
+        if DBSession.connection().engine.dialect.name == 'postgresql':
+            return cls._fetch_task_rows_postgresql(project_ids)
+        return cls._fetch_task_rows_generic(project_ids)
+
+    @classmethod
+    def _fetch_task_rows_generic(cls, project_ids):
+        """A generator yielding the data of the tasks of the given projects
+        in the format described in :meth:`._fetch_task_rows`. It doesn't use
+        any database specific SQL, so it works with SQLite3 too.
+
+        :param list project_ids: A sorted list of project ids
+        """
+        from sqlalchemy import select
+        from stalker import Task, TaskDependency, TimeLog
+        from stalker.db.session import DBSession
+        from stalker.models.task import (Task_Resources,
+                                         Task_Alternative_Resources)
+
+        if not project_ids:
+            return
+
+        connection = DBSession.connection()
+        tasks_table = Task.__table__
+        task_ids_query = select([tasks_table.c.id])\
+            .where(tasks_table.c.project_id.in_(project_ids))
+
+        # tasks
+        tasks = {}
+        parents = {}
+        children = {}
+        roots = {}
+        result = connection.execute(
+            select([
+                tasks_table.c.id,
+                tasks_table.c.parent_id,
+                tasks_table.c.project_id,
+                tasks_table.c.priority,
+                tasks_table.c.schedule_timing,
+                tasks_table.c.schedule_unit,
+                tasks_table.c.schedule_model,
+                tasks_table.c.allocation_strategy,
+                tasks_table.c.persistent_allocation,
+            ]).where(tasks_table.c.project_id.in_(project_ids))
+        )
+        for r in result:
+            tasks[r[0]] = r
+            parents[r[0]] = (r[1], r[2])
+            if r[1] is None:
+                roots.setdefault(r[2], []).append(r[0])
+            else:
+                children.setdefault(r[1], []).append(r[0])
+
+        # resources
+        resources = {}
+        alternative_resources = {}
+        for table, storage in [
+                (Task_Resources, resources),
+                (Task_Alternative_Resources, alternative_resources)]:
+            result = connection.execute(
+                select([table.c.task_id, table.c.resource_id])
+                .where(table.c.task_id.in_(task_ids_query))
+                .order_by(table.c.task_id, table.c.resource_id)
+            )
+            for task_id, resource_id in result:
+                storage.setdefault(task_id, []).append(resource_id)
+
+        # time logs
+        time_logs = {}
+        time_logs_table = TimeLog.__table__
+        result = connection.execute(
+            select([
+                time_logs_table.c.task_id,
+                time_logs_table.c.resource_id,
+                time_logs_table.c.start,
+                time_logs_table.c.end,
+            ]).where(time_logs_table.c.task_id.in_(task_ids_query))
+            .order_by(time_logs_table.c.start, time_logs_table.c.id)
+        )
+        time_format = '%Y-%m-%d-%H:%M:00'
+        for task_id, resource_id, start, end in result:
+            if start.tzinfo is not None:
+                start = start.astimezone(pytz.utc)
+            if end.tzinfo is not None:
+                end = end.astimezone(pytz.utc)
+            time_logs.setdefault(task_id, []).append(
+                (resource_id, start.strftime(time_format),
+                 end.strftime(time_format))
+            )
+
+        # dependencies
+        dependencies = {}
+        dependencies_table = TaskDependency.__table__
+        result = connection.execute(
+            select([
+                dependencies_table.c.task_id,
+                dependencies_table.c.depends_to_id,
+                dependencies_table.c.dependency_target,
+                dependencies_table.c.gap_timing,
+                dependencies_table.c.gap_unit,
+                dependencies_table.c.gap_model,
+            ]).where(dependencies_table.c.task_id.in_(task_ids_query))
+            .order_by(dependencies_table.c.depends_to_id)
+        )
+        for r in result:
+            dependencies.setdefault(r[0], []).append(r[1:])
+
+        # the parents of the depended tasks in other projects
+        missing_ids = set(
+            dep[0] for deps in dependencies.values() for dep in deps
+            if dep[0] not in parents
+        )
+        while missing_ids:
+            result = connection.execute(
+                select([
+                    tasks_table.c.id,
+                    tasks_table.c.parent_id,
+                    tasks_table.c.project_id,
+                ]).where(tasks_table.c.id.in_(list(missing_ids)))
+            )
+            missing_ids = set()
+            for task_id, parent_id, project_id in result:
+                parents[task_id] = (parent_id, project_id)
+                if parent_id is not None and parent_id not in parents:
+                    missing_ids.add(parent_id)
+
+        paths = {}
+
+        def path_of(task_id):
+            """returns the path of the given task
+            """
+            if task_id not in paths:
+                parent_id, project_id = parents[task_id]
+                if parent_id is None:
+                    paths[task_id] = [project_id, task_id]
+                else:
+                    paths[task_id] = path_of(parent_id) + [task_id]
+            return paths[task_id]
+
+        # walk the hierarchy in the same order with the PostgreSQL query
+        def sort_key(task_id):
+            return str(task_id)
+
+        for project_id in project_ids:
+            to_visit = [
+                (task_id, 0) for task_id in
+                sorted(roots.get(project_id, []), key=sort_key, reverse=True)
+            ]
+            while to_visit:
+                task_id, depth = to_visit.pop()
+                r = tasks[task_id]
+                child_ids = children.get(task_id, [])
+                to_visit.extend([
+                    (child_id, depth + 1) for child_id in
+                    sorted(child_ids, key=sort_key, reverse=True)
+                ])
+
+                task_dependencies = [
+                    (path_of(dep[0]),) + tuple(dep[1:])
+                    for dep in dependencies.get(task_id, [])
+                ]
+
+                yield (
+                    task_id, project_id, depth, r[3], r[4], r[5], r[6], r[7],
+                    r[8], resources.get(task_id), alternative_resources.get(
+                        task_id
+                    ), time_logs.get(task_id, []), task_dependencies,
+                    not child_ids
+                )
+
+    @classmethod
+    def _fetch_task_rows_postgresql(cls, project_ids):
+        """A generator yielding the data of the tasks of the given projects
+        in the format described in :meth:`._fetch_task_rows`. All the projects
+        are fetched with a single query by using a server side cursor, so the
+        whole data is never kept in memory. It will only work with
+        PostgreSQL.
+
+        Each yielded item is a tuple of::
+
+          (task_id, project_id, depth, priority, schedule_timing,
+           schedule_unit, schedule_model, allocation_strategy,
+           persistent_allocation, resource_ids, alternative_resource_ids,
+           time_logs, dependencies, is_leaf)
+
+        where ``depth`` is 0 for root tasks, ``time_logs`` is a list of
+        ``(resource_id, start, end)`` tuples with start and end are formatted
+        for TaskJuggler, and ``dependencies`` is a list of ``(path,
+        dependency_target, gap_timing, gap_unit, gap_model)`` tuples where
+        ``path`` is a list containing the project id and the task ids from the
+        root to the depended task.
+
+        :param list project_ids: A sorted list of project ids
+        """
+        from sqlalchemy import text
+        from stalker.db.session import DBSession
+
+        if not project_ids:
+            return
+
+        sql_query = """with recursive recursive_task(id, project_id, path_as_text, depth) as (
+        select
+            id,
+            project_id,
+            id::text as path_as_text,
+            0
+        from "Tasks"
+        where parent_id is NULL and project_id = any(:project_ids)
+    union all
+        select
+            task.id,
+            parent.project_id,
+            (parent.path_as_text || '-' || task.id) as path_as_text,
+            parent.depth + 1 as depth
+        from "Tasks" as task
+        join recursive_task as parent on task.parent_id = parent.id
+)
+select
     "Tasks".id,
-    tasks.path,
-    coalesce("Tasks".parent_id, "Tasks".project_id) as parent_id,
-    tasks.entity_type,
-    tasks.name,
+    recursive_task.project_id,
+    recursive_task.depth,
     "Tasks".priority,
     "Tasks".schedule_timing,
     "Tasks".schedule_unit,
     "Tasks".schedule_model,
     "Tasks".allocation_strategy,
     "Tasks".persistent_allocation,
-    tasks.depth,
     task_resources.resource_ids,
     task_alternative_resources.resource_ids as alternative_resource_ids,
     time_logs.time_log_array,
@@ -246,38 +1356,8 @@ class TaskJugglerScheduler(SchedulerBase):
         from "Tasks" as "Child_Tasks"
         where "Child_Tasks".parent_id = "Tasks".id
     ) as is_leaf
-from "Tasks"
-join (
-    with recursive recursive_task(id, parent_id, path_as_text, path, depth) as (
-        select
-            id,
-            parent_id,
-            id::text as path_as_text,
-            array[project_id] as path,
-            0
-        from "Tasks"
-        where parent_id is NULL and project_id = :id
-    union all
-        select
-            task.id,
-            task.parent_id,
-            (parent.path_as_text || '-' || task.id) as path_as_text,
-            (parent.path || task.parent_id) as path,
-            parent.depth + 1 as depth
-        from "Tasks" as task
-        join recursive_task as parent on task.parent_id = parent.id
-    ) select
-        recursive_task.id,
-        recursive_task.parent_id,
-        recursive_task.path_as_text,
-        recursive_task.path,
-        "SimpleEntities".name as name,
-        "SimpleEntities".entity_type,
-        recursive_task.depth
-    from recursive_task
-    join "SimpleEntities" on recursive_task.id = "SimpleEntities".id
-    --order by path_as_text
-) as tasks on "Tasks".id = tasks.id
+from recursive_task
+join "Tasks" on "Tasks".id = recursive_task.id
 
 -- resources
 left outer join (
@@ -285,6 +1365,7 @@ left outer join (
         task_id,
         array_agg(resource_id order by resource_id) as resource_ids
     from "Task_Resources"
+    where task_id in (select id from recursive_task)
     group by task_id
 ) as task_resources on "Tasks".id = task_resources.task_id
 
@@ -294,6 +1375,7 @@ left outer join (
         task_id,
         array_agg(resource_id order by resource_id) as resource_ids
     from "Task_Alternative_Resources"
+    where task_id in (select id from recursive_task)
     group by task_id
 ) as task_alternative_resources on "Tasks".id = task_alternative_resources.task_id
 
@@ -301,8 +1383,16 @@ left outer join (
 left outer join (
     select
         "TimeLogs".task_id,
-        array_agg(('User_' || "TimeLogs".resource_id, to_char(cast("TimeLogs".start at time zone 'utc' as timestamp), 'YYYY-MM-DD-HH24:MI:00'), to_char(cast("TimeLogs".end at time zone 'utc' as timestamp), 'YYYY-MM-DD-HH24:MI:00'))) as time_log_array
+        json_agg(
+            json_build_array(
+                "TimeLogs".resource_id,
+                to_char(cast("TimeLogs".start at time zone 'utc' as timestamp), 'YYYY-MM-DD-HH24:MI:00'),
+                to_char(cast("TimeLogs".end at time zone 'utc' as timestamp), 'YYYY-MM-DD-HH24:MI:00')
+            )
+            order by "TimeLogs".start, "TimeLogs".id
+        ) as time_log_array
     from "TimeLogs"
+    where task_id in (select id from recursive_task)
     group by task_id
 ) as time_logs on "Tasks".id = time_logs.task_id
 
@@ -310,136 +1400,162 @@ left outer join (
 left outer join (
     select
         task_id,
-        array_agg((tasks.alt_path, dependency_target, gap_timing, gap_unit, gap_model)) dependency_info
+        json_agg(
+            json_build_array(
+                tasks.alt_path,
+                dependency_target,
+                gap_timing,
+                gap_unit,
+                gap_model
+            )
+            order by depends_to_id
+        ) as dependency_info
     from "Task_Dependencies"
     join (
-        with recursive recursive_task(id, parent_id, alt_path) as (
+        with recursive dependency_task(id, parent_id, alt_path) as (
             select
                 id,
                 parent_id,
-                project_id::text as alt_path
+                array[project_id] as alt_path
             from "Tasks"
             where parent_id is NULL
         union all
             select
                 task.id,
                 task.parent_id,
-                (parent.alt_path || '-' || task.parent_id) as alt_path
+                parent.alt_path || task.parent_id as alt_path
             from "Tasks" as task
-            join recursive_task as parent on task.parent_id = parent.id
+            join dependency_task as parent on task.parent_id = parent.id
         ) select
-            recursive_task.id,
-            recursive_task.parent_id,
-            recursive_task.alt_path || '-' || recursive_task.id as alt_path
-        from recursive_task
-        join "SimpleEntities" on recursive_task.id = "SimpleEntities".id
+            dependency_task.id,
+            dependency_task.alt_path || dependency_task.id as alt_path
+        from dependency_task
     ) as tasks on "Task_Dependencies".depends_to_id = tasks.id
+    where task_id in (select id from recursive_task)
     group by task_id
 ) as task_dependencies on "Tasks".id = task_dependencies.task_id
 
---order by "Tasks".id
-order by path_as_text"""
+order by recursive_task.project_id, recursive_task.path_as_text"""
 
-        result_buffer = []
-        num_of_records = 0
+        connection = DBSession.connection()\
+            .execution_options(stream_results=True)
+        result = connection.execute(text(sql_query), project_ids=project_ids)
 
-        # run it per project
-        from sqlalchemy import text
-        for pr in project_ids:
-            p_id = pr[0]
-            #p_code = pr[1]
+        for r in result:
+            # json columns are already decoded by the driver
+            time_logs = [tuple(time_log) for time_log in r[11] or []]
+            dependencies = [tuple(dep) for dep in r[12] or []]
 
-            result = DBSession.connection().execute(text(sql_query), id=p_id)
+            yield (
+                r[0], r[1], r[2], r[3], r[4], r[5], r[6], r[7], r[8],
+                r[9], r[10], time_logs, dependencies, r[13]
+            )
+
+        result.close()
 
+    @classmethod
+    def _compact_bookings(cls, time_logs):
+        """merges the contiguous or overlapping time logs of the same resource
+        in to one booking interval, which carries the same information for
+        TaskJuggler but makes the tjp file a lot smaller.
+
+        :param list time_logs: A list of ``(resource_id, start, end)`` tuples
+          where ``start`` and ``end`` are strings in the TaskJuggler date
+          format, which sort in the same order with the dates.
+        :returns: A list of ``(resource_id, start, end)`` tuples sorted by
+          start and resource_id.
+        """
+        if len(time_logs) < 2:
+            return time_logs
+
+        bookings = []
+        current = None
+        for resource_id, start, end in \
+                sorted(time_logs, key=lambda x: (x[0], x[1])):
+            if current is not None and current[0] == resource_id \
+                    and start <= current[2]:
+                if end > current[2]:
+                    current[2] = end
+                continue
+            current = [resource_id, start, end]
+            bookings.append(current)
+
+        return sorted(
+            [tuple(booking) for booking in bookings],
+            key=lambda x: (x[1], x[0])
+        )
+
+    @classmethod
+    def _tjp_task_lines(cls, project_ids, task_rows):
+        """A generator yielding the tjp lines of the given task rows one by
+        one.
+
+        :param list project_ids: A sorted list of project ids.
+        :param task_rows: An iterable of task data ordered by their project
+          ids and hierarchy as returned by :meth:`._fetch_task_rows`.
+        """
+        task_rows = iter(task_rows)
+        next_row = next(task_rows, None)
+
+        for p_id in project_ids:
             # start by adding the project first
-            result_buffer.append(
-                'task Project_%s "Project_%s" {' % (p_id, p_id)
-            )
+            yield 'task Project_%s "Project_%s" {' % (p_id, p_id)
+
+            # skip the rows of the projects that are not requested
+            while next_row is not None and next_row[1] < p_id:
+                next_row = next(task_rows, None)
 
             # now start jumping around
             previous_level = 0
-            for r in result.fetchall():
-                # start by appending task tjp id first
-                task_id = r[0]
-                # path = r[1]
-                # parent_id = r[2]
-                # entity_type = r[3]
-                #name = r[4]
-                priority = r[5]
-                schedule_timing = r[6]
-                schedule_unit = r[7]
-                schedule_model = r[8]
-                allocation_strategy = r[9]
-                persistent_allocation = r[10]
-                depth = r[11] + 1
-                resource_ids = r[12]
-                alternative_resource_ids = r[13]
-                time_log_array = r[14]
-                dependency_info = r[15]
-                is_leaf = r[16]
-
+            while next_row is not None and next_row[1] == p_id:
+                task_id, project_id, depth, priority, schedule_timing, \
+                    schedule_unit, schedule_model, allocation_strategy, \
+                    persistent_allocation, resource_ids, \
+                    alternative_resource_ids, time_logs, dependencies, \
+                    is_leaf = next_row
+                next_row = next(task_rows, None)
+
+                depth += 1
                 tab = '  ' * depth
 
                 # close the previous level if necessary
                 for i in range(previous_level - depth + 1):
                     i_tab = '  ' * (previous_level - i)
-                    result_buffer.append('%s}' % i_tab)
+                    yield '%s}' % i_tab
 
-                result_buffer.append(
-                    """%(tab)stask Task_%(id)s "Task_%(id)s" {""" % {
-                        'tab': tab,
-                        'id': task_id
-                    }
-                )
+                yield """%(tab)stask Task_%(id)s "Task_%(id)s" {""" % {
+                    'tab': tab,
+                    'id': task_id
+                }
 
                 # append priority if it is different then 500
                 if priority != 500:
-                    result_buffer.append(
-                        '%s  priority %s' % (tab, priority))
+                    yield '%s  priority %s' % (tab, priority)
 
                 # append dependency information
-                if dependency_info:
+                if dependencies:
                     dep_buffer = ['%s  depends ' % tab]
-
-                    json_data = json.loads(
-                        dependency_info.replace('{', '[')
-                        .replace('}', ']')
-                        .replace('(', '')
-                        .replace(')', '')
-                    )  # it is an array of string
-
-                    for i, dep in enumerate(json_data):
+                    for i, dep in enumerate(dependencies):
                         if i > 0:
                             dep_buffer.append(', ')
 
-                        dep_full_ids, \
-                            dependency_target, \
-                            gap_timing, \
-                            gap_unit, \
-                            gap_model = dep.split(',')
-
+                        dep_full_ids, dependency_target = dep[0], dep[1]
                         dep_full_path = '.'.join(
-                            map(lambda x: 'Task_%s' % x,
-                                dep_full_ids.split('-'))
+                            ['Project_%s' % dep_full_ids[0]] +
+                            ['Task_%s' % x for x in dep_full_ids[1:]]
                         )
-                        # fix for Project id
-                        dep_full_path = 'Project_%s' % dep_full_path[5:]
-
-                        dep_string = '%s {%s}' % (
-                            dep_full_path, dependency_target)
 
-                        dep_buffer.append(dep_string)
+                        dep_buffer.append(
+                            '%s {%s}' % (dep_full_path, dependency_target)
+                        )
 
-                    result_buffer.append(''.join(dep_buffer))
+                    yield ''.join(dep_buffer)
 
                 # append schedule model and timing information
                 # if this is a leaf task and has resources
                 if is_leaf and resource_ids:
-                    result_buffer.append(
-                        '%s  %s %s%s' % (
-                            tab, schedule_model, schedule_timing,
-                            schedule_unit
-                        )
+                    yield '%s  %s %s%s' % (
+                        tab, schedule_model, schedule_timing, schedule_unit
                     )
 
                     resource_buffer = ['%s  allocate ' % tab]
@@ -467,61 +1583,84 @@ order by path_as_text"""
                                 resource_buffer.append(' persistent')
                             resource_buffer.append(' }')
 
-                    result_buffer.append(''.join(resource_buffer))
+                    yield ''.join(resource_buffer)
 
                     # append any time log information
-                    if time_log_array:
-                        json_data = json.loads(
-                            time_log_array.replace('{', '[')
-                            .replace('}', ']')
-                            .replace('(', '')
-                            .replace(')', '')
-                        )  # it is an array of string
-
-                        for tlog in json_data:
-                            user_id, t_start, t_end = tlog.split(',')
-                            result_buffer.append(
-                                '%s  booking %s %s - %s { overtime 2 }' % (
-                                    tab, user_id, t_start, t_end
-                                )
+                    for user_id, t_start, t_end in \
+                            cls._compact_bookings(time_logs):
+                        yield \
+                            '%s  booking User_%s %s - %s { overtime 2 }' % (
+                                tab, user_id, t_start, t_end
                             )
 
                 previous_level = depth
-                num_of_records += 1
 
             # and close the brackets per project
             depth = 0  # current depth is 0 (Project)
             # previous_level is the last task
             for i in range(previous_level - depth + 1):
                 i_tab = '  ' * (previous_level - i)
-                result_buffer.append('%s}' % i_tab)
+                yield '%s}' % i_tab
 
-        tasks_buffer = '\n'.join(result_buffer)
+    @property
+    def tjp_content(self):
+        """returns the content of the tjp file, the content is directly
+        written to the tjp file by :meth:`._create_tjp_file_content` so this
+        reads the file back and should only be used for debugging purposes
+        """
+        if self.tjp_file_full_path is None \
+           or not os.path.exists(self.tjp_file_full_path):
+            return self._tjp_content or ''
 
-        import stalker
-        self.tjp_content = template.render({
-            'stalker': stalker,
-            'studio': self.studio,
-            'csv_file_name': self.temp_file_name,
-            'csv_file_full_path': self.temp_file_full_path,
-            'compute_resources': self.compute_resources,
-            'tasks_buffer': tasks_buffer
-        })
+        with open(self.tjp_file_full_path, 'r') as tjp_file:
+            return tjp_file.read()
 
-        logger.debug(
-            'total number of records: %s' % num_of_records
-        )
+    @tjp_content.setter
+    def tjp_content(self, tjp_content):
+        """sets the content of the tjp file, the content is written to the
+        tjp file if it is already created
+        """
+        self._tjp_content = tjp_content
+        if self.tjp_file_full_path is not None:
+            self._write_tjp_content()
 
-        end = time.time()
-        logger.debug(
-            'rendering the whole tjp file took : %s seconds' % (end - start)
-        )
+    def _write_tjp_content(self):
+        """writes the assigned tjp content to the tjp file and updates the
+        tjp_digest
+        """
+        tjp_content = self._tjp_content or ''
+        with open(self.tjp_file_full_path, 'w') as self.tjp_file:
+            self.tjp_file.write(tjp_content)
+
+        digest = hashlib.sha1()
+        data = tjp_content
+        if self.temp_file_name:
+            data = data.replace(self.temp_file_name, '')
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
+        digest.update(data)
+        self.tjp_digest = digest.hexdigest()
 
     def _fill_tjp_file(self):
-        """fills the tjp file with content
+        """fills the tjp file with the assigned :attr:`.tjp_content`
+
+        .. deprecated:: 0.2.25
+           The tjp file is now filled directly by
+           :meth:`._create_tjp_file_content` and assigning
+           :attr:`.tjp_content` writes it to the tjp file, this method is not
+           called by the scheduler anymore.
         """
-        with open(self.tjp_file_full_path, 'w+') as self.tjp_file:
-            self.tjp_file.write(self.tjp_content)
+        import warnings
+        warnings.warn(
+            '%s._fill_tjp_file() is deprecated and is not called by the '
+            'scheduler anymore, the tjp file is filled by '
+            '_create_tjp_file_content()' % self.__class__.__name__,
+            DeprecationWarning
+        )
+        if self._tjp_content is not None:
+            if self.tjp_file_full_path is None:
+                self._create_tjp_file()
+            self._write_tjp_content()
 
     def _delete_tjp_file(self):
         """deletes the temp tjp file
@@ -545,124 +1684,222 @@ order by path_as_text"""
         self._delete_tjp_file()
         self._delete_csv_file()
 
-    def _parse_csv_file(self):
+    @classmethod
+    def _parse_tjp_date(cls, date_string):
+        """parses the given date string in "%Y-%m-%d-%H:%M" format which is
+        the format of the dates in the csv file, without using the slow
+        datetime.strptime()
+
+        :param str date_string: The date string
+        :returns: A timezone aware datetime.datetime instance in UTC
+        """
+        return datetime.datetime(
+            int(date_string[0:4]),
+            int(date_string[5:7]),
+            int(date_string[8:10]),
+            int(date_string[11:13]),
+            int(date_string[14:16]),
+            tzinfo=pytz.utc
+        )
+
+    def _parse_csv_file(self, csv_file_full_paths=None):
         """parses back the csv file and fills the tasks with computes_start and
         computed_end values
+
+        The csv files are read line by line and the results of the tasks and
+        the projects are collected separately, then all of them are written
+        to the database at once by using :meth:`._update_db`.
+
+        :param list csv_file_full_paths: A list of csv file paths to parse.
+          The results of all the files are written to the database at once.
+          If skipped the :attr:`.csv_file_full_path` will be used.
         """
         parsing_start = time.time()
 
-        logger.debug('csv_file_full_path : %s' % self.csv_file_full_path)
-        if not os.path.exists(self.csv_file_full_path):
-            logger.debug('could not find CSV file, '
-                         'returning without updating db!')
-            return
+        if csv_file_full_paths is None:
+            csv_file_full_paths = [self.csv_file_full_path]
 
-        from stalker import Task, Project
-        from stalker.models.task import Task_Computed_Resources
+        task_data = {}
+        project_data = {}
+        for csv_file_full_path in csv_file_full_paths:
+            file_task_data, file_project_data = \
+                self._read_csv_file(csv_file_full_path)
+            task_data.update(file_task_data)
+            project_data.update(file_project_data)
+
+        self._update_db(task_data, project_data)
+
+        parsing_end = time.time()
+        logger.debug(
+            'completed parsing csv file in (SQL): %s seconds' %
+            (parsing_end - parsing_start)
+        )
+
+    def _read_csv_file(self, csv_file_full_path):
+        """reads the given csv file line by line and returns the results
 
-        entity_ids = []
-        update_data = []
-        update_user_data = []
+        :param str csv_file_full_path: The path of the csv file.
+        :returns: A tuple of two dictionaries, the first one has the task ids
+          as keys and a tuple of (computed_start, computed_end, resource_ids)
+          as values, the second one has the project ids as keys and a tuple
+          of (computed_start, computed_end) as values. The resource_ids are
+          None if :attr:`.compute_resources` is False.
+        """
+        task_data = {}
+        project_data = {}
+        parse_date = self._parse_tjp_date
 
-        with open(self.csv_file_full_path, 'r') as self.csv_file:
+        with open(csv_file_full_path, 'r') as self.csv_file:
             csv_content = csv.reader(self.csv_file, delimiter=';')
 
-            lines = [line for line in csv_content]
-            lines.pop(0)
+            # skip the header
+            next(csv_content, None)
 
-        for data in lines:
-            id_line = data[0]
+            for data in csv_content:
+                id_line = data[0]
 
-            entity_id = int(id_line.split('.')[-1].split('_')[-1])
+                entity_id = int(id_line.split('.')[-1].split('_')[-1])
+                if not entity_id:
+                    continue
 
-            if entity_id:
-                entity_ids.append(entity_id)
-                start_date = datetime.datetime.strptime(
-                    data[1], "%Y-%m-%d-%H:%M"
-                )
-                end_date = datetime.datetime.strptime(
-                    data[2],
-                    "%Y-%m-%d-%H:%M"
-                )
+                start_date = parse_date(data[1])
+                end_date = parse_date(data[2])
 
-                # implement time zone info
-                start_date = start_date.replace(tzinfo=pytz.utc)
-                end_date = end_date.replace(tzinfo=pytz.utc)
+                if '.' not in id_line:
+                    # this is a project
+                    project_data[entity_id] = (start_date, end_date)
+                    continue
 
                 # computed_resources
+                resource_ids = None
                 if self.compute_resources:
+                    resource_ids = []
                     if data[3] != '':
-                        resources_data = map(
-                            lambda x: x.split('_')[-1].split(')')[0],
-                            data[3].split(',')
-                        )
-                        for rid in resources_data:
-                            update_user_data.append({
-                                'task_id': entity_id,
-                                'resource_id': rid
-                            })
-
-                update_data.append({
-                    'b_id': entity_id,
-                    'start': start_date,
-                    'end': end_date,
-                    'computed_start': start_date,
-                    'computed_end': end_date
-                })
+                        resource_ids = [
+                            int(x.split('_')[-1].split(')')[0])
+                            for x in data[3].split(',')
+                        ]
 
-        from sqlalchemy import bindparam
+                task_data[entity_id] = (start_date, end_date, resource_ids)
 
-        # update date values
-        update_statement = Task.__table__.update()\
-            .where(Task.__table__.c.id == bindparam('b_id'))\
-            .values(
-                start=bindparam('start'),
-                end=bindparam('end'),
-                computed_start=bindparam('computed_start'),
-                computed_end=bindparam('computed_end')
+        return task_data, project_data
+
+    @classmethod
+    def _get_cached_results(cls, digest):
+        """returns the cached results for the given tjp digest or None if
+        there are no cached results
+        """
+        with cls._results_cache_lock:
+            results = cls._results_cache.pop(digest, None)
+            if results is not None:
+                # mark it as the most recently used one
+                cls._results_cache[digest] = results
+        return results
+
+    @classmethod
+    def _cache_results(cls, digest, results):
+        """stores the given results in the cache, removing the least recently
+        used results if the cache is full
+        """
+        from stalker import defaults
+        with cls._results_cache_lock:
+            cls._results_cache.pop(digest, None)
+            cls._results_cache[digest] = results
+            while len(cls._results_cache) > \
+                    max(defaults.tj_results_cache_size, 0):
+                cls._results_cache.popitem(last=False)
+
+    @classmethod
+    def clear_results_cache(cls):
+        """removes all the cached results
+        """
+        with cls._results_cache_lock:
+            cls._results_cache.clear()
+
+    def _run_tj3(self, tjp_file_full_path, output_path):
+        """runs tj3 for the given tjp file and returns the return code and
+        the stderr output of tj3
+
+        :param str tjp_file_full_path: The path of the tjp file
+        :param str output_path: The path that the reports will be written to
+        :returns: A tuple of the return code and the stderr output
+        """
+        from stalker import defaults
+        if os.name == 'nt':
+            logger.debug('tj3 using fallback mode for Windows!')
+            command = '%s %s -o %s' % (
+                defaults.tj_command,
+                tjp_file_full_path,
+                output_path,
             )
-        from stalker.db.session import DBSession
-        DBSession.connection().execute(
-            update_statement,
-            update_data
-        )
+            logger.debug('tj3 command: %s' % command)
+            return_code = os.system(command)
+            stderr_buffer = ''
+        else:
+            process = subprocess.Popen(
+                [defaults.tj_command,
+                 tjp_file_full_path,
+                 '-o',
+                 output_path],
+                stderr=subprocess.PIPE
+            )
+            if self.job is not None:
+                self.job._add_process(process)
 
-        # update project dates
-        update_project_statement = Project.__table__.update()\
-            .where(Project.__table__.c.id == bindparam('b_id'))\
-            .values(
-                start=bindparam('start'),
-                end=bindparam('end'),
-                computed_start=bindparam('computed_start'),
-                computed_end=bindparam('computed_end')
-            )
-        DBSession.connection().execute(
-            update_project_statement,
-            update_data
-        )
+            # readline() blocks until there is a new line or the process
+            # closes its stderr, so there is no need to poll the process
+            stderr_buffer = []
+            for stderr in iter(process.stderr.readline, b''):
+                stderr = stderr.decode('utf-8').strip()
+                stderr_buffer.append(stderr)
+                logger.debug(stderr)
+                if self.job is not None:
+                    self.job.stderr_lines.append(stderr)
+            process.stderr.close()
 
-        # update computed resources data
-        # first delete everything
-        if self.compute_resources:
-            delete_resources_statement = Task_Computed_Resources.delete()
+            # flatten the buffer
+            stderr_buffer = '\n'.join(stderr_buffer)
 
-            update_resources_statement = Task_Computed_Resources.insert()\
-                .values(
-                    task_id=bindparam('task_id'),
-                    resource_id=bindparam('resource_id')
-                )
+            return_code = self._wait_tj3(process)
 
-            DBSession.connection().execute(delete_resources_statement)
-            DBSession.connection().execute(
-                update_resources_statement,
-                update_user_data
-            )
+        self._add_to_report('tj3_runs', 1)
+        logger.debug('tj3 return code: %s' % return_code)
+        return return_code, stderr_buffer
 
-        parsing_end = time.time()
-        logger.debug(
-            'completed parsing csv file in (SQL): %s seconds' %
-            (parsing_end - parsing_start)
-        )
+    def _wait_tj3(self, process):
+        """waits the given tj3 process to finish and records its peak memory
+        usage to the report, returns the return code of the process
+        """
+        if not hasattr(os, 'wait4'):
+            return process.wait()
+
+        import errno
+        import sys
+        try:
+            _, status, rusage = os.wait4(process.pid, 0)
+        except OSError as e:
+            if e.errno != errno.ECHILD:
+                raise
+            # already reaped
+            return process.wait()
+
+        if os.WIFSIGNALED(status):
+            process.returncode = -os.WTERMSIG(status)
+        else:
+            process.returncode = os.WEXITSTATUS(status)
+
+        # ru_maxrss is in bytes on macOS and in kilobytes on others
+        peak_memory = rusage.ru_maxrss
+        if sys.platform == 'darwin':
+            peak_memory //= 1024
+
+        if self.report is not None:
+            with self._report_lock:
+                self.report['tj3_peak_memory_kb'] = max(
+                    self.report.get('tj3_peak_memory_kb') or 0, peak_memory
+                )
+
+        return process.returncode
 
     def schedule(self):
         """Does the scheduling.
@@ -677,108 +1914,841 @@ order by path_as_text"""
                 (self.__class__.__name__, self.studio.__class__.__name__)
             )
 
-        # create a tjp file
-        self._create_tjp_file()
+        self._start_report()
+        self.report.update({
+            'tjp_bytes': 0,
+            'tj3_runs': 0,
+            'tj3_peak_memory_kb': None,
+        })
+        try:
+            return self._schedule_projects()
+        finally:
+            self._finish_report()
 
-        # create tjp file content
-        self._create_tjp_file_content()
+    def _schedule_projects(self):
+        """exports the projects to tjp files, runs tj3 and writes the results
+        back to the database, returns the stderr output of tj3
+        """
+        project_ids = self._project_ids()
+        self.report['projects'] = len(project_ids)
+        if not project_ids:
+            logger.debug('there are no projects to schedule')
+            return ''
+
+        if self.parallel:
+            project_groups = self._project_groups(project_ids)
+        else:
+            project_groups = [project_ids]
 
-        # fill it with data
-        self._fill_tjp_file()
+        self._set_stage('export')
+        runs = []
+        try:
+            return self._solve_runs(project_groups, runs)
+        finally:
+            # remove the tjp and csv files of all the runs
+            for self.tjp_file_full_path, _, self.csv_file_full_path, _ \
+                    in runs:
+                self._clean_up()
+
+    def _solve_runs(self, project_groups, runs):
+        """creates the tjp files of the given project groups, runs tj3 and
+        writes the results back to the database, returns the stderr output of
+        tj3. The tjp and csv file paths of each run are appended to the given
+        runs list as soon as the tjp file path is created, so the caller can
+        remove them even if a stage fails.
+        """
+        # create one tjp file per project group
+        for project_group in project_groups:
+            # create a tjp file
+            self._create_tjp_file()
+            run = [self.tjp_file_full_path, self.temp_file_path,
+                   self.csv_file_full_path, None]
+            runs.append(run)
+
+            # create tjp file content
+            self._create_tjp_file_content(project_group)
+            run[3] = self.tjp_digest
+
+            logger.debug('tjp_file_full_path: %s' % self.tjp_file_full_path)
+
+        # skip the runs with cached results
+        cached_results = {}
+        if self.use_cache:
+            for run in runs:
+                results = self._get_cached_results(run[3])
+                if results is not None:
+                    logger.debug('using cached results for: %s' % run[3])
+                    cached_results[run[3]] = results
+        runs_to_solve = [run for run in runs if run[3] not in cached_results]
+
+        # pass them to tj3
+        self._set_stage('tj3')
+        if len(runs_to_solve) > 1:
+            from multiprocessing import cpu_count
+            from multiprocessing.pool import ThreadPool
+            pool = ThreadPool(min(len(runs_to_solve), cpu_count()))
+            try:
+                results = pool.map(
+                    lambda run: self._run_tj3(run[0], run[1]), runs_to_solve
+                )
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = [self._run_tj3(run[0], run[1]) for run in runs_to_solve]
+
+        self._set_stage('parse')
+        for return_code, stderr in results:
+            if return_code:
+                # there is an error
+                raise RuntimeError(stderr)
+
+        # read back the csv files
+        for run, (return_code, stderr) in zip(runs_to_solve, results):
+            task_data, project_data = self._read_csv_file(run[2])
+            cached_results[run[3]] = (task_data, project_data, stderr)
+            if self.use_cache:
+                self._cache_results(run[3], cached_results[run[3]])
+
+        task_data = {}
+        project_data = {}
+        stderr_buffer = []
+        for run in runs:
+            run_task_data, run_project_data, stderr = cached_results[run[3]]
+            task_data.update(run_task_data)
+            project_data.update(run_project_data)
+            if stderr:
+                stderr_buffer.append(stderr)
+
+        self._update_db(task_data, project_data)
+
+        return '\n'.join(stderr_buffer)
+
+
+class PythonScheduler(SchedulerBase):
+    """An in-process scheduler written in pure Python.
+
+    PythonScheduler is an alternative to :class:`.TaskJugglerScheduler` which
+    doesn't need TaskJuggler to be installed. It reads the tasks, resources,
+    dependencies, time logs and vacations with a couple of bulk queries,
+    solves the scheduling problem in memory and then updates the
+    ``computed_start``, ``computed_end`` and (if ``compute_resources`` is True)
+    the :attr:`.Task.computed_resources` attributes of every scheduled task
+    and project. As it doesn't use any database specific SQL, it works both
+    with PostgreSQL and SQLite3.
+
+    The scheduler is a list scheduler working on the working hours of the
+    :class:`.Studio`. The time between :attr:`.Studio.now` and
+    :attr:`.Studio.end` is divided into working slots of
+    :attr:`.Studio.timing_resolution` length and the leaf tasks are placed in
+    to these slots as soon as possible, in the order of their priority,
+    respecting:
+
+      * The task dependencies (including ``onend``, ``onstart``,
+        ``gap_timing``, ``gap_unit`` and ``gap_model`` values of each
+        :class:`.TaskDependency`). Dependencies of container tasks are
+        inherited by their children.
+      * The studio working hours and the studio wide and user vacations.
+      * The bookings of the resources, which are the :class:`.TimeLog`\\ s
+        entered for the tasks. Booked time is counted towards the effort of
+        the task.
+      * The ``effort``, ``length`` and ``duration`` schedule models.
+      * The :attr:`.User.efficiency` of the resources for effort based tasks.
+      * The :attr:`.Task.alternative_resources`,
+        :attr:`.Task.allocation_strategy` and
+        :attr:`.Task.persistent_allocation` values.
+      * The start constraint of the tasks (:attr:`.Task.schedule_constraint`
+        is set to 1 or 3).
+
+    Container tasks and projects span their children.
 
-        logger.debug('tjp_file_full_path: %s' % self.tjp_file_full_path)
+    .. note::
+       End constraints are not supported, tasks with an end constraint are
+       still scheduled as soon as possible. Also the allocation strategies are
+       an approximation of the ones in TaskJuggler, so the two schedulers may
+       produce slightly different results for complex projects.
+
+    :param bool compute_resources: When set to True the
+      :attr:`.Task.computed_resources` attribute will be updated with the
+      resources that are allocated to the task.
+    :param projects: A list of :class:`.Project` instances to schedule. If
+      skipped all the projects in the database will be scheduled.
+    :param bool incremental: When set to True only the projects that are
+      changed since the last schedule and the projects sharing resources or
+      dependencies with them will be scheduled. See :class:`.SchedulerBase`
+      for details. The default is False.
+    """
 
-        # pass it to tj3
-        from stalker import defaults
-        if os.name == 'nt':
-            logger.debug('tj3 using fallback mode for Windows!')
-            command = '%s %s -o %s' % (
-                defaults.tj_command,
-                self.tjp_file_full_path,
-                self.temp_file_path,
-            )
-            logger.debug('tj3 command: %s' % command)
-            return_code = os.system(command)
-            stderr_buffer = ''
-        else:
-            process = subprocess.Popen(
-                [defaults.tj_command,
-                 self.tjp_file_full_path,
-                 '-o',
-                 self.temp_file_path],
-                stderr=subprocess.PIPE
-            )
+    __settings__ = ['compute_resources', 'incremental']
 
-            # loop until process finishes and capture stderr output
-            stderr_buffer = []
-            while True:
-                stderr = process.stderr.readline()
+    def __init__(self, studio=None, compute_resources=False, projects=None,
+                 incremental=False):
+        super(PythonScheduler, self).__init__(studio, projects, incremental)
+        self.compute_resources = compute_resources
 
-                if stderr == b'' and process.poll() is not None:
-                    break
+        # calendar
+        self.slot_starts = []
+        self.slot_seconds = 0
+        self.resource_busy = {}
+        self.resource_allocated = {}
+        self.resource_capacity = {}
+
+        # data
+        self.tasks = {}
+        self.children = {}
+        self.dependencies = {}
+        self.task_resources = {}
+        self.task_alternative_resources = {}
+        self.time_logs = {}
+        self.efficiencies = {}
+        self.external_tasks = {}
+
+    @classmethod
+    def _to_utc(cls, dt):
+        """returns the given datetime instance in UTC
+        """
+        if dt is None:
+            return None
+        if dt.tzinfo is None:
+            return dt.replace(tzinfo=pytz.utc)
+        return dt.astimezone(pytz.utc)
 
-                if stderr != b'':
-                    stderr = stderr.decode('utf-8').strip()
-                    stderr_buffer.append(stderr)
-                    logger.debug(stderr)
+    def _collect_data(self, project_ids):
+        """reads all the data needed for scheduling with a couple of bulk
+        queries
 
-            # flatten the buffer
-            stderr_buffer = '\n'.join(stderr_buffer)
+        :param list project_ids: A list of project ids
+        """
+        from sqlalchemy import select
+        from stalker import Task, TaskDependency, TimeLog, User, Vacation
+        from stalker.db.session import DBSession
+        from stalker.models.task import (Task_Resources,
+                                         Task_Alternative_Resources)
 
-            return_code = process.returncode
+        # make sure the pending changes are visible to the queries below
+        DBSession.flush()
+        connection = DBSession.connection()
+        tasks_table = Task.__table__
 
-        if return_code:
-            # there is an error
-            raise RuntimeError(stderr_buffer)
+        self.tasks = {}
+        self.children = {}
+        if not project_ids:
+            return
 
-        # read back the csv file
-        self._parse_csv_file()
+        result = connection.execute(
+            select([
+                tasks_table.c.id,
+                tasks_table.c.parent_id,
+                tasks_table.c.project_id,
+                tasks_table.c.priority,
+                tasks_table.c.schedule_timing,
+                tasks_table.c.schedule_unit,
+                tasks_table.c.schedule_model,
+                tasks_table.c.schedule_constraint,
+                tasks_table.c.start,
+                tasks_table.c.is_milestone,
+                tasks_table.c.allocation_strategy,
+                tasks_table.c.persistent_allocation,
+            ]).where(tasks_table.c.project_id.in_(project_ids))
+            .order_by(tasks_table.c.id)
+        )
+        for r in result:
+            self.tasks[r[0]] = {
+                'id': r[0],
+                'parent_id': r[1],
+                'project_id': r[2],
+                'priority': r[3] if r[3] is not None else 500,
+                'schedule_timing': r[4] or 0,
+                'schedule_unit': r[5],
+                'schedule_model': r[6],
+                'schedule_constraint': r[7] or 0,
+                'start': self._to_utc(r[8]),
+                'is_milestone': bool(r[9]),
+                'allocation_strategy': r[10],
+                'persistent_allocation': r[11],
+            }
+            self.children.setdefault(r[1], []).append(r[0])
+
+        def task_filter(column):
+            return column.in_(
+                select([tasks_table.c.id])
+                .where(tasks_table.c.project_id.in_(project_ids))
+            )
 
-        logger.debug('tj3 return code: %s' % return_code)
+        # resources
+        for table, storage in [
+                (Task_Resources, self.task_resources),
+                (Task_Alternative_Resources,
+                 self.task_alternative_resources)]:
+            storage.clear()
+            result = connection.execute(
+                select([table.c.task_id, table.c.resource_id])
+                .where(task_filter(table.c.task_id))
+                .order_by(table.c.task_id, table.c.resource_id)
+            )
+            for task_id, resource_id in result:
+                storage.setdefault(task_id, []).append(resource_id)
+
+        # dependencies
+        deps_table = TaskDependency.__table__
+        self.dependencies = {}
+        result = connection.execute(
+            select([
+                deps_table.c.task_id,
+                deps_table.c.depends_to_id,
+                deps_table.c.dependency_target,
+                deps_table.c.gap_timing,
+                deps_table.c.gap_unit,
+                deps_table.c.gap_model,
+            ]).where(task_filter(deps_table.c.task_id))
+        )
+        for r in result:
+            self.dependencies.setdefault(r[0], []).append({
+                'depends_to_id': r[1],
+                'dependency_target': r[2],
+                'gap_timing': r[3] or 0,
+                'gap_unit': r[4],
+                'gap_model': r[5],
+            })
+
+        # dependencies to tasks that are not going to be scheduled
+        external_ids = set()
+        for deps in self.dependencies.values():
+            for dep in deps:
+                if dep['depends_to_id'] not in self.tasks:
+                    external_ids.add(dep['depends_to_id'])
+
+        self.external_tasks = {}
+        if external_ids:
+            result = connection.execute(
+                select([
+                    tasks_table.c.id,
+                    tasks_table.c.start,
+                    tasks_table.c.end,
+                ]).where(tasks_table.c.id.in_(list(external_ids)))
+            )
+            for r in result:
+                self.external_tasks[r[0]] = \
+                    (self._to_utc(r[1]), self._to_utc(r[2]))
+
+        # time logs
+        time_logs_table = TimeLog.__table__
+        self.time_logs = {}
+        result = connection.execute(
+            select([
+                time_logs_table.c.task_id,
+                time_logs_table.c.resource_id,
+                time_logs_table.c.start,
+                time_logs_table.c.end,
+            ]).where(task_filter(time_logs_table.c.task_id))
+            .order_by(time_logs_table.c.start)
+        )
+        for r in result:
+            self.time_logs.setdefault(r[0], []).append(
+                (r[1], self._to_utc(r[2]), self._to_utc(r[3]))
+            )
 
-        # remove the tjp file
-        self._clean_up()
+        # resources and vacations
+        users_table = User.__table__
+        self.efficiencies = {}
+        result = connection.execute(
+            select([users_table.c.id, users_table.c.efficiency])
+        )
+        for user_id, efficiency in result:
+            self.efficiencies[user_id] = \
+                efficiency if efficiency is not None else 1.0
+
+        vacations_table = Vacation.__table__
+        self.vacations = []
+        result = connection.execute(
+            select([
+                vacations_table.c.user_id,
+                vacations_table.c.start,
+                vacations_table.c.end,
+            ])
+        )
+        for r in result:
+            self.vacations.append(
+                (r[0], self._to_utc(r[1]), self._to_utc(r[2]))
+            )
 
-        return stderr_buffer
+    def _create_calendar(self):
+        """creates the working slots between the studio.now and studio.end
+        and the booking tables of the resources
+        """
+        timing_resolution = self.studio.timing_resolution
+        self.slot_seconds = \
+            timing_resolution.days * 86400 + timing_resolution.seconds
+
+        now = self._to_utc(self.studio.now)
+        end = self._to_utc(self.studio.end)
+
+        studio_vacations = [
+            (v_start, v_end) for user_id, v_start, v_end in self.vacations
+            if user_id is None
+        ]
+
+        self.slot_starts = []
+        day = datetime.datetime(now.year, now.month, now.day, tzinfo=pytz.utc)
+        one_day = datetime.timedelta(days=1)
+        while day < end:
+            for wh_start, wh_end in self.studio.working_hours[day.weekday()]:
+                slot_start = day + datetime.timedelta(minutes=wh_start)
+                wh_end_date = day + datetime.timedelta(minutes=wh_end)
+                while slot_start < wh_end_date:
+                    slot_end = slot_start + timing_resolution
+                    if now <= slot_start and slot_end <= end:
+                        for v_start, v_end in studio_vacations:
+                            if slot_start < v_end and v_start < slot_end:
+                                break
+                        else:
+                            self.slot_starts.append(slot_start)
+                    slot_start = slot_end
+            day += one_day
+
+        slot_count = len(self.slot_starts)
+        self.resource_busy = {}
+        self.resource_allocated = {}
+        self.resource_capacity = {}
+        for user_id in self.efficiencies:
+            self.resource_busy[user_id] = bytearray(slot_count)
+            self.resource_allocated[user_id] = 0
+
+        # user vacations and bookings
+        bookings = [
+            (user_id, v_start, v_end)
+            for user_id, v_start, v_end in self.vacations
+            if user_id is not None
+        ]
+        for time_logs in self.time_logs.values():
+            bookings.extend(time_logs)
+
+        for user_id, b_start, b_end in bookings:
+            busy = self.resource_busy.get(user_id)
+            if busy is None:
+                continue
+            first, last = self._slot_range(b_start, b_end)
+            for i in range(first, last):
+                busy[i] = 1
+
+        for user_id, busy in self.resource_busy.items():
+            self.resource_capacity[user_id] = \
+                max(slot_count - sum(busy), 1)
+
+    def _slot_range(self, start, end):
+        """returns the first and the last + 1 index of the slots overlapping
+        the given date range
+        """
+        import bisect
+        first = bisect.bisect_right(
+            self.slot_starts,
+            start - datetime.timedelta(seconds=self.slot_seconds)
+        )
+        if first < len(self.slot_starts) and \
+           self.slot_starts[first] + \
+           datetime.timedelta(seconds=self.slot_seconds) <= start:
+            first += 1
+        last = bisect.bisect_left(self.slot_starts, end)
+        return first, max(first, last)
+
+    def _slot_index(self, dt):
+        """returns the index of the first working slot starting at or after
+        the given datetime
+        """
+        import bisect
+        return bisect.bisect_left(self.slot_starts, dt)
 
-    def _validate_projects(self, projects):
-        """validates the given projects value
+    def _slot_end(self, index):
+        """returns the end of the slot with the given index
         """
-        if projects is None:
-            projects = []
+        return self.slot_starts[index] + \
+            datetime.timedelta(seconds=self.slot_seconds)
 
-        msg = '%(class)s.projects should be a list of ' \
-            'stalker.models.project.Project instances, not ' \
-            '%(projects_class)s'
+    def _check_slot_index(self, index, task_id):
+        """raises a RuntimeError if the given slot index is beyond the studio
+        end date
+        """
+        if index >= len(self.slot_starts):
+            raise RuntimeError(
+                'Task_%s can not be scheduled before the end of the Studio '
+                '(%s), please extend the Studio.end date' %
+                (task_id, self.studio.end)
+            )
 
-        if not isinstance(projects, list):
-            raise TypeError(
-                msg % {
-                    'class': self.__class__.__name__,
-                    'projects_class': projects.__class__.__name__
-                }
+    def _leaves(self, task_id):
+        """returns the leaf task ids under the given task id
+        """
+        leaves = []
+        to_visit = [task_id]
+        while to_visit:
+            current = to_visit.pop()
+            children = self.children.get(current)
+            if children:
+                to_visit.extend(children)
+            else:
+                leaves.append(current)
+        return leaves
+
+    def _ancestors(self, task_id):
+        """returns the given task id and the ids of its parents
+        """
+        ancestors = []
+        while task_id is not None:
+            ancestors.append(task_id)
+            task_id = self.tasks[task_id]['parent_id']
+        return ancestors
+
+    def _earliest_start(self, task_id, node_dates):
+        """returns the earliest possible start date of the given leaf task
+        """
+        from stalker import Task
+        earliest = self._to_utc(self.studio.now)
+        task = self.tasks[task_id]
+        if task['schedule_constraint'] in [1, 3] and task['start']:
+            earliest = max(earliest, task['start'])
+
+        for ancestor_id in self._ancestors(task_id):
+            for dep in self.dependencies.get(ancestor_id, []):
+                dep_id = dep['depends_to_id']
+                if dep_id in node_dates:
+                    dep_start, dep_end = node_dates[dep_id]
+                elif dep_id in self.external_tasks:
+                    dep_start, dep_end = self.external_tasks[dep_id]
+                else:
+                    continue
+
+                if dep['dependency_target'] == 'onstart':
+                    date = dep_start
+                else:
+                    date = dep_end
+
+                if dep['gap_timing'] and dep['gap_unit']:
+                    gap_seconds = Task.to_seconds(
+                        dep['gap_timing'], dep['gap_unit'], dep['gap_model']
+                    )
+                    if dep['gap_model'] == 'duration':
+                        date += datetime.timedelta(seconds=gap_seconds)
+                    else:
+                        # gap in working time
+                        index = self._slot_index(date) + \
+                            int(-(-gap_seconds // self.slot_seconds))
+                        self._check_slot_index(index, task_id)
+                        date = self.slot_starts[index]
+
+                earliest = max(earliest, date)
+
+        return earliest
+
+    def _select_resource(self, task, candidates, slot, strategy, rng):
+        """selects one of the available candidates for the given slot by using
+        the allocation strategy
+        """
+        available = [
+            r for r in candidates
+            if r in self.resource_busy and not self.resource_busy[r][slot]
+        ]
+        if not available:
+            return None
+
+        if strategy == 'order' or len(available) == 1:
+            return available[0]
+        elif strategy == 'random':
+            return rng.choice(available)
+        elif strategy == 'minallocated':
+            return min(available, key=lambda r: self.resource_allocated[r])
+        elif strategy == 'minloaded':
+            return min(
+                available,
+                key=lambda r: self.resource_allocated[r] /
+                float(self.resource_capacity[r])
+            )
+        else:  # maxloaded
+            return max(
+                available,
+                key=lambda r: self.resource_allocated[r] /
+                float(self.resource_capacity[r])
             )
 
-        from stalker import Project
-        for item in projects:
-            if not isinstance(item, Project):
-                raise TypeError(
-                    msg % {
-                        'class': self.__class__.__name__,
-                        'projects_class': item.__class__.__name__
-                    }
+    def _book(self, resource_id, slot):
+        """books the given resource for the given slot
+        """
+        self.resource_busy[resource_id][slot] = 1
+        self.resource_allocated[resource_id] += 1
+
+    def _schedule_leaf(self, task_id, earliest):
+        """schedules the given leaf task and returns its start, end and the
+        allocated resource ids
+        """
+        import random
+        from stalker import Task
+        task = self.tasks[task_id]
+        resource_ids = self.task_resources.get(task_id, [])
+        alternatives = self.task_alternative_resources.get(task_id, [])
+        time_logs = self.time_logs.get(task_id, [])
+
+        schedule_model = task['schedule_model']
+        total_seconds = Task.to_seconds(
+            task['schedule_timing'], task['schedule_unit'], schedule_model
+        ) or 0
+
+        booked_start = None
+        booked_end = None
+        booked_seconds = 0
+        booked_resources = []
+        for resource_id, tlog_start, tlog_end in time_logs:
+            if booked_start is None or tlog_start < booked_start:
+                booked_start = tlog_start
+            if booked_end is None or tlog_end > booked_end:
+                booked_end = tlog_end
+            duration = tlog_end - tlog_start
+            booked_seconds += (duration.days * 86400 + duration.seconds) * \
+                self.efficiencies.get(resource_id, 1.0)
+            if resource_id not in booked_resources:
+                booked_resources.append(resource_id)
+
+        if task['is_milestone'] or (not resource_ids and
+                                    schedule_model == 'effort'):
+            # milestones and tasks without resources
+            return earliest, earliest, []
+
+        first_slot = self._slot_index(earliest)
+        self._check_slot_index(first_slot, task_id)
+
+        if schedule_model == 'duration':
+            start = max(earliest, self.slot_starts[first_slot]) \
+                if booked_start is None else booked_start
+            end = start + datetime.timedelta(seconds=total_seconds)
+            return start, end, resource_ids or booked_resources
+
+        # resource groups, each group is a resource with its alternatives
+        groups = [[resource_id] + [r for r in alternatives if r != resource_id]
+                  for resource_id in resource_ids]
+        strategy = task['allocation_strategy']
+        persistent = task['persistent_allocation']
+        rng = random.Random(task_id)
+        chosen = [None] * len(groups)
+
+        allocated = []
+        start_slot = None
+        end_slot = None
+
+        if schedule_model == 'length':
+            slot_count = int(-(-total_seconds // self.slot_seconds))
+            if booked_start is not None:
+                slot_count -= int(booked_seconds // self.slot_seconds)
+            remaining = max(slot_count, 0)
+        else:
+            remaining = total_seconds - booked_seconds
+
+        slot = first_slot
+        while remaining > 0:
+            self._check_slot_index(slot, task_id)
+            worked = False
+            for i, group in enumerate(groups):
+                if persistent and chosen[i] is not None:
+                    candidates = [chosen[i]]
+                else:
+                    candidates = group
+                resource_id = self._select_resource(
+                    task, candidates, slot, strategy, rng
+                )
+                if resource_id is None:
+                    continue
+                chosen[i] = resource_id
+                self._book(resource_id, slot)
+                if resource_id not in allocated:
+                    allocated.append(resource_id)
+                worked = True
+                if schedule_model == 'effort':
+                    remaining -= \
+                        self.slot_seconds * self.efficiencies[resource_id]
+
+            if schedule_model == 'length':
+                remaining -= 1
+                worked = True
+
+            if worked:
+                if start_slot is None:
+                    start_slot = slot
+                end_slot = slot
+            slot += 1
+
+        start = booked_start
+        end = booked_end
+        if start_slot is not None:
+            slot_start = self.slot_starts[start_slot]
+            slot_end = self._slot_end(end_slot)
+            if start is None or slot_start < start:
+                start = slot_start
+            if end is None or slot_end > end:
+                end = slot_end
+
+        if start is None:
+            # nothing to do
+            start = end = earliest
+
+        for resource_id in booked_resources:
+            if resource_id not in allocated:
+                allocated.append(resource_id)
+
+        return start, end, allocated
+
+    def _solve(self):
+        """schedules all the collected tasks and returns the task and project
+        data
+        """
+        import heapq
+
+        # order the tasks by their hierarchy to mimic the order of the tasks
+        # in the TaskJuggler file
+        order = {}
+        to_visit = []
+        for project_root_id in sorted(self.children.get(None, []),
+                                      reverse=True):
+            to_visit.append(project_root_id)
+        while to_visit:
+            current = to_visit.pop()
+            order[current] = len(order)
+            to_visit.extend(reversed(self.children.get(current, [])))
+
+        leaves = [
+            task_id for task_id in self.tasks
+            if task_id not in self.children
+        ]
+
+        # the number of unfinished leaves under each task
+        remaining_leaves = {}
+        for leaf_id in leaves:
+            for ancestor_id in self._ancestors(leaf_id):
+                remaining_leaves[ancestor_id] = \
+                    remaining_leaves.get(ancestor_id, 0) + 1
+
+        # the number of unresolved dependencies of each task
+        pending = {}
+        dependents = {}
+        for task_id, deps in self.dependencies.items():
+            for dep in deps:
+                dep_id = dep['depends_to_id']
+                if dep_id in self.tasks:
+                    pending[task_id] = pending.get(task_id, 0) + 1
+                    dependents.setdefault(dep_id, []).append(task_id)
+
+        # the number of blocked tasks in the hierarchy of each leaf
+        blocked = {}
+        ready = []
+        for leaf_id in leaves:
+            blocked[leaf_id] = len([
+                ancestor_id for ancestor_id in self._ancestors(leaf_id)
+                if pending.get(ancestor_id)
+            ])
+            if not blocked[leaf_id]:
+                heapq.heappush(
+                    ready,
+                    (-self.tasks[leaf_id]['priority'], order[leaf_id],
+                     leaf_id)
                 )
 
-        return projects
+        node_dates = {}
+        task_data = {}
+        while ready:
+            leaf_id = heapq.heappop(ready)[2]
+            earliest = self._earliest_start(leaf_id, node_dates)
+            start, end, resource_ids = self._schedule_leaf(leaf_id, earliest)
+            task_data[leaf_id] = (start, end, resource_ids)
+
+            released = []
+            for ancestor_id in self._ancestors(leaf_id):
+                if ancestor_id in node_dates:
+                    a_start, a_end = node_dates[ancestor_id]
+                    node_dates[ancestor_id] = \
+                        (min(a_start, start), max(a_end, end))
+                else:
+                    node_dates[ancestor_id] = (start, end)
+
+                remaining_leaves[ancestor_id] -= 1
+                if remaining_leaves[ancestor_id]:
+                    continue
+
+                # this task is completed, release its dependents
+                for dependent_id in dependents.get(ancestor_id, []):
+                    pending[dependent_id] -= 1
+                    if not pending[dependent_id]:
+                        released.append(dependent_id)
+
+            for released_id in released:
+                for released_leaf_id in self._leaves(released_id):
+                    blocked[released_leaf_id] -= 1
+                    if not blocked[released_leaf_id]:
+                        heapq.heappush(
+                            ready,
+                            (-self.tasks[released_leaf_id]['priority'],
+                             order[released_leaf_id], released_leaf_id)
+                        )
 
-    @property
-    def projects(self):
-        """getter for the _project attribute
-        """
-        return self._projects
+        unscheduled = [
+            leaf_id for leaf_id in leaves if leaf_id not in task_data
+        ]
+        if unscheduled:
+            raise RuntimeError(
+                'The following tasks can not be scheduled because of a '
+                'circular dependency: %s' %
+                ', '.join(['Task_%s' % task_id for task_id in unscheduled])
+            )
 
-    @projects.setter
-    def projects(self, projects):
-        """setter for the _project attribute
+        # container tasks and projects
+        project_data = {}
+        for task_id, (start, end) in node_dates.items():
+            if task_id in task_data:
+                continue
+            task_data[task_id] = (start, end, None)
+
+        for task_id in self.children.get(None, []):
+            project_id = self.tasks[task_id]['project_id']
+            start, end = node_dates[task_id]
+            if project_id in project_data:
+                p_start, p_end = project_data[project_id]
+                project_data[project_id] = (min(p_start, start),
+                                            max(p_end, end))
+            else:
+                project_data[project_id] = (start, end)
+
+        if not self.compute_resources:
+            for task_id, (start, end, resource_ids) in task_data.items():
+                task_data[task_id] = (start, end, None)
+
+        return task_data, project_data
+
+    def schedule(self):
+        """Does the scheduling.
         """
-        self._projects = self._validate_projects(projects)
+        # check the studio attribute
+        from stalker import Studio
+
+        if not isinstance(self.studio, Studio):
+            raise TypeError(
+                '%s.studio should be an instance of '
+                'stalker.models.studio.Studio, not %s' %
+                (self.__class__.__name__, self.studio.__class__.__name__)
+            )
+
+        self._start_report()
+        try:
+            self._set_stage('export')
+            project_ids = self._project_ids()
+            self.report['projects'] = len(project_ids)
+            self._collect_data(project_ids)
+            self._create_calendar()
+            self.report['exported_rows'] = len(self.tasks)
+
+            self._set_stage('solve')
+            task_data, project_data = self._solve()
+
+            self._update_db(task_data, project_data)
+        finally:
+            self._finish_report()
+
+        message = 'Scheduled %s tasks in %s projects' % (
+            len(task_data), len(project_data)
+        )
+        logger.debug(message)
+        return message
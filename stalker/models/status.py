@@ -16,7 +16,7 @@
 # You should have received a copy of the Lesser GNU General Public License
 # along with Stalker.  If not, see <http://www.gnu.org/licenses/>
 
-from sqlalchemy import Table, Column, Integer, ForeignKey
+from sqlalchemy import Table, Column, Integer, ForeignKey, event
 from sqlalchemy.orm import relationship, validates
 
 from stalker.db.session import DBSession
@@ -163,6 +163,19 @@ class StatusList(Entity, TargetEntityTypeMixin):
       The StatusList instance can be empty, means it may not have anything in
       its :attr:`.StatusList.statuses`. But it is useless. The validation for
       empty statuses list is left to the SOM user.
+
+    **Looking up Statuses**
+
+    The string indexes are resolved through a dictionary of the lower case
+    names and codes of the :attr:`.statuses`, which is built at the first
+    lookup and rebuilt when the :attr:`.statuses` or the name or code of a
+    :class:`.Status` is changed. So looking up a Status by its code doesn't
+    scan the list anymore.
+
+    The ids of the StatusLists are also cached per ``target_entity_type`` (see
+    :meth:`.for_entity_type`), so the :class:`.StatusMixin` classes don't
+    query the database to find their default StatusList each time a new
+    instance is created.
     """
     __auto_name__ = True
     __tablename__ = "StatusLists"
@@ -170,6 +183,13 @@ class StatusList(Entity, TargetEntityTypeMixin):
 
     __unique_target__ = True
 
+    # the generation of the Status names and codes, incremented when one of
+    # them is changed to invalidate the indices of all the StatusLists
+    _index_generation = 0
+
+    # the ids of the StatusLists per target_entity_type
+    _ids_by_target_entity_type = {}
+
     status_list_id = Column(
         "id",
         Integer,
@@ -220,16 +240,61 @@ class StatusList(Entity, TargetEntityTypeMixin):
         """the indexing attributes for getting item
         """
         with DBSession.no_autoflush:
-            return_item = None
             from stalker import __string_types__
             if isinstance(key, __string_types__):
-                for item in self.statuses:
-                    if item == key:
-                        return_item = item
+                return self._status_index().get(key.lower())
             else:
-                return_item = self.statuses[key]
+                return self.statuses[key]
 
-        return return_item
+    def _status_index(self):
+        """returns a dictionary of the lower case names and codes of the
+        statuses and the Status instances, the dictionary is cached until the
+        statuses or the name or code of a Status is changed
+        """
+        statuses = self.statuses
+        cache = self.__dict__.get('_status_index_cache')
+        if cache is None or cache[0] is not statuses \
+           or cache[1] != StatusList._index_generation:
+            index = {}
+            # the last Status matching the key wins, as it was when the
+            # statuses were scanned one by one
+            for status in statuses:
+                index[status.name.lower()] = status
+                index[status.code.lower()] = status
+            cache = (statuses, StatusList._index_generation, index)
+            self.__dict__['_status_index_cache'] = cache
+        return cache[2]
+
+    @classmethod
+    def for_entity_type(cls, target_entity_type):
+        """returns the StatusList for the given target_entity_type from the
+        database or None if there is no such StatusList.
+
+        The id of the StatusList is cached per target_entity_type, so when the
+        StatusList is already in the session no query is issued.
+
+        :param str target_entity_type: The name of the class.
+        :returns: :class:`.StatusList`
+        """
+        with DBSession.no_autoflush:
+            status_list_id = \
+                cls._ids_by_target_entity_type.get(target_entity_type)
+            if status_list_id is not None:
+                status_list = DBSession.query(cls).get(status_list_id)
+                if status_list is not None and \
+                   status_list.target_entity_type == target_entity_type:
+                    return status_list
+
+            status_list = cls.query\
+                .filter_by(target_entity_type=target_entity_type)\
+                .first()
+
+        if status_list is None:
+            cls._ids_by_target_entity_type.pop(target_entity_type, None)
+        else:
+            cls._ids_by_target_entity_type[target_entity_type] = \
+                status_list.id
+        return status_list
 
     def __setitem__(self, key, value):
         """the indexing attributes for setting item
@@ -247,6 +312,25 @@ class StatusList(Entity, TargetEntityTypeMixin):
         return len(self.statuses)
 
 
+@event.listens_for(StatusList.statuses, 'append')
+@event.listens_for(StatusList.statuses, 'remove')
+def clear_status_index(status_list, status, initiator):
+    """clears the cached status index of the StatusList when its statuses are
+    changed
+    """
+    status_list.__dict__.pop('_status_index_cache', None)
+
+
+@event.listens_for(Status.name, 'set')
+@event.listens_for(Status.code, 'set')
+def invalidate_status_indices(status, value, old_value, initiator):
+    """invalidates the status indices of all the StatusLists when the name or
+    the code of a Status is changed
+    """
+    if value != old_value:
+        StatusList._index_generation += 1
+
+
 # StatusList_Statuses Table
 StatusList_Statuses = Table(
     "StatusList_Statuses", Base.metadata,
@@ -80,8 +80,10 @@ class Studio(Entity, DateRangeMixin, WorkingHoursMixin):
 
       :attr:`.is_scheduling`
       :attr:`.last_scheduled_at`
+      :attr:`.incremental_schedule_cutoff`
       :attr:`.last_scheduled_by`
       :attr:`.last_schedule_message`
+      :attr:`.last_schedule_report`
 
     :param int daily_working_hours: An integer specifying the daily working
       hours for the studio. It is another critical value attribute which
@@ -139,6 +141,12 @@ class Studio(Entity, DateRangeMixin, WorkingHoursMixin):
         GenericDateTime,
         doc='Stores the last schedule date'
     )
+    incremental_schedule_cutoff = Column(
+        GenericDateTime,
+        doc='Stores the scheduling_started_at value of the last successful '
+            'schedule of all the projects, the incremental schedules '
+            'consider the changes done after this date'
+    )
     last_scheduled_by_id = Column(
         Integer,
         ForeignKey('Users.id'),
@@ -154,6 +162,11 @@ class Studio(Entity, DateRangeMixin, WorkingHoursMixin):
         doc='Holds the last schedule message, generally coming generated by '
         'TaskJuggler'
     )
+    last_schedule_report = Column(
+        GenericJSON,
+        doc='Holds the timing report of the last schedule, see '
+            ':class:`.SchedulerBase` for the details of the report'
+    )
 
     def __init__(self,
                  daily_working_hours=None,
@@ -397,12 +410,24 @@ class Studio(Entity, DateRangeMixin, WorkingHoursMixin):
         """
         return Vacation.query.filter(Vacation.user==None).all()
 
-    def schedule(self, scheduled_by=None):
+    def schedule(self, scheduled_by=None, incremental=None):
         """Schedules all the active projects in the studio. Needs a Scheduler,
         so before calling it set a scheduler by using the :attr:`.scheduler`
         attribute.
 
         :param scheduled_by: A User instance who is doing the scheduling.
+        :param bool incremental: If True only the projects that are changed
+          since the :attr:`.incremental_schedule_cutoff` and the projects
+          sharing resources or dependencies with them will be scheduled. If
+          False all the projects will be scheduled. If skipped or None the
+          :attr:`.SchedulerBase.incremental` attribute of the scheduler is
+          used.
+
+        The :attr:`.scheduling_started_at` value is stored as the new
+        :attr:`.incremental_schedule_cutoff` only if the scheduling succeeds
+        and the scheduler is not limited to a set of projects, so the changes
+        done while scheduling and the changes that a failed scheduling has
+        missed are scheduled by the next incremental schedule.
         """
         # check the scheduler first
         if self.scheduler is None or \
@@ -423,6 +448,8 @@ class Studio(Entity, DateRangeMixin, WorkingHoursMixin):
 
             # run the scheduler
             self.scheduler.studio = self
+            if incremental is not None:
+                self.scheduler.incremental = bool(incremental)
         start = time.time()
 
         # commit before scheduling
@@ -431,6 +458,10 @@ class Studio(Entity, DateRangeMixin, WorkingHoursMixin):
         result = None
         try:
             result = self.scheduler.schedule()
+            if not self.scheduler.projects:
+                with DBSession.no_autoflush:
+                    self.incremental_schedule_cutoff = \
+                        self.scheduling_started_at
         finally:
             # in any case set is_scheduling to False
             with DBSession.no_autoflush:
@@ -440,6 +471,7 @@ class Studio(Entity, DateRangeMixin, WorkingHoursMixin):
                 # also store the result
                 # if result:
                 self.last_schedule_message = result
+                self.last_schedule_report = self.scheduler.report
 
                 # And the date the schedule is completed
                 self.last_scheduled_at = datetime.datetime.now(pytz.utc)
@@ -455,6 +487,101 @@ class Studio(Entity, DateRangeMixin, WorkingHoursMixin):
         logger.debug('scheduling took %s seconds' % (end - start))
         return result
 
+    def schedule_async(self, scheduled_by=None, incremental=None):
+        """Runs :meth:`.schedule` in a background thread and returns a
+        :class:`.ScheduleJob` immediately, which can be used to follow the
+        progress of the scheduling, to cancel it or to get its result.
+
+        The background thread uses its own database session. It reloads this
+        Studio by its id, so the studio and the scheduled data should be
+        committed before calling this method. The :attr:`.now` value of this
+        Studio is passed to the reloaded one. The background thread uses a
+        new scheduler of the same class with the same settings as the
+        :attr:`.scheduler` of this Studio, and its
+        :attr:`.SchedulerBase.projects` are reloaded by their ids. The
+        ``report`` of the new scheduler is copied back to the
+        :attr:`.scheduler` of this Studio when the job finishes. The results
+        are committed by the background thread when the scheduling completes
+        successfully and rolled back if it fails or gets cancelled.
+
+        :param scheduled_by: A User instance who is doing the scheduling.
+        :param bool incremental: See :meth:`.schedule`.
+        :returns: :class:`.ScheduleJob`
+        """
+        # check the scheduler first
+        if self.scheduler is None or \
+                not isinstance(self.scheduler, SchedulerBase):
+            raise RuntimeError(
+                'There is no scheduler for this %(class)s, please assign a '
+                'scheduler to the %(class)s.scheduler attribute, before '
+                'calling %(class)s.schedule_async()' %
+                {
+                    'class': self.__class__.__name__
+                }
+            )
+
+        if self.id is None:
+            raise RuntimeError(
+                '%(class)s should be committed to the database before '
+                'calling %(class)s.schedule_async()' %
+                {
+                    'class': self.__class__.__name__
+                }
+            )
+
+        from stalker.models.schedulers import ScheduleJob
+        studio_id = self.id
+        now = self.now
+        scheduled_by_id = scheduled_by.id if scheduled_by else None
+
+        # the instances of the current session can not be used in the
+        # background thread, so collect the values here and create a new
+        # scheduler in the background thread
+        original_scheduler = self.scheduler
+        scheduler_class = original_scheduler.__class__
+        scheduler_settings = original_scheduler._settings()
+        project_ids = [project.id for project in original_scheduler.projects]
+
+        job = ScheduleJob()
+
+        def run():
+            from stalker import Project, User
+            from stalker.db.session import DBSession
+            scheduler = scheduler_class(**scheduler_settings)
+            scheduler.job = job
+            try:
+                if project_ids:
+                    projects = dict(
+                        (project.id, project)
+                        for project in Project.query
+                        .filter(Project.id.in_(project_ids)).all()
+                    )
+                    scheduler.projects = [
+                        projects[project_id] for project_id in project_ids
+                        if project_id in projects
+                    ]
+                studio = Studio.query.get(studio_id)
+                studio.now = now
+                studio.scheduler = scheduler
+                user = None
+                if scheduled_by_id is not None:
+                    user = User.query.get(scheduled_by_id)
+                result = studio.schedule(
+                    scheduled_by=user, incremental=incremental
+                )
+                DBSession.commit()
+                return result
+            except Exception:
+                DBSession.rollback()
+                raise
+            finally:
+                original_scheduler.report = scheduler.report
+                scheduler.job = None
+                DBSession.remove()
+
+        job.start(run)
+        return job
+
     @property
     def weekly_working_hours(self):
         """returns the WorkingHours.weekly_working_hours
@@ -19,15 +19,17 @@
 import datetime
 import logging
 import os
+from contextlib import contextmanager
 
 from sqlalchemy import (Table, Column, Integer, ForeignKey, Boolean, Enum,
-                        Float, event, CheckConstraint)
+                        Float, event, CheckConstraint, Index, Text)
 from sqlalchemy.exc import UnboundExecutionError, OperationalError, \
     InvalidRequestError
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.orm import relationship, validates, synonym, reconstructor
 
 from stalker.db.declarative import Base
+from stalker.db.session import DBSession
 from stalker.models.entity import Entity
 from stalker.models.mixins import (DateRangeMixin, StatusMixin, ReferenceMixin,
                                    ScheduleMixin, DAGMixin)
@@ -208,6 +210,9 @@ class TimeLog(Entity, DateRangeMixin):
         # to correctly function
         task.update_parent_statuses()
 
+        _invalidate_total_logged_seconds(self.task)
+        _invalidate_total_logged_seconds(task)
+
         return task
 
     @validates("resource")
@@ -272,6 +277,340 @@ class TimeLog(Entity, DateRangeMixin):
 
         return resource
 
+    @classmethod
+    def create_in_bulk(cls, rows, created_by=None, chunk_size=500):
+        """Creates TimeLogs from the given ``(task, resource, start, end)``
+        rows with a couple of queries and returns the ids of the created
+        TimeLogs in the order of the rows.
+
+        It does the same checks that are done when a TimeLog is created one by
+        one, but instead of running a query per TimeLog, the existing TimeLogs
+        of the resources between the earliest start and the latest end of the
+        rows are read with one query per ``chunk_size`` resources and the
+        overlaps are checked in memory. The statuses and the dependencies of
+        the tasks are checked once per task, and the rows are inserted with
+        bulk inserts. Then the statuses of the tasks and their parents, the
+        :attr:`.Task.total_logged_seconds` of the parents and the project
+        statistics are updated once per affected task::
+
+          from stalker import TimeLog
+          from stalker.db.session import DBSession
+
+          TimeLog.create_in_bulk([
+              (task1, user1, start1, end1),
+              (task2, user1, start2, end2),
+              (task1, user2, start3, end3),
+          ])
+          DBSession.commit()
+
+        Nothing is created if one of the rows fails the checks. The created
+        TimeLogs are not added to the session, the :attr:`.Task.time_logs`
+        and :attr:`.User.time_logs` attributes of the tasks and resources are
+        expired instead.
+
+        :param rows: A list of ``(task, resource, start, end)`` tuples, where
+          ``task`` is a leaf :class:`.Task`, ``resource`` is a
+          :class:`.User` and ``start`` and ``end`` are
+          :class:`datetime.datetime` instances, which are rounded to the
+          ``timing_resolution`` as in :class:`.DateRangeMixin`.
+        :param created_by: The :class:`.User` who created the TimeLogs.
+        :param int chunk_size: The maximum number of resource ids in one
+          query.
+        :returns: A list of integers.
+        """
+        import uuid
+        import pytz
+        import stalker
+        from stalker import defaults, SimpleEntity, User
+        from stalker.db.session import DBSession
+
+        rows = list(rows)
+        if not rows:
+            return []
+
+        DBSession.flush()
+
+        # check the values
+        time_logs = []
+        tasks = []
+        resources = []
+        seen = set()
+        for task, resource, start, end in rows:
+            if not isinstance(task, Task):
+                raise TypeError(
+                    "%s.task should be an instance of "
+                    "stalker.models.task.Task not %s" %
+                    (cls.__name__, task.__class__.__name__)
+                )
+
+            if resource is None:
+                raise TypeError(
+                    "%s.resource can not be None" % cls.__name__
+                )
+
+            if not isinstance(resource, User):
+                raise TypeError(
+                    "%s.resource should be a stalker.models.auth.User "
+                    "instance not %s" %
+                    (cls.__name__, resource.__class__.__name__)
+                )
+
+            for attr, value in [('start', start), ('end', end)]:
+                if not isinstance(value, datetime.datetime):
+                    raise TypeError(
+                        "%s.%s should be a datetime.datetime instance not "
+                        "%s" % (cls.__name__, attr, value.__class__.__name__)
+                    )
+
+            if end < start:
+                raise ValueError(
+                    "%s.end can not be before %s.start" %
+                    (cls.__name__, cls.__name__)
+                )
+
+            start = cls.round_time(start)
+            end = cls.round_time(end)
+            if end - start < defaults.timing_resolution:
+                end = start + defaults.timing_resolution
+
+            time_logs.append((task, resource, start, end))
+            if id(task) not in seen:
+                seen.add(id(task))
+                tasks.append(task)
+            if id(resource) not in seen:
+                seen.add(id(resource))
+                resources.append(resource)
+
+        with DBSession.no_autoflush:
+            # check the tasks once
+            starts = {}
+            for task, resource, start, end in time_logs:
+                if id(task) not in starts or start < starts[id(task)]:
+                    starts[id(task)] = start
+
+            for task in tasks:
+                cls._check_task(task, starts[id(task)])
+
+            # check overbooking
+            cls._check_overbooking(time_logs, chunk_size)
+
+        # update the tasks, this is done before inserting the rows so the
+        # total_logged_seconds of the parents that are not computed yet are
+        # computed without the new rows
+        durations = {}
+        for task, resource, start, end in time_logs:
+            seconds = int(round((end - start).total_seconds()))
+            durations[id(task)] = durations.get(id(task), 0) + seconds
+
+        now = datetime.datetime.now(pytz.utc)
+        parent_durations = {}
+        parents = []
+        with DBSession.no_autoflush:
+            with Task.batch_status_updates():
+                for task in tasks:
+                    status_list = task.status_list
+                    if task.status in [status_list['RTS'],
+                                       status_list['HREV']]:
+                        task.status = status_list['WIP']
+                    task.update_parent_statuses()
+
+            for task in tasks:
+                parent = task.parent
+                if parent is not None:
+                    if id(parent) not in parent_durations:
+                        parent_durations[id(parent)] = 0
+                        parents.append(parent)
+                    parent_durations[id(parent)] += durations[id(task)]
+                task.date_updated = max(now, task.date_created)
+
+            for parent in parents:
+                parent.total_logged_seconds = \
+                    parent.total_logged_seconds + parent_durations[id(parent)]
+
+        # insert the rows
+        connection = DBSession.connection()
+        simple_entities = SimpleEntity.__table__
+        ids = cls._reserve_ids(connection, simple_entities, len(time_logs))
+        created_by_id = created_by.id if created_by is not None else None
+        entity_rows = [{
+            'entity_type': cls.__name__,
+            'name': '%s_%s' % (cls.__name__, uuid.uuid4().urn.split(':')[2]),
+            'description': '',
+            'created_by_id': created_by_id,
+            'updated_by_id': created_by_id,
+            'date_created': now,
+            'date_updated': now,
+            'generic_text': '',
+            'html_style': '',
+            'html_class': '',
+            'stalker_version': stalker.__version__,
+        } for i in range(len(time_logs))]
+
+        if ids is None:
+            # no sequence, insert one by one to get the ids
+            insert = simple_entities.insert()
+            ids = [
+                connection.execute(insert, row).inserted_primary_key[0]
+                for row in entity_rows
+            ]
+        else:
+            for id_, row in zip(ids, entity_rows):
+                row['id'] = id_
+            connection.execute(simple_entities.insert(), entity_rows)
+
+        connection.execute(
+            Entity.__table__.insert(), [{'id': id_} for id_ in ids]
+        )
+        connection.execute(
+            cls.__table__.insert(), [{
+                'id': id_,
+                'task_id': task.id,
+                'resource_id': resource.id,
+                'start': start,
+                'end': end,
+                'duration': end - start,
+            } for id_, (task, resource, start, end) in zip(ids, time_logs)]
+        )
+
+        # update the project statistics and the session
+        deltas = {}
+        for task in tasks:
+            if task.project_id is not None:
+                delta = deltas.setdefault(task.project_id, [0, 0, {}])
+                delta[1] += durations[id(task)]
+        _store_project_statistics(DBSession(), deltas)
+
+        for task in tasks:
+            _invalidate_total_logged_seconds(task)
+            DBSession.expire(task, ['time_logs'])
+        for resource in resources:
+            DBSession.expire(resource, ['time_logs'])
+
+        return ids
+
+    @classmethod
+    def _check_task(cls, task, start):
+        """checks if TimeLogs starting from the given start date can be
+        created for the given task, the same checks are done in
+        :meth:`._validate_task` for a single TimeLog
+        """
+        if task.is_container:
+            raise ValueError(
+                '%(task)s (id: %(id)s) is a container task, and it is not '
+                'allowed to create TimeLogs for a container task' % {
+                    'task': task.name,
+                    'id': task.id
+                }
+            )
+
+        status_list = task.status_list
+        if task.status in [status_list['WFD'], status_list['OH'],
+                           status_list['STOP'], status_list['CMPL']]:
+            from stalker.exceptions import StatusError
+            raise StatusError(
+                '%(task)s is a %(status)s task, and it is not allowed to '
+                'create TimeLogs for a %(status)s task, please supply a '
+                'RTS, WIP, HREV or DREV task!' % {
+                    'task': task.name,
+                    'status': task.status.code
+                }
+            )
+
+        for task_dependency in task.task_depends_to:
+            dep_task = task_dependency.depends_to
+            violation_date = None
+            if task_dependency.dependency_target == 'onend':
+                if start < dep_task.end:
+                    violation_date = dep_task.end
+            elif task_dependency.dependency_target == 'onstart':
+                if start < dep_task.start:
+                    violation_date = dep_task.start
+
+            if violation_date is not None:
+                from stalker.exceptions import DependencyViolationError
+                raise DependencyViolationError(
+                    'It is not possible to create a TimeLog before '
+                    '%s, which violates the dependency relation of '
+                    '"%s" to "%s"' % (
+                        violation_date,
+                        task.name,
+                        dep_task.name,
+                    )
+                )
+
+    @classmethod
+    def _check_overbooking(cls, time_logs, chunk_size=500):
+        """checks if the given ``(task, resource, start, end)`` values overlap
+        with each other or with the TimeLogs in the database and raises an
+        :class:`.OverBookedError` if they do.
+
+        The TimeLogs of the resources between the earliest start and the
+        latest end are read with one query per ``chunk_size`` resources, and
+        the intervals of each resource are sorted and compared with the
+        interval ending the latest before them.
+        """
+        from sqlalchemy import and_, select
+        from stalker.db.session import DBSession
+
+        # (start, end, is_new) intervals per resource id
+        intervals = {}
+        for task, resource, start, end in time_logs:
+            intervals.setdefault(resource.id, []).append((start, end, True))
+
+        min_start = min(time_log[2] for time_log in time_logs)
+        max_end = max(time_log[3] for time_log in time_logs)
+        table = cls.__table__
+        connection = DBSession.connection()
+        resource_ids = sorted(intervals)
+        for i in range(0, len(resource_ids), chunk_size):
+            chunk = resource_ids[i:i + chunk_size]
+            result = connection.execute(
+                select([table.c.resource_id, table.c.start, table.c.end])
+                .where(
+                    and_(
+                        table.c.resource_id.in_(chunk),
+                        table.c.start < max_end,
+                        table.c.end > min_start
+                    )
+                )
+            )
+            for resource_id, start, end in result:
+                intervals[resource_id].append((start, end, False))
+
+        for resource_id in resource_ids:
+            latest = None
+            for interval in sorted(intervals[resource_id]):
+                if latest is not None and interval[0] < latest[1] and \
+                   (interval[2] or latest[2]):
+                    clashing = latest if interval[2] else interval
+                    from stalker.exceptions import OverBookedError
+                    raise OverBookedError(
+                        "The resource has another TimeLog between %s and %s"
+                        % (clashing[0], clashing[1])
+                    )
+                if latest is None or interval[1] > latest[1]:
+                    latest = interval
+
+    @classmethod
+    def _reserve_ids(cls, connection, table, count):
+        """reserves the given number of ids from the sequence of the id column
+        of the given table and returns them, returns None if the database
+        doesn't have sequences
+        """
+        if connection.engine.dialect.name != 'postgresql':
+            return None
+
+        from sqlalchemy import text
+        result = connection.execute(
+            text(
+                "SELECT nextval(pg_get_serial_sequence(:table, 'id')) "
+                "FROM generate_series(1, :count)"
+            ),
+            table='"%s"' % table.name,
+            count=count
+        )
+        return [r[0] for r in result]
+
     def __eq__(self, other):
         """equality of TimeLog instances
         """
@@ -855,6 +1194,12 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin, D
     __auto_name__ = False
     __tablename__ = "Tasks"
     __mapper_args__ = {'polymorphic_identity': "Task"}
+    __table_args__ = (
+        Index(
+            'ix_Tasks_hierarchy_path', 'hierarchy_path',
+            postgresql_ops={'hierarchy_path': 'text_pattern_ops'}
+        ),
+    )
     task_id = Column(
         "id", Integer, ForeignKey('Entities.id'), primary_key=True,
         doc="""The ``primary_key`` attribute for the ``Tasks`` table used by
@@ -1060,6 +1405,14 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin, D
 
     _review_number = Column("review_number", Integer, default=0)
 
+    _hierarchy_path = Column(
+        "hierarchy_path",
+        Text, nullable=True,
+        doc="""The materialized path of this Task in the task hierarchy, see
+        :attr:`.hierarchy_path`. It is updated by Stalker on flush.
+        """
+    )
+
     good_id = Column(Integer, ForeignKey('Goods.id'))
 
     good = relationship(
@@ -1283,10 +1636,12 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin, D
             )
 
         # check for the circular dependency
-        from stalker.models import check_circular_dependency
+        from stalker.models import (check_circular_hierarchy,
+                                    raise_circular_dependency_error)
         with DBSession.no_autoflush:
-            check_circular_dependency(depends, self, 'depends')
-            check_circular_dependency(depends, self, 'children')
+            if not _task_dependency_order().add_edge(self, depends):
+                raise_circular_dependency_error(depends, self, 'depends')
+            check_circular_hierarchy(depends, self)
 
         # check for circular dependency toward the parent, non of the parents
         # should be depending to the given depends_to_task
@@ -1416,11 +1771,14 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin, D
                     (self.__class__.__name__, parent.__class__.__name__)
                 )
 
-            #with DBSession.no_autoflush:
             # check for cycle
-            from stalker.models import check_circular_dependency
-            check_circular_dependency(self, parent, 'children')
-            check_circular_dependency(self, parent, 'depends')
+            from stalker.models import (check_circular_hierarchy,
+                                        raise_circular_dependency_error)
+            check_circular_hierarchy(self, parent)
+            from stalker.db.session import DBSession
+            with DBSession.no_autoflush:
+                if _task_dependency_order().is_reachable(self, parent):
+                    raise_circular_dependency_error(self, parent, 'depends')
 
         old_parent = self.parent
         new_parent = parent
@@ -1853,12 +2211,113 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin, D
             'utc': pytz.utc
         })
 
+    @property
+    def hierarchy_path(self):
+        """The materialized path of this Task in the task hierarchy.
+
+        It is a string holding the ids of the parents of this Task, starting
+        from the root, and the id of this Task, each followed by a "/"
+        character (ex: "12/34/56/" for a Task with id 56 whose parent has the
+        id 34 and whose root has the id 12). The ``Tasks.hierarchy_path``
+        column is indexed, so the :attr:`.parents`, :attr:`.descendants` and
+        :attr:`.level` attributes are resolved with at most one SELECT instead
+        of walking the hierarchy one lazy load at a time.
+
+        It is updated for the new Tasks and the Tasks with a changed parent
+        (and all of their children) when the session is flushed, so it is None
+        for a Task that is not flushed yet.
+        """
+        return self._hierarchy_path
+
+    def _indexed_hierarchy_path(self):
+        """returns the hierarchy_path value if it can be used to query the
+        hierarchy of this Task, which is the case when this Task is persisted
+        and there are no pending hierarchy changes in its session, otherwise
+        returns None
+        """
+        from sqlalchemy import inspect
+        state = inspect(self)
+        session = state.session
+        if not state.persistent or session is None:
+            return None
+
+        for instance in session.new:
+            if isinstance(instance, Task):
+                return None
+
+        for instance in session.dirty:
+            if isinstance(instance, Task) \
+               and _hierarchy_is_modified(instance):
+                return None
+
+        with session.no_autoflush:
+            return self._hierarchy_path
+
+    @property
+    def parents(self):
+        """Returns all of the parents of this Task starting from the root.
+
+        The parents are retrieved with a single query by using the
+        :attr:`.hierarchy_path`, Tasks that are already in the session are
+        not queried at all.
+        """
+        path = self._indexed_hierarchy_path()
+        if path is None:
+            return super(Task, self).parents
+
+        from sqlalchemy import inspect
+        from sqlalchemy.orm.util import identity_key
+        session = inspect(self).session
+        parent_ids = [int(id_) for id_ in path.split('/')[:-2]]
+
+        parents_by_id = {}
+        missing_ids = []
+        for parent_id in parent_ids:
+            parent = session.identity_map.get(identity_key(Task, parent_id))
+            if parent is None:
+                missing_ids.append(parent_id)
+            else:
+                parents_by_id[parent_id] = parent
+
+        if missing_ids:
+            with session.no_autoflush:
+                for parent in session.query(Task)\
+                        .filter(Task.id.in_(missing_ids)).all():
+                    parents_by_id[parent.id] = parent
+
+        return [parents_by_id[parent_id] for parent_id in parent_ids]
+
+    @property
+    def descendants(self):
+        """Returns all of the children of this Task and their children
+        recursively.
+
+        The descendants are retrieved with a single indexed query by using the
+        :attr:`.hierarchy_path` and each Task comes after its parent in the
+        returned list.
+        """
+        path = self._indexed_hierarchy_path()
+        if path is None:
+            return list(self.walk_hierarchy())[1:]
+
+        from sqlalchemy import inspect
+        session = inspect(self).session
+        with session.no_autoflush:
+            return session.query(Task)\
+                .filter(Task._hierarchy_path.like('%s_%%' % path))\
+                .order_by(Task._hierarchy_path)\
+                .all()
+
     @property
     def level(self):
         """Returns the level of this task. It is a temporary property and will
         be useless when Stalker has its own implementation of a proper Gantt
         Chart. Write now it is used by the jQueryGantt.
         """
+        path = self._indexed_hierarchy_path()
+        if path is not None:
+            return path.count('/')
+
         i = 0
         current = self
         while current:
@@ -1883,17 +2342,27 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin, D
         from stalker.db.session import DBSession
         with DBSession.no_autoflush:
             if self.is_leaf:
+                cache = None
+                if self.id is not None:
+                    cache = _total_logged_seconds_cache()
+                    if self.id in cache:
+                        return cache[self.id]
                 try:
-                    from sqlalchemy import text
-                    sql = """
-                    select
-                        extract(epoch from sum("TimeLogs".end - "TimeLogs".start))
-                    from "TimeLogs"
-                    where "TimeLogs".task_id = :task_id
-                    """
+                    from sqlalchemy import select
                     engine = DBSession.connection().engine
-                    result = engine.execute(text(sql), task_id=self.id).fetchone()
-                    return result[0] if result[0] else 0
+                    time_logs = TimeLog.__table__
+                    total_seconds = \
+                        self._logged_seconds_expression(engine.dialect.name)
+                    result = engine.execute(
+                        select([total_seconds])
+                        .where(time_logs.c.task_id == self.id)
+                    ).fetchone()
+                    seconds = self._to_logged_seconds(
+                        result[0], engine.dialect.name
+                    )
+                    if cache is not None:
+                        cache[self.id] = seconds
+                    return seconds
                 except (UnboundExecutionError, OperationalError) as e:
                     # no database connection
                     # fallback to Python
@@ -1907,6 +2376,100 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin, D
                     self.update_schedule_info()
                 return self._total_logged_seconds
 
+    @classmethod
+    def _logged_seconds_expression(cls, dialect_name):
+        """returns the SQL expression summing the durations of the TimeLogs
+        in seconds for the given database dialect
+
+        :param str dialect_name: The name of the database dialect.
+        """
+        from sqlalchemy import func, extract
+        time_logs = TimeLog.__table__
+        if dialect_name == 'postgresql':
+            return extract(
+                'epoch',
+                func.sum(time_logs.c.end - time_logs.c.start)
+            )
+        # SQLite3, julianday() returns the date in days as float
+        return func.sum(
+            func.julianday(time_logs.c.end) -
+            func.julianday(time_logs.c.start)
+        ) * 86400
+
+    @classmethod
+    def _to_logged_seconds(cls, value, dialect_name):
+        """converts the value of the logged seconds expression to seconds
+        """
+        if not value:
+            return 0
+        if dialect_name != 'postgresql':
+            return int(round(value))
+        return value
+
+    @classmethod
+    def load_total_logged_seconds(cls, tasks, chunk_size=500):
+        """Loads the :attr:`.total_logged_seconds` values of the given tasks
+        with one query per ``chunk_size`` tasks and returns a dictionary of
+        task ids and total logged seconds.
+
+        The values of the leaf tasks are stored in a cache in the current
+        session, so reading the :attr:`.total_logged_seconds` attribute of
+        these tasks later on doesn't run any query until the TimeLogs of the
+        task are changed or the session is committed or rolled back. Use it
+        before rendering a list of tasks::
+
+          Task.load_total_logged_seconds(tasks)
+          for task in tasks:
+              print(task.name, task.percent_complete)
+
+        :param tasks: A list of :class:`.Task` instances.
+        :param int chunk_size: The maximum number of task ids in one query.
+        """
+        from sqlalchemy import select
+        from stalker.db.session import DBSession
+
+        tasks = [task for task in tasks if task.id is not None]
+        if not tasks:
+            return {}
+
+        engine = DBSession.connection().engine
+        tasks_table = cls.__table__
+        time_logs = TimeLog.__table__
+        total_seconds = cls._logged_seconds_expression(engine.dialect.name)
+        cache = _total_logged_seconds_cache()
+
+        task_ids = sorted(set(task.id for task in tasks))
+        container_ids = set()
+        seconds = {}
+        for i in range(0, len(task_ids), chunk_size):
+            chunk = task_ids[i:i + chunk_size]
+            container_ids.update(
+                r[0] for r in engine.execute(
+                    select([tasks_table.c.parent_id])
+                    .where(tasks_table.c.parent_id.in_(chunk))
+                    .distinct()
+                )
+            )
+            leaf_ids = [id_ for id_ in chunk if id_ not in container_ids]
+            if not leaf_ids:
+                continue
+            result = engine.execute(
+                select([time_logs.c.task_id, total_seconds])
+                .where(time_logs.c.task_id.in_(leaf_ids))
+                .group_by(time_logs.c.task_id)
+            )
+            for task_id, value in result:
+                seconds[task_id] = \
+                    cls._to_logged_seconds(value, engine.dialect.name)
+            for task_id in leaf_ids:
+                seconds.setdefault(task_id, 0)
+                cache[task_id] = seconds[task_id]
+
+        for task in tasks:
+            if task.id in container_ids:
+                seconds[task.id] = task.total_logged_seconds
+        return seconds
+
     def _total_logged_seconds_setter(self, seconds):
         """Setter for total_logged_seconds. Mainly used for container tasks, to
         cache the child logged_seconds
@@ -1999,6 +2562,157 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin, D
             self._schedule_seconds = self.schedule_seconds
             self._total_logged_seconds = self.total_logged_seconds
 
+    @classmethod
+    def _compute_schedule_info_in_bulk(cls, project_id):
+        """computes the total_logged_seconds and schedule_seconds values of
+        all the tasks of the given project from the database without changing
+        anything.
+
+        The schedule info and the logged seconds of all the tasks are read
+        with one aggregate query and the values of the container tasks are
+        summed up from their children in a single bottom-up pass. The changes
+        that are not flushed yet are not included.
+
+        :param int project_id: The id of the :class:`.Project`.
+        :returns: A list of (task_id, parent_id, is_container, stored_values,
+          computed_values) tuples where the parents come before their
+          children, the values are (schedule_seconds, total_logged_seconds)
+          tuples.
+        """
+        from sqlalchemy import select
+        from stalker.db.session import DBSession
+
+        connection = DBSession.connection()
+        tasks_table = cls.__table__
+        time_logs = TimeLog.__table__
+        logged = select([
+            time_logs.c.task_id.label('task_id'),
+            cls._logged_seconds_expression(
+                connection.engine.dialect.name
+            ).label('seconds'),
+        ]).group_by(time_logs.c.task_id).alias('logged')
+
+        result = connection.execute(
+            select([
+                tasks_table.c.id,
+                tasks_table.c.parent_id,
+                tasks_table.c.schedule_timing,
+                tasks_table.c.schedule_unit,
+                tasks_table.c.schedule_model,
+                tasks_table.c.schedule_seconds,
+                tasks_table.c.total_logged_seconds,
+                logged.c.seconds,
+            ]).select_from(
+                tasks_table.outerjoin(
+                    logged, logged.c.task_id == tasks_table.c.id
+                )
+            ).where(tasks_table.c.project_id == project_id)
+        )
+
+        ids = []
+        parent_ids = []
+        stored = []
+        schedule_seconds = []
+        logged_seconds = []
+        for r in result:
+            ids.append(r[0])
+            parent_ids.append(r[1])
+            stored.append((r[5], r[6]))
+            schedule_seconds.append(
+                int(cls.to_seconds(r[2], r[3], r[4]) or 0)
+            )
+            logged_seconds.append(int(round(r[7])) if r[7] else 0)
+
+        index = dict((id_, i) for i, id_ in enumerate(ids))
+        parents = [index.get(parent_id) for parent_id in parent_ids]
+        children = {}
+        for i, parent in enumerate(parents):
+            children.setdefault(parent, []).append(i)
+
+        # parents come before their children in the order
+        order = list(children.get(None, []))
+        for i in order:
+            order.extend(children.get(i, []))
+
+        for i in order:
+            if i in children:
+                # the sums of the children are added below
+                schedule_seconds[i] = 0
+                logged_seconds[i] = 0
+
+        for i in reversed(order):
+            parent = parents[i]
+            if parent is not None:
+                schedule_seconds[parent] += schedule_seconds[i]
+                logged_seconds[parent] += logged_seconds[i]
+
+        return [
+            (ids[i], parent_ids[i], i in children, stored[i],
+             (schedule_seconds[i], logged_seconds[i]))
+            for i in order
+        ]
+
+    @classmethod
+    def _update_schedule_info_in_bulk(cls, project_id):
+        """updates the total_logged_seconds and schedule_seconds values of all
+        the tasks of the given project at once.
+
+        The values are computed with :meth:`._compute_schedule_info_in_bulk`
+        and the changed values are written back with one executemany UPDATE.
+        The tasks that are already loaded in the session are updated in
+        place, unless they have pending changes in these values.
+
+        :param int project_id: The id of the :class:`.Project`.
+        :returns: A dictionary of root task ids and (schedule_seconds,
+          total_logged_seconds) tuples.
+        """
+        from sqlalchemy import bindparam, inspect
+        from sqlalchemy.orm.attributes import set_committed_value
+        from sqlalchemy.orm.util import identity_key
+        from stalker.db.session import DBSession
+
+        rows = cls._compute_schedule_info_in_bulk(project_id)
+
+        changed = [
+            {'b_id': task_id,
+             'b_schedule_seconds': values[0],
+             'b_total_logged_seconds': values[1]}
+            for task_id, _, _, stored, values in rows
+            if stored != values
+        ]
+        if changed:
+            tasks_table = cls.__table__
+            DBSession.connection().execute(
+                tasks_table.update()
+                .where(tasks_table.c.id == bindparam('b_id'))
+                .values(
+                    schedule_seconds=bindparam('b_schedule_seconds'),
+                    total_logged_seconds=bindparam('b_total_logged_seconds')
+                ),
+                changed
+            )
+
+        cache = _total_logged_seconds_cache()
+        identity_map = DBSession.identity_map
+        for task_id, _, is_container, _, values in rows:
+            if not is_container:
+                cache[task_id] = values[1]
+            task = identity_map.get(identity_key(cls, task_id))
+            if task is None:
+                continue
+            attrs = inspect(task).attrs
+            for key, value in zip(
+                    ['_schedule_seconds', '_total_logged_seconds'], values):
+                # do not override the pending changes
+                if not attrs[key].history.has_changes():
+                    set_committed_value(task, key, value)
+
+        return dict(
+            (task_id, values)
+            for task_id, parent_id, _, _, values in rows
+            if parent_id is None
+        )
+
     @property
     def percent_complete(self):
         """returns the percent_complete based on the total_logged_seconds and
@@ -2113,13 +2827,16 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin, D
             .filter(Ticket.links.contains(self))\
             .filter(Ticket.status != status_closed).all()
 
-    def walk_dependencies(self, method=1):
+    def walk_dependencies(self, method=1, prefetch=False):
         """Walks the dependencies of this task
 
         :param method: The walk method, 0: Depth First, 1: Breadth First
+        :param bool prefetch: Load all the dependencies with one query before
+          walking them.
         """
         from stalker.models import walk_hierarchy
-        for t in walk_hierarchy(self, 'depends', method=method):
+        for t in walk_hierarchy(self, 'depends', method=method,
+                                prefetch=prefetch):
             yield t
 
     @validates('good')
@@ -2346,12 +3063,13 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin, D
         self.schedule_timing, self.schedule_unit = \
             self.least_meaningful_time_unit(self.total_logged_seconds)
 
-        # update parent statuses
-        self.update_parent_statuses()
+        with self.batch_status_updates():
+            # update parent statuses
+            self.update_parent_statuses()
 
-        # update dependent task statuses
-        for dep in self.dependent_of:
-            dep.update_status_with_dependent_statuses()
+            # update dependent task statuses
+            for dep in self.dependent_of:
+                dep.update_status_with_dependent_statuses()
 
     def resume(self):
         """Resumes the execution of this task by setting its status to RTS or
@@ -2381,11 +3099,12 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin, D
             # set to WIP
             self.status = wip
 
-        # now update the status with dependencies
-        self.update_status_with_dependent_statuses()
+        with self.batch_status_updates():
+            # now update the status with dependencies
+            self.update_status_with_dependent_statuses()
 
-        # and update parents statuses
-        self.update_parent_statuses()
+            # and update parents statuses
+            self.update_parent_statuses()
 
     def review_set(self, review_number=None):
         """returns the reviews with the given review_number, if review_number
@@ -2425,6 +3144,56 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin, D
 
         return review_set
 
+    @classmethod
+    @contextmanager
+    def batch_status_updates(cls):
+        """A context manager which collects the status updates of the tasks
+        (the calls to :meth:`.update_status_with_dependent_statuses`,
+        :meth:`.update_status_with_children_statuses` and
+        :meth:`.update_parent_statuses`) and applies them when the outermost
+        block exits, or when the session is flushed before that.
+
+        The statuses are updated only once per task, and in topological
+        order, so the statuses of the dependencies and the children of a task
+        are updated before the task itself::
+
+          with Task.batch_status_updates():
+              for task in tasks:
+                  task.update_status_with_dependent_statuses()
+                  task.update_parent_statuses()
+
+        The pending updates are discarded if an error is raised in the block.
+        """
+        from stalker.db.session import DBSession
+        info = DBSession().info
+        batch = info.get('stalker.status_batch')
+        if batch is None:
+            batch = info['stalker.status_batch'] = StatusBatch()
+        batch.depth += 1
+        try:
+            yield batch
+        except BaseException:
+            batch.depth -= 1
+            if not batch.depth:
+                info.pop('stalker.status_batch', None)
+            raise
+        batch.depth -= 1
+        if not batch.depth:
+            try:
+                batch.propagate()
+            finally:
+                info.pop('stalker.status_batch', None)
+
+    def update_status(self):
+        """updates the status of this task with the statuses of its children
+        if this is a container task or with the statuses of its dependencies
+        otherwise
+        """
+        if self.is_container:
+            self.update_status_with_children_statuses()
+        else:
+            self.update_status_with_dependent_statuses()
+
     def update_status_with_dependent_statuses(self, removing=None):
         """updates the status by looking at the dependent tasks
 
@@ -2435,6 +3204,12 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin, D
             # do nothing, its status will be decided by its children
             return
 
+        batch = _status_batch()
+        if batch is not None and not batch.propagating and removing is None:
+            # will be updated when the batch is propagated
+            batch.add(self)
+            return
+
         # in case there is no database
         # try to find the statuses from the status_list attribute
         from stalker.db.session import DBSession
@@ -2591,7 +3366,12 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin, D
         from stalker.db.session import DBSession
         with DBSession.no_autoflush:
             if self.parent:
-                self.parent.update_status_with_children_statuses()
+                batch = _status_batch()
+                if batch is not None:
+                    # will be updated when the batch is propagated
+                    batch.add(self.parent)
+                else:
+                    self.parent.update_status_with_children_statuses()
 
     def update_status_with_children_statuses(self):
         """updates the task status according to its children statuses
@@ -2605,6 +3385,12 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin, D
             logger.debug('not a container returning!')
             return
 
+        batch = _status_batch()
+        if batch is not None and not batch.propagating:
+            # will be updated when the batch is propagated
+            batch.add(self)
+            return
+
         from stalker.db.session import DBSession
         with DBSession.no_autoflush:
             wfd = self.status_list['WFD']
@@ -3012,6 +3798,52 @@ Task_Responsible = Table(
 # *****************************************************************************
 # TimeLog updates the owner tasks parents total_logged_seconds attribute
 # with new duration
+# *****************************************************************************
+# Session cache of the total_logged_seconds of the leaf tasks
+# *****************************************************************************
+def _total_logged_seconds_cache():
+    """returns the dictionary of task ids and total logged seconds stored in
+    the current session
+    """
+    return DBSession().info.setdefault('stalker.total_logged_seconds', {})
+
+
+def _invalidate_total_logged_seconds(task):
+    """removes the cached total logged seconds of the given task
+    """
+    if task is not None and task.id is not None:
+        _total_logged_seconds_cache().pop(task.id, None)
+
+
+@event.listens_for(DBSession, 'after_flush')
+def invalidate_total_logged_seconds_of_flushed_time_logs(session,
+                                                         flush_context):
+    """Removes the cached total logged seconds of the tasks of the TimeLogs
+    that are inserted, updated or deleted in the flush
+
+    :param session: The session that is being flushed
+    :param flush_context: not used
+    """
+    cache = session.info.get('stalker.total_logged_seconds')
+    if not cache:
+        return
+    for instances in [session.new, session.dirty, session.deleted]:
+        for instance in instances:
+            if isinstance(instance, TimeLog):
+                cache.pop(instance.task_id, None)
+
+
+@event.listens_for(DBSession, 'after_commit')
+@event.listens_for(DBSession, 'after_soft_rollback')
+def clear_total_logged_seconds_cache(session, *args):
+    """Clears the cached total logged seconds values of the session
+
+    :param session: The session that is committed or rolled back
+    :param args: not used
+    """
+    session.info.pop('stalker.total_logged_seconds', None)
+
+
 @event.listens_for(TimeLog._start, 'set')
 def update_time_log_task_parents_for_start(
         tlog, new_start, old_start, initiator):
@@ -3025,6 +3857,7 @@ def update_time_log_task_parents_for_start(
     :return: None
     """
     logger.debug('Received set event for new_start in target : %s' % tlog)
+    _invalidate_total_logged_seconds(tlog.task)
     if tlog.end and old_start and new_start:
         old_duration = tlog.end - old_start
         new_duration = tlog.end - new_start
@@ -3043,6 +3876,7 @@ def update_time_log_task_parents_for_end(tlog, new_end, old_end, initiator):
     :return: None
     """
     logger.debug('Received set event for new_end in target : %s' % tlog)
+    _invalidate_total_logged_seconds(tlog.task)
     if tlog.start and isinstance(old_end, datetime.datetime) \
        and isinstance(new_end, datetime.datetime):
         old_duration = old_end - tlog.start
@@ -3202,6 +4036,627 @@ def removed_a_dependency(task, task_dependent, initiator):
     )
 
 
+# *****************************************************************************
+# Batched status updates
+# *****************************************************************************
+class StatusBatch(object):
+    """Collects the tasks that need a status update in a
+    :meth:`.Task.batch_status_updates` block and updates their statuses once
+    per task in topological order, the dependencies and the children of a
+    task are updated before the task itself.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.tasks = []
+        self.task_ids = set()
+        self.propagating = False
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def add(self, task):
+        """adds the given task to the tasks that need a status update
+        """
+        if id(task) not in self.task_ids:
+            self.task_ids.add(id(task))
+            self.tasks.append(task)
+
+    @classmethod
+    def sort_tasks(cls, tasks):
+        """returns the given tasks sorted so that the dependencies and the
+        children of a task that are in the given tasks come before it
+        """
+        task_ids = set(id(task) for task in tasks)
+        sorted_tasks = []
+        visited = set()
+        for task in tasks:
+            if id(task) in visited:
+                continue
+            visited.add(id(task))
+            # iterative post order depth first search
+            stack = [(task, iter(list(task.depends) + task.children))]
+            while stack:
+                current_task, others = stack[-1]
+                for other in others:
+                    if id(other) in task_ids and id(other) not in visited:
+                        visited.add(id(other))
+                        stack.append(
+                            (other, iter(list(other.depends) + other.children))
+                        )
+                        break
+                else:
+                    stack.pop()
+                    sorted_tasks.append(current_task)
+        return sorted_tasks
+
+    def propagate(self):
+        """updates the statuses of the collected tasks and their parents
+        """
+        if self.propagating:
+            return
+        from stalker.db.session import DBSession
+        self.propagating = True
+        try:
+            with DBSession.no_autoflush:
+                while self.tasks:
+                    tasks = self.tasks
+                    # the parents will be updated anyway
+                    for task in list(tasks):
+                        parent = task.parent
+                        while parent is not None \
+                                and id(parent) not in self.task_ids:
+                            self.task_ids.add(id(parent))
+                            tasks.append(parent)
+                            parent = parent.parent
+                    self.tasks = []
+                    for task in self.sort_tasks(tasks):
+                        task.update_status()
+                    # only the tasks added while updating are left
+                    self.task_ids = set(id(task) for task in self.tasks)
+        finally:
+            self.propagating = False
+
+
+def _status_batch():
+    """returns the :class:`.StatusBatch` of the current session if the status
+    updates are being batched, None otherwise
+    """
+    return DBSession().info.get('stalker.status_batch')
+
+
+@event.listens_for(DBSession, 'before_flush')
+def propagate_batched_status_updates(session, flush_context, instances):
+    """Updates the statuses of the tasks collected in a
+    :meth:`.Task.batch_status_updates` block before the session is flushed
+
+    :param session: The session that is being flushed
+    :param flush_context: not used
+    :param instances: not used
+    """
+    batch = session.info.get('stalker.status_batch')
+    if batch is not None and batch.tasks:
+        batch.propagate()
+
+
+# *****************************************************************************
+# Session topological order of the task dependencies
+# *****************************************************************************
+def _task_dependency_order():
+    """returns the :class:`.TopologicalOrder` of the task dependencies stored
+    in the current session
+    """
+    info = DBSession().info
+    try:
+        return info['stalker.task_dependency_order']
+    except KeyError:
+        from stalker.models import TopologicalOrder
+        order = TopologicalOrder('depends', 'dependent_of')
+        info['stalker.task_dependency_order'] = order
+        return order
+
+
+@event.listens_for(TaskDependency.depends_to, 'set', propagate=True)
+def update_task_dependency_order(task_dependency, depends_to, old_value,
+                                 initiator):
+    """Updates the topological order of the task dependencies when a
+    TaskDependency is created with both of its task and depends_to values,
+    which is not validated by :meth:`.Task._validate_task_depends_to`.
+
+    :param task_dependency: The TaskDependency instance
+    :param depends_to: The new depends_to value
+    :param old_value: not used
+    :param initiator: not used
+    """
+    task = task_dependency.task
+    if task is None or depends_to is None:
+        return
+    info = DBSession().info
+    order = info.get('stalker.task_dependency_order')
+    if order is not None and not order.add_edge(task, depends_to):
+        # the dependencies are not acyclic anymore, start over
+        info.pop('stalker.task_dependency_order', None)
+
+
+@event.listens_for(DBSession, 'after_commit')
+@event.listens_for(DBSession, 'after_soft_rollback')
+def clear_task_dependency_order(session, *args):
+    """Clears the topological order of the task dependencies of the session
+
+    :param session: The session that is committed or rolled back
+    :param args: not used
+    """
+    session.info.pop('stalker.task_dependency_order', None)
+
+
+# *****************************************************************************
+# Track the changes that requires a reschedule
+# *****************************************************************************
+@event.listens_for(DBSession, 'before_flush')
+def update_date_updated_for_schedule_changes(session, flush_context,
+                                             instances):
+    """Updates the :attr:`.Task.date_updated` attribute of the tasks that are
+    modified or have their dependencies or time logs modified, and the
+    :attr:`.Project.date_updated` attribute of the projects that have their
+    tasks deleted. So the incremental schedulers can find the projects that
+    need to be rescheduled.
+
+    The changes affecting the schedule of all the projects are also tracked.
+    The ``date_updated`` attribute of the :class:`.Studio`,
+    :class:`.WorkingHours` and :class:`.User` instances are updated when
+    their dates, working hours or efficiencies are changed, and of the
+    :class:`.Vacation` instances when they are modified. The Studios are
+    updated when a User or a Vacation is deleted.
+
+    :param session: The session that is being flushed
+    :param flush_context: not used
+    :param instances: not used
+    """
+    import pytz
+    from sqlalchemy import inspect
+    from stalker.models.auth import User
+    from stalker.models.studio import Studio, Vacation, WorkingHours
+    now = datetime.datetime.now(pytz.utc)
+
+    # the attributes that are affecting the schedule of all the projects
+    schedule_attributes = [
+        (Studio, ['_start', '_end', '_timing_resolution', 'working_hours']),
+        (WorkingHours, ['working_hours', 'daily_working_hours']),
+        (User, ['efficiency']),
+    ]
+
+    def touch(entity):
+        if entity is None or entity in session.deleted:
+            return
+        if not inspect(entity).attrs.date_updated.history.has_changes():
+            entity.date_updated = max(now, entity.date_created)
+
+    def schedule_attributes_are_modified(entity):
+        attrs = inspect(entity).attrs
+        for class_, keys in schedule_attributes:
+            if isinstance(entity, class_):
+                return any(attrs[key].history.has_changes() for key in keys)
+        return False
+
+    with session.no_autoflush:
+        touch_studios = False
+        for instance in list(session.dirty):
+            if isinstance(instance, Task) and session.is_modified(instance):
+                touch(instance)
+            elif isinstance(instance, (TaskDependency, TimeLog)) \
+                    and session.is_modified(instance):
+                touch(instance.task)
+            elif isinstance(instance, Vacation) \
+                    and session.is_modified(instance):
+                touch(instance)
+            elif schedule_attributes_are_modified(instance):
+                touch(instance)
+
+        for instance in list(session.new):
+            if isinstance(instance, (TaskDependency, TimeLog)):
+                touch(instance.task)
+
+        for instance in list(session.deleted):
+            if isinstance(instance, (TaskDependency, TimeLog)):
+                touch(instance.task)
+            elif isinstance(instance, Task):
+                touch(instance.project)
+            elif isinstance(instance, (User, Vacation)):
+                touch_studios = True
+
+        if touch_studios:
+            for studio in Studio.query.all():
+                touch(studio)
+
+
+# *****************************************************************************
+# Maintain the hierarchy paths
+# *****************************************************************************
+def _hierarchy_is_modified(task):
+    """returns True if the parent of the given persistent task is changed but
+    not flushed yet
+    """
+    from sqlalchemy import inspect
+    attrs = inspect(task).attrs
+    return attrs.parent.history.has_changes() or \
+        attrs.parent_id.history.has_changes()
+
+
+@event.listens_for(DBSession, 'after_flush')
+def update_task_hierarchy_paths(session, flush_context):
+    """Updates the :attr:`.Task.hierarchy_path` values of the new Tasks and the
+    Tasks that have their parent changed in the flush, and the paths of all
+    the children of the moved Tasks with a prefix replacement in the
+    database.
+
+    :param session: The session that is being flushed
+    :param flush_context: not used
+    """
+    new_tasks = [
+        instance for instance in session.new if isinstance(instance, Task)
+    ]
+    moved_tasks = [
+        instance for instance in session.dirty
+        if isinstance(instance, Task) and instance not in session.deleted
+        and _hierarchy_is_modified(instance)
+    ]
+    if not new_tasks and not moved_tasks:
+        return
+
+    from sqlalchemy import bindparam, func, literal
+    from sqlalchemy.orm.attributes import set_committed_value
+
+    new_paths = {}
+    with session.no_autoflush:
+        old_paths = {}
+        moved_by_old_path = {}
+        for task in new_tasks:
+            old_paths[task] = None
+        for task in moved_tasks:
+            old_paths[task] = task._hierarchy_path
+            if task._hierarchy_path:
+                moved_by_old_path[task._hierarchy_path] = task
+
+        def remap(path):
+            """returns the given stored path with the prefix of the nearest
+            moved parent replaced with its new path
+            """
+            ids = path.split('/')[:-1]
+            for i in range(len(ids) - 1, 0, -1):
+                prefix = '%s/' % '/'.join(ids[:i])
+                task = moved_by_old_path.get(prefix)
+                if task is not None:
+                    return path_of(task) + path[len(prefix):]
+            return path
+
+        def path_of(task):
+            """returns the new path of the given task
+            """
+            if task in new_paths:
+                return new_paths[task]
+            if task not in old_paths:
+                if task._hierarchy_path is not None:
+                    return remap(task._hierarchy_path)
+                # a task without a path, create it along the way
+                old_paths[task] = None
+            parent = task.parent
+            prefix = path_of(parent) if parent is not None else ''
+            new_paths[task] = '%s%s/' % (prefix, task.id)
+            return new_paths[task]
+
+        for task in new_tasks + moved_tasks:
+            path_of(task)
+
+    tasks_table = Task.__table__
+    connection = session.connection()
+
+    # update the children of the moved tasks, deepest first
+    moved = sorted(
+        (task for task, old_path in old_paths.items()
+         if old_path and old_path != new_paths[task]),
+        key=lambda x: -len(old_paths[x])
+    )
+    for task in moved:
+        old_path = old_paths[task]
+        connection.execute(
+            tasks_table.update()
+            .where(tasks_table.c.hierarchy_path.like('%s_%%' % old_path))
+            .values(
+                hierarchy_path=literal(new_paths[task]).concat(
+                    func.substr(tasks_table.c.hierarchy_path,
+                                len(old_path) + 1)
+                )
+            )
+        )
+
+    connection.execute(
+        tasks_table.update()
+        .where(tasks_table.c.id == bindparam('b_id'))
+        .values(hierarchy_path=bindparam('b_hierarchy_path')),
+        [{'b_id': task.id, 'b_hierarchy_path': path}
+         for task, path in new_paths.items()]
+    )
+
+    for task, path in new_paths.items():
+        set_committed_value(task, '_hierarchy_path', path)
+
+    if moved:
+        # update the already loaded children of the moved tasks
+        for instance in session.identity_map.values():
+            if isinstance(instance, Task) and instance not in new_paths \
+               and '_hierarchy_path' in instance.__dict__ \
+               and instance._hierarchy_path is not None:
+                path = remap(instance._hierarchy_path)
+                if path != instance._hierarchy_path:
+                    set_committed_value(instance, '_hierarchy_path', path)
+
+
+# *****************************************************************************
+# Maintain the project statistics
+# *****************************************************************************
+def _attribute_change(instance, key):
+    """returns a tuple of the old and the new value of the attribute with the
+    given key of the given instance, the old value is ``NO_VALUE`` if it is
+    not known
+    """
+    from sqlalchemy import inspect
+    from sqlalchemy.orm.base import NO_VALUE
+    history = inspect(instance).attrs[key].history
+    if not history.has_changes():
+        value = getattr(instance, key)
+        return value, value
+    old = history.deleted[0] if history.deleted else NO_VALUE
+    new = history.added[0] if history.added else None
+    return old, new
+
+
+def _time_log_info(task, start, end):
+    """returns the project id and the duration in seconds of a TimeLog with
+    the given task, start and end values
+    """
+    if task is None or start is None or end is None:
+        return None, 0
+    return task.project_id, int(round((end - start).total_seconds()))
+
+
+@event.listens_for(DBSession, 'after_flush')
+def update_project_statistics(session, flush_context):
+    """Updates the statistics stored in the :class:`.Project` rows with the
+    changes of the TimeLogs, the schedule values of the leaf tasks and the
+    statuses of the tasks in the flush.
+
+    The changes are applied as deltas to the stored values. The statistics
+    of the projects that have tasks created, deleted or moved, or changes
+    with unknown old values are cleared, and they are recomputed the next
+    time they are needed.
+
+    :param session: The session that is being flushed
+    :param flush_context: not used
+    """
+    from sqlalchemy.orm.base import NO_VALUE
+
+    deltas = {}
+    cleared = set()
+    clear_all = [False]
+
+    def add_delta(project_id, schedule_seconds=0, logged_seconds=0,
+                  status_code=None, status_count=0):
+        """adds the given changes to the deltas of the given project
+        """
+        if project_id is None:
+            return
+        delta = deltas.setdefault(project_id, [0, 0, {}])
+        delta[0] += schedule_seconds
+        delta[1] += logged_seconds
+        if status_code is not None:
+            delta[2][status_code] = \
+                delta[2].get(status_code, 0) + status_count
+
+    def clear(project_id):
+        """clears the statistics of the given project, or of all the projects
+        if the project is not known
+        """
+        if project_id is None or project_id is NO_VALUE:
+            clear_all[0] = True
+        else:
+            cleared.add(project_id)
+
+    with session.no_autoflush:
+        for instance in session.new:
+            if isinstance(instance, TimeLog):
+                project_id, seconds = _time_log_info(
+                    instance.task, instance._start, instance._end
+                )
+                add_delta(project_id, logged_seconds=seconds)
+            elif isinstance(instance, Task):
+                clear(instance.project_id)
+
+        for instance in session.deleted:
+            if isinstance(instance, TimeLog):
+                task = instance.__dict__.get('task')
+                if task is None:
+                    clear(None)
+                    continue
+                project_id, seconds = _time_log_info(
+                    task,
+                    instance.__dict__.get('_start'),
+                    instance.__dict__.get('_end')
+                )
+                add_delta(project_id, logged_seconds=-seconds)
+            elif isinstance(instance, Task):
+                clear(instance.__dict__.get('project_id'))
+
+        for instance in session.dirty:
+            if instance in session.deleted or \
+               not session.is_modified(instance):
+                continue
+            if isinstance(instance, TimeLog):
+                old_task, new_task = _attribute_change(instance, 'task')
+                old_start, new_start = _attribute_change(instance, '_start')
+                old_end, new_end = _attribute_change(instance, '_end')
+                if any(value is NO_VALUE
+                       for value in [old_task, old_start, old_end]):
+                    clear(new_task.project_id if new_task else None)
+                    if old_task is not new_task:
+                        clear(None)
+                    continue
+                project_id, seconds = \
+                    _time_log_info(old_task, old_start, old_end)
+                add_delta(project_id, logged_seconds=-seconds)
+                project_id, seconds = \
+                    _time_log_info(new_task, new_start, new_end)
+                add_delta(project_id, logged_seconds=seconds)
+            elif isinstance(instance, Task):
+                old_project, new_project = _attribute_change(instance,
+                                                             '_project')
+                if old_project is not new_project \
+                   or _hierarchy_is_modified(instance):
+                    clear(instance.project_id)
+                    if old_project is NO_VALUE:
+                        clear(None)
+                    elif old_project is not None:
+                        clear(old_project.id)
+                    continue
+
+                project_id = instance.project_id
+                old_status, new_status = _attribute_change(instance, 'status')
+                if old_status is NO_VALUE:
+                    clear(project_id)
+                    continue
+                if old_status is not new_status:
+                    if old_status is not None:
+                        add_delta(project_id, status_code=old_status.code,
+                                  status_count=-1)
+                    if new_status is not None:
+                        add_delta(project_id, status_code=new_status.code,
+                                  status_count=1)
+
+                old_values = []
+                new_values = []
+                for key in ['schedule_timing', 'schedule_unit',
+                            'schedule_model']:
+                    old, new = _attribute_change(instance, key)
+                    old_values.append(old)
+                    new_values.append(new)
+                if old_values != new_values and instance.is_leaf:
+                    if any(value is NO_VALUE for value in old_values):
+                        clear(project_id)
+                        continue
+                    add_delta(
+                        project_id,
+                        schedule_seconds=(
+                            (Task.to_seconds(*new_values) or 0) -
+                            (Task.to_seconds(*old_values) or 0)
+                        )
+                    )
+
+    _store_project_statistics(session, deltas, cleared, clear_all[0])
+
+
+def _store_project_statistics(session, deltas, cleared=(), clear_all=False):
+    """Applies the given deltas to the statistics stored in the
+    :class:`.Project` rows and clears the statistics of the given projects.
+
+    :param session: The session to use.
+    :param dict deltas: A dictionary of project ids and
+      ``[schedule_seconds, logged_seconds, {status_code: count}]`` lists of
+      changes.
+    :param cleared: The ids of the projects to clear the statistics of.
+    :param bool clear_all: Clears the statistics of all the projects if True.
+    """
+    from sqlalchemy import bindparam, select
+    from sqlalchemy.orm.attributes import set_committed_value
+    from sqlalchemy.orm.util import identity_key
+    from stalker.models.project import Project
+
+    if not deltas and not cleared and not clear_all:
+        return
+
+    projects_table = Project.__table__
+    connection = session.connection()
+    identity_map = session.identity_map
+    if clear_all:
+        query = projects_table.update()
+    else:
+        query = projects_table.update() \
+            .where(projects_table.c.id.in_(sorted(cleared)))
+    if clear_all or cleared:
+        connection.execute(
+            query.values(
+                schedule_seconds=None,
+                total_logged_seconds=None,
+                task_status_counts=None
+            )
+        )
+
+    project_ids = sorted(
+        project_id for project_id in deltas if project_id not in cleared
+    ) if not clear_all else []
+    values = {}
+    if project_ids:
+        result = connection.execute(
+            select([
+                projects_table.c.id,
+                projects_table.c.schedule_seconds,
+                projects_table.c.total_logged_seconds,
+                projects_table.c.task_status_counts,
+            ]).where(projects_table.c.id.in_(project_ids)).with_for_update()
+        )
+        for project_id, schedule_seconds, logged_seconds, status_counts \
+                in result:
+            if schedule_seconds is None or logged_seconds is None \
+               or status_counts is None:
+                # will be computed when needed
+                continue
+            delta = deltas[project_id]
+            status_counts = dict(status_counts)
+            for code, count in delta[2].items():
+                count += status_counts.get(code, 0)
+                if count:
+                    status_counts[code] = count
+                else:
+                    status_counts.pop(code, None)
+            values[project_id] = (
+                int(schedule_seconds + delta[0]),
+                int(logged_seconds + delta[1]),
+                status_counts
+            )
+
+    if values:
+        connection.execute(
+            projects_table.update()
+            .where(projects_table.c.id == bindparam('b_id'))
+            .values(
+                schedule_seconds=bindparam('b_schedule_seconds'),
+                total_logged_seconds=bindparam('b_total_logged_seconds'),
+                task_status_counts=bindparam('b_task_status_counts')
+            ),
+            [{'b_id': project_id,
+              'b_schedule_seconds': value[0],
+              'b_total_logged_seconds': value[1],
+              'b_task_status_counts': value[2]}
+             for project_id, value in values.items()]
+        )
+
+    if clear_all:
+        projects = [
+            instance for instance in identity_map.values()
+            if isinstance(instance, Project)
+        ]
+    else:
+        projects = [
+            identity_map.get(identity_key(Project, project_id))
+            for project_id in list(cleared) + list(values)
+        ]
+    for project in projects:
+        if project is None:
+            continue
+        value = values.get(project.id, (None, None, None))
+        set_committed_value(project, '_schedule_seconds', value[0])
+        set_committed_value(project, '_total_logged_seconds', value[1])
+        set_committed_value(project, '_task_status_counts', value[2])
+
+
 @event.listens_for(TimeLog.__table__, 'after_create')
 def add_exclude_constraint(table, connection, **kwargs):
     """adds the PostgreSQL specific ExcludeConstraint
@@ -578,13 +578,16 @@ class Version(Link, DAGMixin):
             '_' + self.take_name
         )
 
-    def walk_inputs(self, method=0):
+    def walk_inputs(self, method=0, prefetch=False):
         """Walks the inputs of this version
 
         :param method: The walk method, 0: Depth First, 1: Breadth First
+        :param bool prefetch: Load all the inputs with one query before
+          walking them.
         """
         from stalker.models import walk_hierarchy
-        for v in walk_hierarchy(self, 'inputs', method=method):
+        for v in walk_hierarchy(self, 'inputs', method=method,
+                                prefetch=prefetch):
             yield v
 
 # VERSION INPUTS
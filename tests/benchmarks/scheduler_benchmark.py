@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+# Stalker a Production Asset Management System
+# Copyright (C) 2009-2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stalker.
+#
+# Stalker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stalker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stalker.  If not, see <http://www.gnu.org/licenses/>
+"""Benchmarks the stages of the TaskJugglerScheduler over a synthetic studio.
+
+Run it from the root of the repository::
+
+  python -m tests.benchmarks.scheduler_benchmark --projects 10 --depth 3 \\
+      --fan-out 4 --users 50 --output results.json
+
+By default a random PostgreSQL database is created (see
+:func:`stalker.testing.create_random_db`) and dropped at the end, use
+``--database-url sqlite://`` to run it on an in memory SQLite3 database. The
+tj3 stage uses the stub in ``tests/benchmarks/stub_tj3.py`` unless
+``--tj3`` is given the path of a real tj3 executable.
+
+The results are printed (or written to the ``--output`` file) as JSON, with
+the minimum wall time of each stage over the ``--repeat`` runs under the
+``stages`` key and the timings of all the runs under the ``runs`` key.
+"""
+
+import datetime
+import json
+import os
+import platform
+import stat
+import sys
+import tempfile
+import time
+
+STAGES = ['sql_export', 'render', 'file_write', 'tj3', 'csv_parse',
+          'db_write']
+
+
+def create_stub_tj3_command():
+    """creates an executable wrapper calling the stub tj3 with the current
+    Python interpreter and returns its path
+    """
+    stub_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'stub_tj3.py')
+    fd, command_path = tempfile.mkstemp(prefix='stub_tj3_', suffix='.sh')
+    with os.fdopen(fd, 'w') as f:
+        f.write('#!/bin/sh\nexec "%s" "%s" "$@"\n' % (sys.executable,
+                                                       stub_path))
+    os.chmod(command_path, stat.S_IRWXU)
+    return command_path
+
+
+def benchmark_schedule(studio, compute_resources=True):
+    """runs each stage of the TaskJugglerScheduler once and returns a
+    dictionary of stage names and wall times in seconds, along with the
+    ``rows`` and ``tjp_bytes`` values
+
+    :param studio: The :class:`.Studio` to schedule.
+    :param bool compute_resources: The compute_resources value of the
+      scheduler.
+    """
+    from stalker import TaskJugglerScheduler
+    from stalker.db.session import DBSession
+
+    scheduler = TaskJugglerScheduler(studio=studio,
+                                     compute_resources=compute_resources)
+    project_ids = sorted(scheduler._project_ids())
+    timings = {}
+
+    start = time.time()
+    rows = list(scheduler._fetch_task_rows(project_ids))
+    timings['sql_export'] = time.time() - start
+
+    start = time.time()
+    lines = list(scheduler._tjp_task_lines(project_ids, rows))
+    timings['render'] = time.time() - start
+
+    # write the already fetched and rendered data
+    scheduler._fetch_task_rows = lambda ids: rows
+    scheduler._tjp_task_lines = lambda ids, task_rows: lines
+    start = time.time()
+    scheduler._create_tjp_file()
+    scheduler._create_tjp_file_content(project_ids)
+    timings['file_write'] = time.time() - start
+
+    try:
+        start = time.time()
+        return_code, stderr = scheduler._run_tj3(
+            scheduler.tjp_file_full_path, scheduler.temp_file_path
+        )
+        timings['tj3'] = time.time() - start
+        if return_code:
+            raise RuntimeError(stderr)
+
+        start = time.time()
+        task_data, project_data = \
+            scheduler._read_csv_file(scheduler.csv_file_full_path)
+        timings['csv_parse'] = time.time() - start
+
+        start = time.time()
+        scheduler._update_db(task_data, project_data)
+        DBSession.commit()
+        timings['db_write'] = time.time() - start
+
+        timings['rows'] = len(rows)
+        timings['tjp_bytes'] = os.path.getsize(scheduler.tjp_file_full_path)
+    finally:
+        scheduler._clean_up()
+
+    return timings
+
+
+def run_benchmark(repeat=3, tj3=None, compute_resources=True,
+                  **generator_kwargs):
+    """generates a synthetic studio in the current database and benchmarks
+    the scheduling of it
+
+    :param int repeat: The number of the benchmark runs.
+    :param str tj3: The path of the tj3 executable, if skipped the stub tj3
+      is used.
+    :param bool compute_resources: The compute_resources value of the
+      scheduler.
+    :param generator_kwargs: The arguments passed to
+      :func:`tests.benchmarks.studio_generator.generate_studio`.
+    :returns: A JSON serializable dictionary.
+    """
+    import stalker
+    from stalker import defaults
+    from stalker.db.session import DBSession
+    from tests.benchmarks.studio_generator import generate_studio
+
+    start = time.time()
+    counts = generate_studio(**generator_kwargs)
+    generation_time = time.time() - start
+    studio = counts.pop('studio')
+
+    stub_command = None
+    if tj3 is None:
+        stub_command = tj3 = create_stub_tj3_command()
+
+    tj_command = defaults['tj_command']
+    defaults['tj_command'] = tj3
+    runs = []
+    try:
+        for i in range(repeat):
+            runs.append(benchmark_schedule(studio, compute_resources))
+    finally:
+        defaults['tj_command'] = tj_command
+        if stub_command:
+            os.remove(stub_command)
+
+    return {
+        'stalker_version': stalker.__version__,
+        'python_version': platform.python_version(),
+        'database': DBSession.connection().engine.dialect.name,
+        'date': datetime.datetime.utcnow().isoformat(),
+        'tj3': 'stub' if stub_command else tj3,
+        'parameters': dict(
+            generator_kwargs,
+            repeat=repeat,
+            compute_resources=compute_resources
+        ),
+        'counts': counts,
+        'generation_time': generation_time,
+        'rows': runs[0]['rows'] if runs else 0,
+        'tjp_bytes': runs[0]['tjp_bytes'] if runs else 0,
+        'stages': dict(
+            (stage, min(run[stage] for run in runs)) for stage in STAGES
+        ) if runs else {},
+        'runs': runs,
+    }
+
+
+def main(argv=None):
+    """the command line interface of the benchmark
+    """
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='Benchmarks the TaskJugglerScheduler stages over a '
+                    'synthetic studio.'
+    )
+    parser.add_argument('--projects', type=int, default=2)
+    parser.add_argument('--depth', type=int, default=2)
+    parser.add_argument('--fan-out', type=int, default=3)
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--dependency-ratio', type=float, default=0.3)
+    parser.add_argument('--time-logs', type=int, default=1)
+    parser.add_argument('--vacations', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-compute-resources', action='store_true')
+    parser.add_argument('--tj3', default=None,
+                        help='path of a real tj3, the stub is used if '
+                             'skipped')
+    parser.add_argument('--database-url', default=None,
+                        help='a random PostgreSQL database is created if '
+                             'skipped')
+    parser.add_argument('--output', default=None,
+                        help='the JSON file to write the results to, the '
+                             'results are printed if skipped')
+    args = parser.parse_args(argv)
+
+    import stalker
+    from sqlalchemy.pool import NullPool
+    from stalker import db
+    from stalker.config import Config
+    from stalker.db.session import DBSession
+    from stalker.testing import create_random_db, drop_db
+
+    try:
+        os.environ.pop(Config.env_key)
+    except KeyError:
+        # already removed
+        pass
+    stalker.defaults = Config()
+    stalker.defaults.timing_resolution = datetime.timedelta(hours=1)
+
+    database_name = None
+    database_url = args.database_url
+    if database_url is None:
+        database_url, database_name = create_random_db()
+
+    config = {'sqlalchemy.url': database_url}
+    if not database_url.startswith('sqlite'):
+        config['sqlalchemy.poolclass'] = NullPool
+
+    db.setup(config)
+    db.init()
+    try:
+        results = run_benchmark(
+            repeat=args.repeat,
+            tj3=args.tj3,
+            compute_resources=not args.no_compute_resources,
+            projects=args.projects,
+            depth=args.depth,
+            fan_out=args.fan_out,
+            users=args.users,
+            dependency_ratio=args.dependency_ratio,
+            time_logs=args.time_logs,
+            vacations=args.vacations,
+            seed=args.seed,
+        )
+    finally:
+        DBSession.rollback()
+        DBSession.close_all()
+        if database_name:
+            drop_db(database_name)
+
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+# Stalker a Production Asset Management System
+# Copyright (C) 2009-2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stalker.
+#
+# Stalker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stalker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stalker.  If not, see <http://www.gnu.org/licenses/>
+"""A stand-in for tj3 to be used in the scheduling benchmarks.
+
+It is called with the same arguments that the TaskJugglerScheduler passes to
+tj3::
+
+  stub_tj3.py <tjp file> -o <output path>
+
+It doesn't solve anything, it reads the task hierarchy and the first
+allocated resource of each task from the tjp file and writes a csv report
+with canned dates for every project and task, which is enough for the
+scheduler to parse the report and to update the database.
+"""
+
+import os
+import sys
+
+
+def write_csv_report(tjp_file_full_path, output_path):
+    """reads the given tjp file and writes the csv report in to the output
+    path
+    """
+    csv_file_name = None
+    compute_resources = False
+    start_date = '2013-04-15'
+
+    stack = []
+    ids = []
+    resources = {}
+    with open(tjp_file_full_path, 'r') as tjp_file:
+        for line in tjp_file:
+            line = line.strip()
+            if line.startswith('project '):
+                # project <id> "<id>" <start> - <end> {
+                start_date = line.split()[3]
+            elif line.startswith('taskreport '):
+                csv_file_name = line.split('"')[1]
+            elif line.startswith('columns '):
+                compute_resources = 'resources' in line
+            elif line.startswith('allocate ') and stack and stack[-1]:
+                resource = line.split()[1].rstrip(',')
+                resources.setdefault('.'.join(stack), resource)
+
+            if line.endswith('{'):
+                if line.startswith('task '):
+                    stack.append(line.split()[1])
+                    ids.append('.'.join(stack))
+                else:
+                    stack.append(None)
+            elif line == '}':
+                stack.pop()
+
+    start = '%s-09:00' % start_date
+    end = '%s-18:00' % start_date
+    csv_file_full_path = os.path.join(output_path, '%s.csv' % csv_file_name)
+    with open(csv_file_full_path, 'w') as csv_file:
+        header = ['"Id"', '"Start"', '"End"']
+        if compute_resources:
+            header.append('"Resources"')
+        csv_file.write('%s\n' % ';'.join(header))
+        for id_ in ids:
+            row = ['"%s"' % id_, '"%s"' % start, '"%s"' % end]
+            if compute_resources:
+                resource = resources.get(id_)
+                row.append(
+                    '"%s (%s)"' % (resource, resource) if resource else '""'
+                )
+            csv_file.write('%s\n' % ';'.join(row))
+
+    sys.stderr.write('stub tj3: %s tasks\n' % len(ids))
+
+
+if __name__ == '__main__':
+    write_csv_report(sys.argv[1], sys.argv[3])
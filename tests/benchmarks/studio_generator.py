@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+# Stalker a Production Asset Management System
+# Copyright (C) 2009-2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stalker.
+#
+# Stalker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stalker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stalker.  If not, see <http://www.gnu.org/licenses/>
+"""Generates reproducible synthetic studios for the scheduling benchmarks.
+
+The database should be set up and initialized (``db.setup()`` and
+``db.init()``) before calling :func:`generate_studio`. The same arguments
+(including the ``seed``) always generate the same studio.
+"""
+
+import datetime
+import random
+
+import pytz
+
+
+def generate_studio(projects=2, depth=2, fan_out=3, users=10,
+                    dependency_ratio=0.3, time_logs=1, vacations=2, seed=0,
+                    now=datetime.datetime(2013, 4, 15, 0, 0, tzinfo=pytz.utc),
+                    days=365):
+    """Generates a synthetic studio and commits it to the database.
+
+    :param int projects: The number of projects.
+    :param int depth: The depth of the task hierarchy of each project. A
+      depth of 1 creates only leaf tasks directly under the project.
+    :param int fan_out: The number of child tasks of each container task and
+      the number of root tasks of each project.
+    :param int users: The number of users, which are randomly assigned as
+      resources and alternative resources to the leaf tasks.
+    :param float dependency_ratio: The probability of a leaf task to depend
+      to one of the previous leaf tasks of the same project.
+    :param int time_logs: The number of TimeLogs entered for each leaf task
+      without any dependencies.
+    :param int vacations: The number of studio wide vacations, the same
+      number of personal vacations are also created.
+    :param int seed: The random seed.
+    :param now: The :attr:`.Studio.now` value, TimeLogs are created before
+      this date and vacations are created after this date.
+    :param int days: The length of the studio in days starting from ``now``.
+    :returns: A dictionary with the :class:`.Studio` instance under the
+      ``studio`` key and the number of created entities under the
+      ``projects``, ``tasks``, ``leaf_tasks``, ``users``, ``dependencies``,
+      ``time_logs`` and ``vacations`` keys.
+    """
+    from stalker import (Project, Repository, Studio, Task, TimeLog, User,
+                         Vacation)
+    from stalker.db.session import DBSession
+
+    rng = random.Random(seed)
+
+    studio = Studio(name='Benchmark Studio', now=now)
+    studio.start = now
+    studio.end = now + datetime.timedelta(days=days)
+    DBSession.add(studio)
+
+    all_users = [
+        User(
+            name='Benchmark User %s' % i,
+            login='benchmark_user%s' % i,
+            email='benchmark_user%s@users.com' % i,
+            password='1234'
+        )
+        for i in range(users)
+    ]
+    DBSession.add_all(all_users)
+
+    repo = Repository(name='Benchmark Repository', code='BR')
+    DBSession.add(repo)
+
+    counts = {
+        'projects': projects,
+        'tasks': 0,
+        'leaf_tasks': 0,
+        'users': users,
+        'dependencies': 0,
+        'time_logs': 0,
+        'vacations': 0,
+    }
+
+    scheduling_units = [('h', 4), ('h', 8), ('d', 1), ('d', 2), ('d', 5)]
+    logged_tasks = []
+    for p in range(projects):
+        project = Project(
+            name='Benchmark Project %s' % p,
+            code='BP%s' % p,
+            repository=repo
+        )
+        DBSession.add(project)
+
+        leaf_tasks = []
+        parents = [None]
+        for level in range(depth):
+            is_leaf = level == depth - 1
+            next_parents = []
+            for parent in parents:
+                for i in range(fan_out):
+                    kwargs = {
+                        'name': 'Task %s' % i,
+                        'project': project,
+                        'parent': parent,
+                    }
+                    if is_leaf:
+                        schedule_unit, schedule_timing = \
+                            rng.choice(scheduling_units)
+                        resources = rng.sample(
+                            all_users, min(len(all_users), rng.randint(1, 2))
+                        )
+                        kwargs.update({
+                            'schedule_timing': schedule_timing,
+                            'schedule_unit': schedule_unit,
+                            'schedule_model': 'effort',
+                            'priority': rng.randint(1, 1000),
+                            'resources': resources,
+                        })
+                        if rng.random() < 0.5:
+                            kwargs['alternative_resources'] = [
+                                user for user in rng.sample(
+                                    all_users, min(len(all_users), 3)
+                                )
+                                if user not in resources
+                            ]
+                            kwargs['allocation_strategy'] = 'minallocated'
+                    task = Task(**kwargs)
+                    counts['tasks'] += 1
+                    if is_leaf:
+                        leaf_tasks.append(task)
+                    else:
+                        next_parents.append(task)
+            parents = next_parents
+
+        for i, task in enumerate(leaf_tasks):
+            if i > 0 and rng.random() < dependency_ratio:
+                task.depends = [leaf_tasks[rng.randint(0, i - 1)]]
+                counts['dependencies'] += 1
+            else:
+                logged_tasks.append(task)
+        counts['leaf_tasks'] += len(leaf_tasks)
+
+    DBSession.flush()
+
+    # enter the time logs before now, without overlapping for the same user
+    user_cursors = dict(
+        (user, now - datetime.timedelta(days=30)) for user in all_users
+    )
+    one_hour = datetime.timedelta(hours=1)
+    for task in logged_tasks:
+        for i in range(time_logs):
+            resource = rng.choice(task.resources)
+            start = user_cursors[resource]
+            end = start + one_hour * rng.randint(1, 3)
+            user_cursors[resource] = end
+            TimeLog(task=task, resource=resource, start=start, end=end)
+            counts['time_logs'] += 1
+
+    # studio wide and personal vacations
+    for i in range(vacations):
+        start = now + datetime.timedelta(days=rng.randint(1, days - 7))
+        DBSession.add(
+            Vacation(start=start, end=start + datetime.timedelta(days=1))
+        )
+        start = now + datetime.timedelta(days=rng.randint(1, days - 7))
+        DBSession.add(
+            Vacation(
+                user=rng.choice(all_users),
+                start=start,
+                end=start + datetime.timedelta(days=rng.randint(1, 5))
+            )
+        )
+        counts['vacations'] += 2
+
+    DBSession.commit()
+
+    counts['studio'] = studio
+    return counts
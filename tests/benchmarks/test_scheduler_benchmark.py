@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+# Stalker a Production Asset Management System
+# Copyright (C) 2009-2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stalker.
+#
+# Stalker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stalker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stalker.  If not, see <http://www.gnu.org/licenses/>
+
+import os
+
+import pytest
+
+
+@pytest.mark.skipif(os.name == 'nt', reason='needs a posix shell')
+def test_scheduler_benchmark_is_working_properly(setup_sqlite3):
+    """testing if the scheduler benchmark generates the studio, runs all the
+    stages with the stub tj3 and writes the results to the database
+    """
+    from stalker import db
+    db.setup()
+    db.init()
+
+    from tests.benchmarks.scheduler_benchmark import run_benchmark, STAGES
+    results = run_benchmark(repeat=2, projects=2, depth=2, fan_out=2,
+                            users=4, seed=1)
+
+    assert results['counts']['projects'] == 2
+    assert results['counts']['tasks'] == 12
+    assert results['counts']['leaf_tasks'] == 8
+    assert results['rows'] == 12
+    assert results['tjp_bytes'] > 0
+    assert len(results['runs']) == 2
+    assert sorted(results['stages']) == sorted(STAGES)
+
+    from stalker import Task
+    leaf_tasks = [task for task in Task.query.all() if task.is_leaf]
+    assert len(leaf_tasks) == 8
+    for task in leaf_tasks:
+        assert task.computed_start is not None
+        assert len(task.computed_resources) == 1
+
+
+def test_studio_generator_is_reproducible(setup_sqlite3):
+    """testing if the studio generator generates the same studio with the
+    same seed
+    """
+    from stalker import db
+    from tests.benchmarks.studio_generator import generate_studio
+
+    def generate():
+        db.setup()
+        db.init()
+        counts = generate_studio(projects=2, depth=3, fan_out=2, users=5,
+                                 seed=5)
+        counts.pop('studio')
+
+        from stalker import Task
+        from stalker.db.session import DBSession
+        tasks = [
+            (task.name, task.schedule_timing, task.schedule_unit,
+             task.priority, sorted(user.login for user in task.resources),
+             len(task.time_logs), len(task.depends))
+            for task in Task.query.order_by(Task.id).all()
+        ]
+        DBSession.remove()
+        return counts, tasks
+
+    assert generate() == generate()
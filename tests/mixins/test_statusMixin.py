@@ -413,6 +413,73 @@ class StatusMixinDBTester(UnitTestDBBase):
         # now check if the status_list is equal to test_status_list
         assert test_StatusListAutoAddClass.status_list == test_status_list
 
+    def test_status_list_attribute_is_skipped_and_the_StatusList_is_cached(self):
+        """testing if the StatusList found in the database is cached and no
+        query is issued to find it again while it is in the session
+        """
+        from sqlalchemy import event
+        from stalker.db.session import DBSession
+        test_status_list = StatusList(
+            name="StatusListAutoAddClass Statuses",
+            statuses=[
+                Status(name="Status1", code="Sts1"),
+                Status(name="Status2", code="Sts2"),
+            ],
+            target_entity_type=StatusListAutoAddClass,
+        )
+        DBSession.add(test_status_list)
+        DBSession.commit()
+
+        obj1 = StatusListAutoAddClass(name="Test StatusListAutoAddClass 1")
+        assert obj1.status_list is test_status_list
+
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        engine = DBSession.connection().engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            obj2 = StatusListAutoAddClass(
+                name="Test StatusListAutoAddClass 2"
+            )
+        finally:
+            event.remove(engine, 'before_cursor_execute',
+                         before_cursor_execute)
+
+        assert obj2.status_list is test_status_list
+        assert statements == []
+
+    def test_status_list_cache_is_invalidated(self):
+        """testing if the cached StatusList is not used when its
+        target_entity_type is changed or it is deleted
+        """
+        from stalker.db.session import DBSession
+        test_status_list1 = StatusList(
+            name="StatusListAutoAddClass Statuses 1",
+            statuses=[Status(name="Status1", code="Sts1")],
+            target_entity_type=StatusListAutoAddClass,
+        )
+        DBSession.add(test_status_list1)
+        DBSession.commit()
+        assert StatusList.for_entity_type('StatusListAutoAddClass') is \
+            test_status_list1
+
+        DBSession.delete(test_status_list1)
+        DBSession.commit()
+        assert StatusList.for_entity_type('StatusListAutoAddClass') is None
+
+        test_status_list2 = StatusList(
+            name="StatusListAutoAddClass Statuses 2",
+            statuses=[Status(name="Status2", code="Sts2")],
+            target_entity_type=StatusListAutoAddClass,
+        )
+        DBSession.add(test_status_list2)
+        DBSession.commit()
+        assert StatusList.for_entity_type('StatusListAutoAddClass') is \
+            test_status_list2
+
     def test_status_list_attribute_is_skipped_and_there_is_a_db_setup_but_no_suitable_StatusList(self):
         """testing if a TypeError will be raised even a database is setup 
         but there is no suitable StatusList for StatusListNoAutoAddClass in 
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+# Stalker a Production Asset Management System
+# Copyright (C) 2009-2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stalker.
+#
+# Stalker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stalker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stalker.  If not, see <http://www.gnu.org/licenses/>
+
+import datetime
+from array import array
+
+import pytest
+import pytz
+
+from stalker import CriticalPathAnalysis
+from stalker.testing import UnitTestDBBase
+
+
+class CriticalPathAnalysisTester(UnitTestDBBase):
+    """tests the stalker.models.analysis.CriticalPathAnalysis class
+    """
+
+    def setUp(self):
+        """set up the test
+        """
+        super(CriticalPathAnalysisTester, self).setUp()
+
+        from stalker import Project, Repository, Task, User
+        from stalker.db.session import DBSession
+        self.test_user1 = User(
+            login='user1',
+            name='User1',
+            email='user1@users.com',
+            password='1234',
+        )
+        self.test_repo = Repository(name='Test Repository', code='TR')
+        self.test_proj1 = Project(
+            name='Test Project 1',
+            code='TP1',
+            repository=self.test_repo,
+        )
+        DBSession.add_all([self.test_user1, self.test_repo, self.test_proj1])
+
+        def create_task(name, day, hours, **kwargs):
+            start = datetime.datetime(2013, 4, day, 0, 0, tzinfo=pytz.utc)
+            task = Task(
+                name=name,
+                project=self.test_proj1,
+                resources=[self.test_user1],
+                **kwargs
+            )
+            # scheduled dates
+            task.computed_start = start
+            task.computed_end = start + datetime.timedelta(hours=hours)
+            return task
+
+        self.create_task = create_task
+
+        #     +-> B (3h) -+
+        # A --|           |--> D (2h)
+        # (9h)+-> C (1h) -+
+        self.test_task_a = create_task('Task A', 16, 9)
+        self.test_task_b = create_task('Task B', 17, 3,
+                                       depends=[self.test_task_a])
+        self.test_task_c = create_task('Task C', 17, 1,
+                                       depends=[self.test_task_a])
+        self.test_task_d = create_task(
+            'Task D', 18, 2, depends=[self.test_task_b, self.test_task_c]
+        )
+        DBSession.add_all([self.test_task_a, self.test_task_b,
+                           self.test_task_c, self.test_task_d])
+        DBSession.commit()
+
+    def test_project_argument_is_not_a_project_instance(self):
+        """testing if a TypeError will be raised when the project argument is
+        not a Project instance
+        """
+        with pytest.raises(TypeError) as cm:
+            CriticalPathAnalysis(project='not a project')
+
+        assert str(cm.value) == \
+            'CriticalPathAnalysis.project should be a ' \
+            'stalker.models.project.Project instance, not str'
+
+    def test_analyze_computes_the_earliest_and_latest_starts(self):
+        """testing if the analyze() method computes the earliest and latest
+        start values and the total float of the tasks
+        """
+        analysis = CriticalPathAnalysis(self.test_proj1).analyze()
+        hour = 3600.0
+
+        assert analysis.start == \
+            datetime.datetime(2013, 4, 16, 0, 0, tzinfo=pytz.utc)
+        assert analysis.project_duration == 14 * hour
+
+        def values(attr):
+            return [
+                getattr(analysis, attr)[analysis.index[task.id]] / hour
+                for task in [self.test_task_a, self.test_task_b,
+                             self.test_task_c, self.test_task_d]
+            ]
+
+        assert values('durations') == [9, 3, 1, 2]
+        assert values('earliest_start') == [0, 9, 9, 12]
+        assert values('earliest_finish') == [9, 12, 10, 14]
+        assert values('latest_start') == [0, 9, 11, 12]
+        assert values('latest_finish') == [9, 12, 12, 14]
+        assert values('total_float') == [0, 0, 2, 0]
+
+    def test_analyze_finds_the_critical_path(self):
+        """testing if the analyze() method finds the critical path
+        """
+        analysis = CriticalPathAnalysis(self.test_proj1).analyze()
+        expected = [self.test_task_a.id, self.test_task_b.id,
+                    self.test_task_d.id]
+        assert analysis.critical_path == expected
+        assert analysis.critical_tasks == expected
+
+    def test_results_returns_dates(self):
+        """testing if the results() method returns the values as dates
+        """
+        analysis = CriticalPathAnalysis(self.test_proj1).analyze()
+        results = analysis.results()
+        assert results[self.test_task_c.id] == {
+            'earliest_start':
+                datetime.datetime(2013, 4, 16, 9, 0, tzinfo=pytz.utc),
+            'earliest_finish':
+                datetime.datetime(2013, 4, 16, 10, 0, tzinfo=pytz.utc),
+            'latest_start':
+                datetime.datetime(2013, 4, 16, 11, 0, tzinfo=pytz.utc),
+            'latest_finish':
+                datetime.datetime(2013, 4, 16, 12, 0, tzinfo=pytz.utc),
+            'total_float': datetime.timedelta(hours=2),
+            'critical': False,
+        }
+        assert results[self.test_task_d.id]['critical'] is True
+
+    def test_gap_and_dependency_target_are_considered(self):
+        """testing if the dependency_target, gap_timing and gap_unit values
+        of the dependencies are considered
+        """
+        from stalker.db.session import DBSession
+        # C starts 4 hours after A starts
+        dep = self.test_task_c.task_depends_to[0]
+        dep.dependency_target = 'onstart'
+        dep.gap_timing = 4
+        dep.gap_unit = 'h'
+        # B starts 1 day of work time (9 hours) after A ends
+        dep = self.test_task_b.task_depends_to[0]
+        dep.gap_timing = 1
+        dep.gap_unit = 'd'
+        dep.gap_model = 'length'
+        DBSession.commit()
+
+        analysis = CriticalPathAnalysis(self.test_proj1).analyze()
+        hour = 3600.0
+        index = analysis.index
+        assert analysis.earliest_start[index[self.test_task_c.id]] == 4 * hour
+        assert analysis.earliest_start[index[self.test_task_b.id]] == \
+            18 * hour
+        assert analysis.project_duration == 23 * hour
+        assert analysis.total_float[index[self.test_task_c.id]] == 16 * hour
+
+    def test_dependencies_of_container_tasks_are_inherited(self):
+        """testing if the dependencies of and to the container tasks are
+        applied to their leaf tasks
+        """
+        from stalker.db.session import DBSession
+        container = self.create_task('Container', 16, 1,
+                                     depends=[self.test_task_d])
+        child1 = self.create_task('Child 1', 20, 5, parent=container)
+        child2 = self.create_task('Child 2', 20, 1, parent=container)
+        after = self.create_task('After', 21, 1, depends=[container])
+        DBSession.add_all([container, child1, child2, after])
+        DBSession.commit()
+
+        analysis = CriticalPathAnalysis(self.test_proj1).analyze()
+        hour = 3600.0
+        index = analysis.index
+        assert container.id not in index
+        assert analysis.earliest_start[index[child1.id]] == 14 * hour
+        assert analysis.earliest_start[index[child2.id]] == 14 * hour
+        assert analysis.earliest_start[index[after.id]] == 19 * hour
+        assert analysis.total_float[index[child2.id]] == 4 * hour
+        assert analysis.critical_path == [
+            self.test_task_a.id, self.test_task_b.id, self.test_task_d.id,
+            child1.id, after.id
+        ]
+
+    def test_analyze_project_without_tasks(self):
+        """testing if the analyze() method works for a project without tasks
+        """
+        from stalker import Project
+        from stalker.db.session import DBSession
+        project = Project(name='Empty Project', code='EP',
+                          repository=self.test_repo)
+        DBSession.add(project)
+        DBSession.commit()
+
+        analysis = CriticalPathAnalysis(project).analyze()
+        assert analysis.start is None
+        assert analysis.project_duration == 0
+        assert analysis.critical_path == []
+        assert analysis.results() == {}
+
+    def test_circular_dependencies_raise_circular_dependency_error(self):
+        """testing if a CircularDependencyError will be raised when the
+        network contains a cycle
+        """
+        from stalker.exceptions import CircularDependencyError
+        analysis = CriticalPathAnalysis(self.test_proj1)
+        analysis.task_ids = array('l', [10, 11, 12])
+        analysis.durations = array('d', [1, 1, 1])
+        # 10 -> 11 -> 12 -> 11
+        analysis.pred_offsets = array('l', [0, 0, 2, 3])
+        analysis.pred_indices = array('l', [0, 2, 1])
+        analysis.lags = array('d', [1, 1, 1])
+
+        with pytest.raises(CircularDependencyError) as cm:
+            analysis._sort_network()
+
+        assert str(cm.value) == \
+            'The dependencies of the tasks with the ids [11, 12] create a ' \
+            'circular dependency'
@@ -103,3 +103,126 @@ def test_local_to_utc_is_working_properly():
     assert utc_from_local.day == utc_without_tz.day
     assert utc_from_local.hour == utc_without_tz.hour
     assert utc_from_local.minute == utc_without_tz.minute
+
+
+def test_walk_hierarchy_is_working_properly():
+    """testing if stalker.models.walk_hierarchy() function is working
+    properly in DFS and BFS modes
+    """
+    from stalker.models import walk_hierarchy
+
+    class Node(object):
+        def __init__(self, name, children=None):
+            self.name = name
+            self.children = children or []
+
+    root = Node('root', [
+        Node('a', [Node('a1'), Node('a2', [Node('a2a')])]),
+        Node('b'),
+        Node('c', [Node('c1')]),
+    ])
+
+    assert [n.name for n in walk_hierarchy(root, 'children')] == \
+        ['root', 'a', 'a1', 'a2', 'a2a', 'b', 'c', 'c1']
+    assert [n.name for n in walk_hierarchy(root, 'children', method=1)] == \
+        ['root', 'a', 'b', 'c', 'a1', 'a2', 'c1', 'a2a']
+
+
+def test_walk_hierarchy_on_a_wide_hierarchy():
+    """testing if stalker.models.walk_hierarchy() function visits all the
+    entities of a wide hierarchy
+    """
+    from stalker.models import walk_hierarchy
+
+    class Node(object):
+        def __init__(self, children=None):
+            self.children = children or []
+
+    leaves = [Node() for i in range(20000)]
+    root = Node(leaves)
+    assert list(walk_hierarchy(root, 'children')) == [root] + leaves
+    assert list(walk_hierarchy(root, 'children', method=1)) == \
+        [root] + leaves
+
+
+class DAGNode(object):
+    """a simple node for TopologicalOrder tests, counting the visits of its
+    edges
+    """
+    visits = 0
+
+    def __init__(self, name):
+        self.name = name
+        self._depends = []
+        self.dependent_of = []
+
+    @property
+    def depends(self):
+        DAGNode.visits += 1
+        return self._depends
+
+    def add_dependency(self, other):
+        self._depends.append(other)
+        other.dependent_of.append(self)
+
+
+def test_topological_order_add_edge_detects_cycles():
+    """testing if stalker.models.TopologicalOrder.add_edge() returns False
+    for an edge creating a cycle
+    """
+    from stalker.models import TopologicalOrder
+    a, b, c = DAGNode('a'), DAGNode('b'), DAGNode('c')
+    order = TopologicalOrder('depends', 'dependent_of')
+    # a -> b -> c
+    assert order.add_edge(a, b) is True
+    a.add_dependency(b)
+    assert order.add_edge(b, c) is True
+    b.add_dependency(c)
+
+    assert order.add_edge(c, a) is False
+    assert order.add_edge(c, c) is False
+    assert order.is_reachable(a, c) is True
+    assert order.is_reachable(c, a) is False
+    assert order.order_of(a) > order.order_of(b) > order.order_of(c)
+
+
+def test_topological_order_reorders_the_affected_entities():
+    """testing if stalker.models.TopologicalOrder.add_edge() keeps the order
+    valid when the new edge doesn't fit in the current order
+    """
+    from stalker.models import TopologicalOrder
+    nodes = [DAGNode('n%s' % i) for i in range(6)]
+    order = TopologicalOrder('depends', 'dependent_of')
+    for node in nodes:
+        order.order_of(node)
+    edges = [(0, 1), (1, 2), (3, 4), (2, 3), (5, 0), (4, 5)]
+    for i, (source, target) in enumerate(edges):
+        added = order.add_edge(nodes[source], nodes[target])
+        if i == len(edges) - 1:
+            # 4 -> 5 -> 0 -> 1 -> 2 -> 3 -> 4
+            assert added is False
+            break
+        assert added is True
+        nodes[source].add_dependency(nodes[target])
+        for s, t in edges[:i + 1]:
+            assert order.order_of(nodes[s]) > order.order_of(nodes[t])
+
+
+def test_topological_order_only_visits_the_affected_region():
+    """testing if stalker.models.TopologicalOrder.add_edge() doesn't walk the
+    whole graph when the new edge fits in the current order
+    """
+    from stalker.models import TopologicalOrder
+    order = TopologicalOrder('depends', 'dependent_of')
+    chain = [DAGNode('n%s' % i) for i in range(1000)]
+    for i in range(1, len(chain)):
+        chain[i].add_dependency(chain[i - 1])
+    order.order_of(chain[-1])
+    assert len(order) == 1000
+
+    new_node = DAGNode('new')
+    order.order_of(new_node)
+    DAGNode.visits = 0
+    assert order.add_edge(new_node, chain[-1]) is True
+    assert order.add_edge(new_node, chain[0]) is True
+    assert DAGNode.visits == 0
@@ -1899,6 +1899,291 @@ task Task_{{task3.id}} "Task_{{task3.id}}" {
 
         assert self.test_project.percent_complete == (1.0 / 44.0 * 100)
 
+    def test_update_schedule_info_updates_all_tasks_at_once(self):
+        """testing if the update_schedule_info() method updates the
+        schedule_seconds and total_logged_seconds values of all the tasks of
+        the project
+        """
+        import datetime
+        import pytz
+        from sqlalchemy import select
+        from stalker import Task, TimeLog
+        from stalker.db.session import DBSession
+        TimeLog(
+            task=self.test_task10,
+            resource=self.test_task10.resources[0],
+            start=datetime.datetime(2013, 8, 1, 3, 0, tzinfo=pytz.utc),
+            duration=datetime.timedelta(hours=3)
+        )
+        DBSession.commit()
+
+        # invalidate the cached values
+        tasks_table = Task.__table__
+        DBSession.connection().execute(
+            tasks_table.update().values(
+                schedule_seconds=None, total_logged_seconds=None
+            )
+        )
+        DBSession.expire_all()
+
+        assert self.test_project.update_schedule_info() == \
+            (44 * 3600, 3 * 3600)
+
+        result = DBSession.connection().execute(
+            select([
+                tasks_table.c.schedule_seconds,
+                tasks_table.c.total_logged_seconds
+            ]).where(tasks_table.c.id == self.test_shot1.id)
+        ).fetchone()
+        assert tuple(result) == (12 * 3600, 3 * 3600)
+        assert self.test_shot1._schedule_seconds == 12 * 3600
+        assert self.test_shot1._total_logged_seconds == 3 * 3600
+
+    def test_schedule_seconds_does_not_write_cleared_statistics(self):
+        """testing if reading the schedule_seconds attribute of a project
+        with cleared statistics doesn't write anything to the database or
+        override the pending changes of the tasks
+        """
+        from sqlalchemy import event, select
+        from stalker import Project, Task
+        from stalker.db.session import DBSession
+
+        expected = self.test_project.update_statistics()['schedule_seconds']
+
+        # clear the statistics
+        projects_table = Project.__table__
+        DBSession.connection().execute(
+            projects_table.update().values(
+                schedule_seconds=None, total_logged_seconds=None,
+                task_status_counts=None
+            )
+        )
+        DBSession.expire_all()
+
+        self.test_task10.schedule_timing = 20
+        self.test_shot1.update_schedule_info()
+        assert self.test_shot1.schedule_seconds == 22 * 3600
+
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        engine = DBSession.connection().engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            assert self.test_project.schedule_seconds == expected
+            assert isinstance(self.test_project.schedule_seconds, int)
+            assert self.test_project.statistics['schedule_seconds'] == \
+                expected
+        finally:
+            event.remove(engine, 'before_cursor_execute',
+                         before_cursor_execute)
+
+        assert not any(
+            statement.strip().upper().startswith('UPDATE')
+            for statement in statements
+        )
+        assert self.test_shot1.schedule_seconds == 22 * 3600
+
+        DBSession.commit()
+        tasks_table = Task.__table__
+        result = DBSession.connection().execute(
+            select([tasks_table.c.schedule_seconds])
+            .where(tasks_table.c.id == self.test_shot1.id)
+        ).fetchone()
+        assert result[0] == 22 * 3600
+        assert self.test_project.schedule_seconds == expected + 10 * 3600
+        assert isinstance(self.test_project.schedule_seconds, int)
+
+    def test_update_schedule_info_returns_None_for_a_new_project(self):
+        """testing if the update_schedule_info() method returns None for a
+        project which is not persisted yet
+        """
+        from stalker import Project
+        new_project = Project(**self.kwargs)
+        assert new_project.update_schedule_info() is None
+        assert new_project.schedule_seconds == 0
+
+    def test_percent_complete_is_read_from_the_stored_statistics(self):
+        """testing if the percent_complete attribute doesn't run any query
+        when the statistics of the project are already loaded
+        """
+        from sqlalchemy import event
+        from stalker.db.session import DBSession
+        # update the stored values first
+        self.test_project.update_statistics()
+
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        engine = DBSession.connection().engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            assert self.test_project.percent_complete == 0
+        finally:
+            event.remove(engine, 'before_cursor_execute',
+                         before_cursor_execute)
+
+        assert len(statements) == 0
+
+    def test_percent_complete_does_not_flush_the_pending_changes(self):
+        """testing if reading the percent_complete attribute doesn't flush
+        the pending changes in the session
+        """
+        import datetime
+        import pytz
+        from stalker import TimeLog
+        from stalker.db.session import DBSession
+        self.test_project.update_statistics()
+        time_log = TimeLog(
+            task=self.test_task1,
+            resource=self.test_task1.resources[0],
+            start=datetime.datetime(2013, 8, 1, 1, 0, tzinfo=pytz.utc),
+            duration=datetime.timedelta(hours=1)
+        )
+        DBSession.add(time_log)
+
+        assert self.test_project.percent_complete == 0
+        assert time_log in DBSession.new
+
+        # the changes are included after the session is flushed
+        DBSession.flush()
+        assert self.test_project.percent_complete == 1.0 / 44.0 * 100
+
+    def stored_statistics(self):
+        """returns the statistics stored in the Projects table for the test
+        project
+        """
+        from sqlalchemy import select
+        from stalker import Project
+        from stalker.db.session import DBSession
+        projects_table = Project.__table__
+        return tuple(DBSession.connection().execute(
+            select([
+                projects_table.c.schedule_seconds,
+                projects_table.c.total_logged_seconds,
+                projects_table.c.task_status_counts,
+            ]).where(projects_table.c.id == self.test_project.id)
+        ).fetchone())
+
+    def test_statistics_attribute_is_working_properly(self):
+        """testing if the statistics attribute returns the schedule info, the
+        percent complete and the task counts per status of the project
+        """
+        from stalker import Task
+        from stalker.db.session import DBSession
+        tasks = Task.query.filter(Task.project == self.test_project).all()
+        status_counts = {}
+        for task in tasks:
+            status_counts[task.status.code] = \
+                status_counts.get(task.status.code, 0) + 1
+
+        statistics = self.test_project.statistics
+        assert statistics == {
+            'schedule_seconds': 44 * 3600,
+            'total_logged_seconds': 0,
+            'percent_complete': 0,
+            'task_status_counts': status_counts,
+        }
+
+        # reading them doesn't store them
+        DBSession.commit()
+        assert self.stored_statistics() == (None, None, None)
+
+        # but updating them does
+        assert self.test_project.update_statistics() == statistics
+        assert self.stored_statistics() == (44 * 3600, 0, status_counts)
+
+    def test_statistics_are_updated_with_time_logs(self):
+        """testing if the stored statistics are updated incrementally when
+        TimeLogs are created, updated and deleted
+        """
+        import datetime
+        import pytz
+        from stalker import TimeLog
+        from stalker.db.session import DBSession
+        self.test_project.update_statistics()
+        DBSession.commit()
+        status_counts = self.stored_statistics()[2]
+
+        time_log = TimeLog(
+            task=self.test_task1,
+            resource=self.test_task1.resources[0],
+            start=datetime.datetime(2013, 8, 1, 1, 0, tzinfo=pytz.utc),
+            duration=datetime.timedelta(hours=1)
+        )
+        DBSession.add(time_log)
+        DBSession.commit()
+        # the task is now WIP
+        status_counts['RTS'] -= 1
+        status_counts['WIP'] = 1
+        assert self.stored_statistics() == (44 * 3600, 3600, status_counts)
+        assert self.test_project.percent_complete == 1.0 / 44.0 * 100
+
+        time_log.end = datetime.datetime(2013, 8, 1, 4, 0, tzinfo=pytz.utc)
+        DBSession.commit()
+        assert self.stored_statistics() == \
+            (44 * 3600, 3 * 3600, status_counts)
+
+        DBSession.delete(time_log)
+        DBSession.commit()
+        assert self.stored_statistics()[:2] == (44 * 3600, 0)
+        assert self.test_project.total_logged_seconds == 0
+
+    def test_statistics_are_updated_with_schedule_and_status_changes(self):
+        """testing if the stored statistics are updated incrementally when the
+        schedule values or the statuses of the tasks are changed
+        """
+        from stalker import Status
+        from stalker.db.session import DBSession
+        self.test_project.update_statistics()
+        DBSession.commit()
+        status_counts = self.stored_statistics()[2]
+
+        old_code = self.test_task1.status.code
+        status_cmpl = Status.query.filter_by(code='CMPL').first()
+        self.test_task1.schedule_timing = 3
+        self.test_task1.status = status_cmpl
+        DBSession.commit()
+
+        status_counts[old_code] -= 1
+        if not status_counts[old_code]:
+            status_counts.pop(old_code)
+        status_counts['CMPL'] = status_counts.get('CMPL', 0) + 1
+        assert self.stored_statistics() == (46 * 3600, 0, status_counts)
+        assert self.test_project.statistics['task_status_counts'] == \
+            status_counts
+
+    def test_statistics_are_recomputed_after_a_new_task(self):
+        """testing if the stored statistics are cleared when a new task is
+        created and computed without being stored when they are read
+        """
+        from stalker import Task
+        from stalker.db.session import DBSession
+        self.test_project.update_statistics()
+        DBSession.commit()
+
+        new_task = Task(
+            name='New Task',
+            parent=self.test_task1,
+            resources=[self.test_user1],
+            schedule_timing=5,
+            schedule_unit='h'
+        )
+        DBSession.add(new_task)
+        DBSession.commit()
+        assert self.stored_statistics() == (None, None, None)
+
+        # test_task1 is now a container
+        assert self.test_project.schedule_seconds == 48 * 3600
+        assert self.stored_statistics() == (None, None, None)
+
+        self.test_project.update_statistics()
+        assert self.stored_statistics()[:2] == (48 * 3600, 0)
+
     def test_clients_argument_is_skipped(self):
         """testing if the clients attribute will be set to None when the
         clients argument is skipped
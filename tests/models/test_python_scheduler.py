@@ -0,0 +1,984 @@
+# -*- coding: utf-8 -*-
+# Stalker a Production Asset Management System
+# Copyright (C) 2009-2018 Erkan Ozgur Yilmaz
+#
+# This file is part of Stalker.
+#
+# Stalker is free software: you can redistribute it and/or modify
+# it under the terms of the Lesser GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License.
+#
+# Stalker is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# Lesser GNU General Public License for more details.
+#
+# You should have received a copy of the Lesser GNU General Public License
+# along with Stalker.  If not, see <http://www.gnu.org/licenses/>
+
+import pytest
+import pytz
+import datetime
+from stalker import PythonScheduler
+from stalker.testing import UnitTestDBBase
+
+
+class PythonSchedulerDBTester(UnitTestDBBase):
+    """tests the stalker.models.scheduler.PythonScheduler class
+    """
+
+    def setUp(self):
+        """set up the test
+        """
+        super(self.__class__, self).setUp()
+
+        # create departments
+        from stalker import Department
+        self.test_dep1 = Department(name='Dep1')
+        self.test_dep2 = Department(name='Dep2')
+
+        # create resources
+        from stalker import User
+        self.test_user1 = User(
+            login='user1',
+            name='User1',
+            email='user1@users.com',
+            password='1234',
+            departments=[self.test_dep1]
+        )
+        from stalker.db.session import DBSession
+        DBSession.add(self.test_user1)
+
+        self.test_user2 = User(
+            login='user2',
+            name='User2',
+            email='user2@users.com',
+            password='1234',
+            departments=[self.test_dep1]
+        )
+        DBSession.add(self.test_user2)
+
+        self.test_user3 = User(
+            login='user3',
+            name='User3',
+            email='user3@users.com',
+            password='1234',
+            departments=[self.test_dep2]
+        )
+        DBSession.add(self.test_user3)
+
+        self.test_user4 = User(
+            login='user4',
+            name='User4',
+            email='user4@users.com',
+            password='1234',
+            departments=[self.test_dep2]
+        )
+        DBSession.add(self.test_user4)
+
+        # user with two departments
+        self.test_user5 = User(
+            login='user5',
+            name='User5',
+            email='user5@users.com',
+            password='1234',
+            departments=[self.test_dep1, self.test_dep2]
+        )
+        DBSession.add(self.test_user5)
+
+        # user with no departments
+        self.test_user6 = User(
+            login='user6',
+            name='User6',
+            email='user6@users.com',
+            password='1234'
+        )
+        DBSession.add(self.test_user6)
+
+        # repository
+        from stalker import Repository
+        self.test_repo = Repository(
+            name='Test Repository',
+            code='TR',
+            linux_path='/mnt/T/',
+            windows_path='T:/',
+            osx_path='/Volumes/T/'
+        )
+        DBSession.add(self.test_repo)
+
+        # statuses
+        from stalker import Status
+        self.test_status1 = Status(name='Status 1', code='STS1')
+        self.test_status2 = Status(name='Status 2', code='STS2')
+        self.test_status3 = Status(name='Status 3', code='STS3')
+        self.test_status4 = Status(name='Status 4', code='STS4')
+        self.test_status5 = Status(name='Status 5', code='STS5')
+        DBSession.add_all([
+            self.test_status1, self.test_status2, self.test_status3,
+            self.test_status4, self.test_status5
+        ])
+
+        # create one project
+        from stalker import Project
+        self.test_proj1 = Project(
+            name='Test Project 1',
+            code='TP1',
+            repository=self.test_repo,
+            start=datetime.datetime(2013, 4, 4, tzinfo=pytz.utc),
+            end=datetime.datetime(2013, 5, 4, tzinfo=pytz.utc)
+        )
+        DBSession.add(self.test_proj1)
+        self.test_proj1.now = datetime.datetime(2013, 4, 4, tzinfo=pytz.utc)
+
+        # create two tasks with the same resources
+        from stalker import Task
+        self.test_task1 = Task(
+            name='Task1',
+            project=self.test_proj1,
+            resources=[self.test_user1, self.test_user2],
+            alternative_resources=[
+                self.test_user3, self.test_user4, self.test_user5
+            ],
+            schedule_model=0,
+            schedule_timing=50,
+            schedule_unit='h',
+        )
+        DBSession.add(self.test_task1)
+
+        self.test_task2 = Task(
+            name='Task2',
+            project=self.test_proj1,
+            resources=[self.test_user1, self.test_user2],
+            alternative_resources=[
+                self.test_user3, self.test_user4, self.test_user5
+            ],
+            depends=[self.test_task1],
+            schedule_model=0,
+            schedule_timing=60,
+            schedule_unit='h',
+            priority=800
+        )
+        DBSession.save(self.test_task2)
+
+
+    def create_studio(self):
+        """creates a studio for the tests
+        """
+        from stalker import Studio
+        test_studio = Studio(
+            name='Test Studio',
+            now=datetime.datetime(2013, 4, 16, 0, 0, tzinfo=pytz.utc)
+        )
+        test_studio.start = \
+            datetime.datetime(2013, 4, 16, 0, 0, tzinfo=pytz.utc)
+        test_studio.end = \
+            datetime.datetime(2013, 4, 30, 0, 0, tzinfo=pytz.utc)
+        test_studio.daily_working_hours = 9
+        from stalker.db.session import DBSession
+        DBSession.add(test_studio)
+        return test_studio
+
+    def test_schedule_will_not_work_when_the_studio_attribute_is_None(self):
+        """testing if a TypeError will be raised when the studio attribute is
+        None
+        """
+        python_sched = PythonScheduler()
+        python_sched.studio = None
+        with pytest.raises(TypeError) as cm:
+            python_sched.schedule()
+
+        assert str(cm.value) == \
+            'PythonScheduler.studio should be an instance of ' \
+            'stalker.models.studio.Studio, not NoneType'
+
+    def test_tasks_are_correctly_scheduled(self):
+        """testing if the tasks are correctly scheduled
+        """
+        python_sched = PythonScheduler(compute_resources=True)
+        python_sched.studio = self.create_studio()
+        python_sched.schedule()
+        from stalker.db.session import DBSession
+        DBSession.commit()
+
+        # check if the task and project timings are all adjusted
+        assert \
+            datetime.datetime(2013, 4, 16, 9, 0, tzinfo=pytz.utc) == \
+            self.test_proj1.computed_start
+        assert \
+            datetime.datetime(2013, 4, 24, 10, 0, tzinfo=pytz.utc) == \
+            self.test_proj1.computed_end
+
+        assert \
+            datetime.datetime(2013, 4, 16, 9, 0, tzinfo=pytz.utc) == \
+            self.test_task1.computed_start
+        assert \
+            datetime.datetime(2013, 4, 18, 16, 0, tzinfo=pytz.utc) == \
+            self.test_task1.computed_end
+        assert len(self.test_task1.computed_resources) == 2
+        assert self.test_user1 in self.test_task1.computed_resources
+        assert self.test_user2 in self.test_task1.computed_resources
+
+        assert \
+            datetime.datetime(2013, 4, 18, 16, 0, tzinfo=pytz.utc) == \
+            self.test_task2.computed_start
+        assert \
+            datetime.datetime(2013, 4, 24, 10, 0, tzinfo=pytz.utc) == \
+            self.test_task2.computed_end
+        # user1 and user2 are already allocated for task1, so the
+        # alternative resources are preferred by the default minallocated
+        # strategy
+        possible_resources = [
+            self.test_user1, self.test_user2, self.test_user3, self.test_user4,
+            self.test_user5
+        ]
+        assert len(self.test_task2.computed_resources) == 2
+        assert self.test_task2.computed_resources[0] in possible_resources
+        assert self.test_task2.computed_resources[1] in possible_resources
+
+    def test_schedule_fills_the_report(self):
+        """testing if the schedule() method fills the report attribute with
+        the stage timings and the row counts
+        """
+        python_sched = PythonScheduler(compute_resources=True)
+        python_sched.studio = self.create_studio()
+        python_sched.schedule()
+
+        report = python_sched.report
+        assert report['scheduler'] == 'PythonScheduler'
+        assert sorted(report['stages']) == ['export', 'solve', 'write']
+        assert report['total'] >= sum(report['stages'].values())
+        assert report['projects'] == 1
+        # test_proj1 has 2 tasks
+        assert report['exported_rows'] == 2
+        assert report['rows_updated']['tasks'] == 2
+        assert report['rows_updated']['projects'] == 1
+        # the computed resources are initially equal to the resources and
+        # each task still has two computed resources after scheduling
+        assert report['rows_updated']['computed_resources_inserted'] == \
+            report['rows_updated']['computed_resources_deleted']
+
+    def test_tasks_are_correctly_scheduled_when_compute_resources_is_False(self):
+        """testing if the tasks are correctly scheduled and the computed
+        resources are not touched when the compute_resources is False
+        """
+        python_sched = PythonScheduler(compute_resources=False)
+        python_sched.studio = self.create_studio()
+        python_sched.schedule()
+        from stalker.db.session import DBSession
+        DBSession.commit()
+
+        assert \
+            datetime.datetime(2013, 4, 16, 9, 0, tzinfo=pytz.utc) == \
+            self.test_task1.computed_start
+        assert \
+            datetime.datetime(2013, 4, 18, 16, 0, tzinfo=pytz.utc) == \
+            self.test_task1.computed_end
+        assert self.test_task1.computed_resources == \
+            [self.test_user1, self.test_user2]
+
+        assert \
+            datetime.datetime(2013, 4, 18, 16, 0, tzinfo=pytz.utc) == \
+            self.test_task2.computed_start
+        assert \
+            datetime.datetime(2013, 4, 24, 10, 0, tzinfo=pytz.utc) == \
+            self.test_task2.computed_end
+
+    def test_alternative_resources_are_used_when_resources_are_busy(self):
+        """testing if the alternative resources are used when the resources
+        are on vacation
+        """
+        from stalker import Vacation
+        from stalker.db.session import DBSession
+        vacation = Vacation(
+            user=self.test_user1,
+            start=datetime.datetime(2013, 4, 1, tzinfo=pytz.utc),
+            end=datetime.datetime(2013, 5, 1, tzinfo=pytz.utc)
+        )
+        DBSession.add(vacation)
+
+        python_sched = PythonScheduler(compute_resources=True)
+        python_sched.studio = self.create_studio()
+        python_sched.schedule()
+        DBSession.commit()
+
+        assert \
+            datetime.datetime(2013, 4, 16, 9, 0, tzinfo=pytz.utc) == \
+            self.test_task1.computed_start
+        assert \
+            datetime.datetime(2013, 4, 18, 16, 0, tzinfo=pytz.utc) == \
+            self.test_task1.computed_end
+        assert self.test_user1 not in self.test_task1.computed_resources
+        assert self.test_user2 in self.test_task1.computed_resources
+        assert len(self.test_task1.computed_resources) == 2
+
+    def test_time_logs_are_counted_towards_the_effort(self):
+        """testing if the entered time logs are counted towards the effort of
+        the task
+        """
+        from stalker import TimeLog
+        from stalker.db.session import DBSession
+        tlog1 = TimeLog(
+            resource=self.test_user1,
+            task=self.test_task1,
+            start=datetime.datetime(2013, 4, 15, 9, 0, tzinfo=pytz.utc),
+            end=datetime.datetime(2013, 4, 15, 18, 0, tzinfo=pytz.utc)
+        )
+        tlog2 = TimeLog(
+            resource=self.test_user2,
+            task=self.test_task1,
+            start=datetime.datetime(2013, 4, 15, 9, 0, tzinfo=pytz.utc),
+            end=datetime.datetime(2013, 4, 15, 18, 0, tzinfo=pytz.utc)
+        )
+        DBSession.add_all([tlog1, tlog2])
+        DBSession.commit()
+
+        python_sched = PythonScheduler()
+        python_sched.studio = self.create_studio()
+        python_sched.schedule()
+        DBSession.commit()
+
+        # 18 hours are already booked, 32 hours left
+        assert \
+            datetime.datetime(2013, 4, 15, 9, 0, tzinfo=pytz.utc) == \
+            self.test_task1.computed_start
+        assert \
+            datetime.datetime(2013, 4, 17, 16, 0, tzinfo=pytz.utc) == \
+            self.test_task1.computed_end
+
+        assert \
+            datetime.datetime(2013, 4, 17, 16, 0, tzinfo=pytz.utc) == \
+            self.test_task2.computed_start
+
+    def test_length_and_duration_based_tasks_are_correctly_scheduled(self):
+        """testing if the length and duration based tasks are correctly
+        scheduled
+        """
+        from stalker import Task
+        from stalker.db.session import DBSession
+        length_task = Task(
+            name='Length Task',
+            project=self.test_proj1,
+            resources=[self.test_user6],
+            schedule_model='length',
+            schedule_timing=2,
+            schedule_unit='d',
+        )
+        duration_task = Task(
+            name='Duration Task',
+            project=self.test_proj1,
+            resources=[self.test_user6],
+            depends=[length_task],
+            schedule_model='duration',
+            schedule_timing=2,
+            schedule_unit='d',
+        )
+        DBSession.add_all([length_task, duration_task])
+        DBSession.commit()
+
+        python_sched = PythonScheduler()
+        python_sched.studio = self.create_studio()
+        python_sched.schedule()
+        DBSession.commit()
+
+        assert \
+            datetime.datetime(2013, 4, 16, 9, 0, tzinfo=pytz.utc) == \
+            length_task.computed_start
+        assert \
+            datetime.datetime(2013, 4, 17, 18, 0, tzinfo=pytz.utc) == \
+            length_task.computed_end
+
+        assert \
+            datetime.datetime(2013, 4, 18, 9, 0, tzinfo=pytz.utc) == \
+            duration_task.computed_start
+        assert \
+            datetime.datetime(2013, 4, 20, 9, 0, tzinfo=pytz.utc) == \
+            duration_task.computed_end
+
+    def test_tasks_of_given_projects_are_correctly_scheduled(self):
+        """testing if only the tasks of the given projects are scheduled
+        """
+        from stalker import Project, Task
+        dummy_project = Project(
+            name='Dummy Project',
+            code='DP',
+            repository=self.test_repo
+        )
+        dt1 = Task(
+            name='Dummy Task 1',
+            project=dummy_project,
+            schedule_timing=4,
+            schedule_unit='h',
+            resources=[self.test_user1]
+        )
+        dt2 = Task(
+            name='Dummy Task 2',
+            project=dummy_project,
+            schedule_timing=4,
+            schedule_unit='h',
+            resources=[self.test_user2]
+        )
+        from stalker.db.session import DBSession
+        DBSession.add_all([dummy_project, dt1, dt2])
+        DBSession.commit()
+
+        python_sched = PythonScheduler(compute_resources=True,
+                                       projects=[dummy_project])
+        python_sched.studio = self.create_studio()
+        python_sched.schedule()
+        DBSession.commit()
+
+        assert self.test_proj1.computed_start is None
+        assert self.test_proj1.computed_end is None
+        assert self.test_task1.computed_start is None
+        assert self.test_task1.computed_end is None
+
+        assert \
+            dt1.computed_start == \
+            datetime.datetime(2013, 4, 16, 9, 0, tzinfo=pytz.utc)
+        assert \
+            dt1.computed_end == \
+            datetime.datetime(2013, 4, 16, 13, 0, tzinfo=pytz.utc)
+        assert dt1.computed_resources == [self.test_user1]
+
+        assert \
+            dt2.computed_start == \
+            datetime.datetime(2013, 4, 16, 9, 0, tzinfo=pytz.utc)
+        assert \
+            dt2.computed_end == \
+            datetime.datetime(2013, 4, 16, 13, 0, tzinfo=pytz.utc)
+        assert dt2.computed_resources == [self.test_user2]
+
+    def test_schedule_raises_a_RuntimeError_if_studio_end_is_not_enough(self):
+        """testing if a RuntimeError will be raised when the tasks can not be
+        fit in to the studio working hours before the studio end
+        """
+        test_studio = self.create_studio()
+        test_studio.end = \
+            datetime.datetime(2013, 4, 20, 0, 0, tzinfo=pytz.utc)
+
+        python_sched = PythonScheduler()
+        python_sched.studio = test_studio
+        with pytest.raises(RuntimeError) as cm:
+            python_sched.schedule()
+
+        assert 'please extend the Studio.end date' in str(cm.value)
+
+    def create_second_project(self, resources):
+        """creates a second project with one task
+        """
+        from stalker import Project, Task
+        from stalker.db.session import DBSession
+        self.test_proj2 = Project(
+            name='Test Project 2',
+            code='TP2',
+            repository=self.test_repo
+        )
+        self.test_task3 = Task(
+            name='Task3',
+            project=self.test_proj2,
+            resources=resources,
+            schedule_timing=4,
+            schedule_unit='h',
+        )
+        DBSession.add_all([self.test_proj2, self.test_task3])
+        DBSession.commit()
+
+    def test_incremental_schedule_only_schedules_the_changed_projects(self):
+        """testing if only the changed projects are scheduled when the
+        incremental argument is True
+        """
+        self.create_second_project(resources=[self.test_user6])
+        test_studio = self.create_studio()
+        test_studio.scheduler = PythonScheduler()
+        test_studio.schedule()
+        from stalker.db.session import DBSession
+        DBSession.commit()
+
+        # move the studio.now and update only the second project
+        test_studio.now = \
+            datetime.datetime(2013, 4, 17, 0, 0, tzinfo=pytz.utc)
+        self.test_task3.schedule_timing = 8
+        DBSession.commit()
+
+        result = test_studio.schedule(incremental=True)
+        DBSession.commit()
+        assert result == 'Scheduled 1 tasks in 1 projects'
+
+        # the first project is not touched
+        assert \
+            datetime.datetime(2013, 4, 16, 9, 0, tzinfo=pytz.utc) == \
+            self.test_task1.computed_start
+
+        assert \
+            datetime.datetime(2013, 4, 17, 9, 0, tzinfo=pytz.utc) == \
+            self.test_task3.computed_start
+        assert \
+            datetime.datetime(2013, 4, 17, 17, 0, tzinfo=pytz.utc) == \
+            self.test_task3.computed_end
+
+    def test_incremental_schedule_includes_projects_sharing_resources(self):
+        """testing if the projects sharing resources with the changed projects
+        are also scheduled when the incremental argument is True
+        """
+        self.create_second_project(resources=[self.test_user1])
+        test_studio = self.create_studio()
+        test_studio.scheduler = PythonScheduler()
+        test_studio.schedule()
+        from stalker.db.session import DBSession
+        DBSession.commit()
+
+        self.test_task3.schedule_timing = 8
+        DBSession.commit()
+
+        result = test_studio.schedule(incremental=True)
+        DBSession.commit()
+        assert result == 'Scheduled 3 tasks in 2 projects'
+
+    def test_incremental_schedule_considers_new_time_logs(self):
+        """testing if the projects with new time logs are scheduled when the
+        incremental argument is True
+        """
+        self.create_second_project(resources=[self.test_user6])
+        test_studio = self.create_studio()
+        test_studio.scheduler = PythonScheduler()
+        test_studio.schedule()
+        from stalker.db.session import DBSession
+        DBSession.commit()
+
+        from stalker import TimeLog
+        tlog = TimeLog(
+            resource=self.test_user6,
+            task=self.test_task3,
+            start=datetime.datetime(2013, 4, 15, 9, 0, tzinfo=pytz.utc),
+            end=datetime.datetime(2013, 4, 15, 11, 0, tzinfo=pytz.utc)
+        )
+        DBSession.add(tlog)
+        DBSession.commit()
+
+        result = test_studio.schedule(incremental=True)
+        DBSession.commit()
+        assert result == 'Scheduled 1 tasks in 1 projects'
+        assert \
+            datetime.datetime(2013, 4, 15, 9, 0, tzinfo=pytz.utc) == \
+            self.test_task3.computed_start
+        assert \
+            datetime.datetime(2013, 4, 16, 11, 0, tzinfo=pytz.utc) == \
+            self.test_task3.computed_end
+
+    def test_incremental_schedule_skips_everything_if_nothing_is_changed(self):
+        """testing if no project is scheduled when nothing is changed since
+        the last schedule and the incremental argument is True
+        """
+        test_studio = self.create_studio()
+        test_studio.scheduler = PythonScheduler()
+        test_studio.schedule()
+        from stalker.db.session import DBSession
+        DBSession.commit()
+
+        result = test_studio.schedule(incremental=True)
+        assert result == 'Scheduled 0 tasks in 0 projects'
+
+
+    def incremental_schedule_after(self, change, setup=None):
+        """schedules the studio, calls the given change function, commits and
+        returns the result of an incremental schedule
+        """
+        from stalker.db.session import DBSession
+        self.create_second_project(resources=[self.test_user6])
+        test_studio = self.create_studio()
+        test_studio.scheduler = PythonScheduler()
+        if setup:
+            setup(test_studio)
+        DBSession.commit()
+        test_studio.schedule()
+        DBSession.commit()
+
+        change(test_studio)
+        DBSession.commit()
+
+        result = test_studio.schedule(incremental=True)
+        DBSession.commit()
+        return result
+
+    def test_incremental_schedule_schedules_all_if_studio_dates_changed(self):
+        """testing if all the projects are scheduled when the studio dates are
+        changed and the incremental argument is True
+        """
+        def change(test_studio):
+            test_studio.end = \
+                datetime.datetime(2013, 5, 30, 0, 0, tzinfo=pytz.utc)
+
+        assert self.incremental_schedule_after(change) == \
+            'Scheduled 3 tasks in 2 projects'
+
+    def test_incremental_schedule_schedules_all_if_working_hours_changed(self):
+        """testing if all the projects are scheduled when the working hours of
+        the studio are changed and the incremental argument is True
+        """
+        def change(test_studio):
+            test_studio.working_hours.daily_working_hours = 10
+
+        assert self.incremental_schedule_after(change) == \
+            'Scheduled 3 tasks in 2 projects'
+
+    def test_incremental_schedule_schedules_all_if_user_efficiency_changed(
+            self):
+        """testing if all the projects are scheduled when the efficiency of a
+        user is changed and the incremental argument is True
+        """
+        def change(test_studio):
+            self.test_user6.efficiency = 2.0
+
+        assert self.incremental_schedule_after(change) == \
+            'Scheduled 3 tasks in 2 projects'
+
+    def test_incremental_schedule_schedules_all_if_a_vacation_is_deleted(
+            self):
+        """testing if all the projects are scheduled when a vacation is
+        deleted and the incremental argument is True
+        """
+        from stalker import Vacation
+        from stalker.db.session import DBSession
+
+        def setup(test_studio):
+            self.test_vacation = Vacation(
+                user=self.test_user6,
+                start=datetime.datetime(2013, 6, 1, tzinfo=pytz.utc),
+                end=datetime.datetime(2013, 6, 10, tzinfo=pytz.utc)
+            )
+            DBSession.add(self.test_vacation)
+
+        def change(test_studio):
+            DBSession.delete(self.test_vacation)
+
+        assert self.incremental_schedule_after(change, setup) == \
+            'Scheduled 3 tasks in 2 projects'
+
+    def create_fourth_task(self, test_studio):
+        """creates a fourth task depending to the third task
+        """
+        from stalker import Task
+        from stalker.db.session import DBSession
+        self.test_task4 = Task(
+            name='Task4',
+            project=self.test_proj2,
+            resources=[self.test_user6],
+            depends=[self.test_task3],
+            schedule_timing=4,
+            schedule_unit='h',
+        )
+        DBSession.add(self.test_task4)
+
+    def test_incremental_schedule_considers_deleted_tasks(self):
+        """testing if the project of a deleted task is scheduled when the
+        incremental argument is True
+        """
+        from stalker.db.session import DBSession
+
+        def change(test_studio):
+            DBSession.delete(self.test_task4)
+
+        assert self.incremental_schedule_after(
+            change, self.create_fourth_task
+        ) == 'Scheduled 1 tasks in 1 projects'
+
+    def test_incremental_schedule_considers_new_dependencies(self):
+        """testing if the project of a task with a new dependency is scheduled
+        when the incremental argument is True
+        """
+        from stalker import Task
+        from stalker.db.session import DBSession
+
+        def setup(test_studio):
+            self.test_task4 = Task(
+                name='Task4',
+                project=self.test_proj2,
+                resources=[self.test_user6],
+                schedule_timing=4,
+                schedule_unit='h',
+            )
+            DBSession.add(self.test_task4)
+
+        def change(test_studio):
+            self.test_task4.depends = [self.test_task3]
+
+        assert self.incremental_schedule_after(change, setup) == \
+            'Scheduled 2 tasks in 1 projects'
+
+    def test_incremental_schedule_considers_deleted_dependencies(self):
+        """testing if the project of a task with a deleted dependency is
+        scheduled when the incremental argument is True
+        """
+        def change(test_studio):
+            self.test_task4.depends = []
+
+        assert self.incremental_schedule_after(
+            change, self.create_fourth_task
+        ) == 'Scheduled 2 tasks in 1 projects'
+
+    def test_incremental_schedule_considers_changes_done_while_scheduling(
+            self):
+        """testing if the projects changed while the last schedule was
+        running are scheduled when the incremental argument is True
+        """
+        from stalker.db.session import DBSession
+        self.create_second_project(resources=[self.test_user6])
+        test_studio = self.create_studio()
+        DBSession.commit()
+
+        test_case = self
+
+        class EditingScheduler(PythonScheduler):
+            def schedule(self):
+                result = super(EditingScheduler, self).schedule()
+                # the task is edited after the tasks are read
+                test_case.test_task3.schedule_timing = 8
+                DBSession.flush()
+                return result
+
+        test_studio.scheduler = EditingScheduler()
+        test_studio.schedule()
+        DBSession.commit()
+        assert test_studio.incremental_schedule_cutoff == \
+            test_studio.scheduling_started_at
+
+        test_studio.scheduler = PythonScheduler()
+        result = test_studio.schedule(incremental=True)
+        DBSession.commit()
+        assert result == 'Scheduled 1 tasks in 1 projects'
+
+    def test_incremental_schedule_considers_changes_before_a_failed_run(self):
+        """testing if a failed schedule doesn't move the cutoff of the
+        incremental schedules forward
+        """
+        from stalker.db.session import DBSession
+        self.create_second_project(resources=[self.test_user6])
+        test_studio = self.create_studio()
+        test_studio.scheduler = PythonScheduler()
+        test_studio.schedule()
+        DBSession.commit()
+        cutoff = test_studio.incremental_schedule_cutoff
+        assert cutoff is not None
+
+        self.test_task3.schedule_timing = 8
+        DBSession.commit()
+
+        class FailingScheduler(PythonScheduler):
+            def schedule(self):
+                raise RuntimeError('scheduling failed')
+
+        test_studio.scheduler = FailingScheduler()
+        with pytest.raises(RuntimeError):
+            test_studio.schedule(incremental=True)
+        DBSession.commit()
+        assert test_studio.incremental_schedule_cutoff == cutoff
+        assert test_studio.last_scheduled_at > cutoff
+
+        test_studio.scheduler = PythonScheduler()
+        result = test_studio.schedule(incremental=True)
+        DBSession.commit()
+        assert result == 'Scheduled 1 tasks in 1 projects'
+        assert test_studio.incremental_schedule_cutoff > cutoff
+
+    def test_schedule_of_some_projects_does_not_move_the_cutoff(self):
+        """testing if scheduling only some of the projects doesn't change the
+        incremental_schedule_cutoff of the studio
+        """
+        from stalker.db.session import DBSession
+        self.create_second_project(resources=[self.test_user6])
+        test_studio = self.create_studio()
+        test_studio.scheduler = PythonScheduler()
+        test_studio.schedule()
+        DBSession.commit()
+        cutoff = test_studio.incremental_schedule_cutoff
+
+        self.test_task1.schedule_timing = 8
+        DBSession.commit()
+
+        test_studio.scheduler = PythonScheduler(projects=[self.test_proj2])
+        test_studio.schedule()
+        DBSession.commit()
+        assert test_studio.incremental_schedule_cutoff == cutoff
+
+        test_studio.scheduler = PythonScheduler()
+        result = test_studio.schedule(incremental=True)
+        DBSession.commit()
+        assert result == 'Scheduled 2 tasks in 1 projects'
+
+    def test_simulate_returns_the_results_without_writing_to_the_database(
+            self):
+        """testing if the simulate() method returns the scheduling results
+        without changing the database
+        """
+        python_sched = PythonScheduler(compute_resources=True)
+        python_sched.studio = self.create_studio()
+        from stalker.db.session import DBSession
+        DBSession.commit()
+
+        results = python_sched.simulate()
+
+        assert results[self.test_task1.id][:2] == (
+            datetime.datetime(2013, 4, 16, 9, 0, tzinfo=pytz.utc),
+            datetime.datetime(2013, 4, 18, 16, 0, tzinfo=pytz.utc)
+        )
+        assert sorted(results[self.test_task1.id][2]) == \
+            sorted([self.test_user1.id, self.test_user2.id])
+        assert results[self.test_task2.id][1] == \
+            datetime.datetime(2013, 4, 24, 10, 0, tzinfo=pytz.utc)
+        assert results[self.test_proj1.id] == (
+            datetime.datetime(2013, 4, 16, 9, 0, tzinfo=pytz.utc),
+            datetime.datetime(2013, 4, 24, 10, 0, tzinfo=pytz.utc),
+            None
+        )
+
+        # nothing is written to the database
+        DBSession.expire_all()
+        assert self.test_task1.computed_start is None
+        assert self.test_task1.computed_end is None
+        assert self.test_proj1.computed_start is None
+
+    def test_simulate_rolls_back_the_changes_of_the_scenario(self):
+        """testing if the simulate() method schedules with the changes of the
+        given scenario and rolls them back afterwards
+        """
+        python_sched = PythonScheduler(compute_resources=True)
+        python_sched.studio = self.create_studio()
+        from stalker.db.session import DBSession
+        DBSession.commit()
+
+        def longer_task1():
+            self.test_task1.schedule_timing = 100
+
+        results = python_sched.simulate(longer_task1)
+        assert results[self.test_task1.id][1] > \
+            datetime.datetime(2013, 4, 18, 16, 0, tzinfo=pytz.utc)
+
+        DBSession.expire_all()
+        assert self.test_task1.schedule_timing == 50
+        assert self.test_task1.computed_end is None
+
+        # and it is still possible to use the session
+        results = python_sched.simulate()
+        assert results[self.test_task1.id][1] == \
+            datetime.datetime(2013, 4, 18, 16, 0, tzinfo=pytz.utc)
+
+    def test_simulate_scenario_is_not_a_callable(self):
+        """testing if a TypeError will be raised when the scenario argument
+        is not a callable
+        """
+        python_sched = PythonScheduler()
+        python_sched.studio = self.create_studio()
+        with pytest.raises(TypeError) as cm:
+            python_sched.simulate('not a callable')
+
+        assert str(cm.value) == \
+            'PythonScheduler.simulate() scenario should be a callable, not ' \
+            'str'
+
+    def test_simulate_can_run_scenarios_concurrently(self):
+        """testing if different scenarios can be simulated concurrently in
+        separate threads
+        """
+        from stalker.db.session import DBSession
+        test_studio = self.create_studio()
+        DBSession.commit()
+        studio_id = test_studio.id
+        task1_id = self.test_task1.id
+
+        import threading
+        results = {}
+
+        def simulate(name, schedule_timing):
+            from stalker import Studio, Task
+            try:
+                python_sched = PythonScheduler(
+                    studio=Studio.query.get(studio_id)
+                )
+                python_sched.studio.now = \
+                    datetime.datetime(2013, 4, 16, 0, 0, tzinfo=pytz.utc)
+
+                def scenario():
+                    Task.query.get(task1_id).schedule_timing = \
+                        schedule_timing
+
+                results[name] = python_sched.simulate(scenario)[task1_id]
+            finally:
+                DBSession.remove()
+
+        threads = [
+            threading.Thread(target=simulate, args=('short', 10)),
+            threading.Thread(target=simulate, args=('long', 100)),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results['short'][1] < results['long'][1]
+
+        DBSession.expire_all()
+        assert self.test_task1.schedule_timing == 50
+        assert self.test_task1.computed_end is None
+
+
+def test_tasks_are_correctly_scheduled_with_sqlite3(setup_sqlite3):
+    """testing if the tasks are correctly scheduled with SQLite3
+    """
+    from stalker import db
+    db.setup()
+    db.init()
+
+    from stalker.db.session import DBSession
+    assert str(DBSession.connection().engine.url) == 'sqlite://'
+
+    from stalker import Project, Repository, Studio, Task, User
+    user1 = User(
+        login='user1',
+        name='User1',
+        email='user1@users.com',
+        password='1234'
+    )
+    repo = Repository(name='Test Repository', code='TR')
+    project = Project(name='Test Project 1', code='TP1', repository=repo)
+    task1 = Task(
+        name='Task1',
+        project=project,
+        resources=[user1],
+        schedule_timing=12,
+        schedule_unit='h',
+    )
+    task2 = Task(
+        name='Task2',
+        project=project,
+        resources=[user1],
+        depends=[task1],
+        schedule_timing=3,
+        schedule_unit='h',
+    )
+    studio = Studio(
+        name='Test Studio',
+        now=datetime.datetime(2013, 4, 16, 0, 0, tzinfo=pytz.utc)
+    )
+    studio.start = datetime.datetime(2013, 4, 16, 0, 0, tzinfo=pytz.utc)
+    studio.end = datetime.datetime(2013, 4, 30, 0, 0, tzinfo=pytz.utc)
+    DBSession.add_all([user1, repo, project, task1, task2, studio])
+    DBSession.commit()
+
+    python_sched = PythonScheduler(compute_resources=True)
+    python_sched.studio = studio
+    python_sched.schedule()
+    DBSession.commit()
+
+    assert task1.computed_start == \
+        datetime.datetime(2013, 4, 16, 9, 0, tzinfo=pytz.utc)
+    assert task1.computed_end == \
+        datetime.datetime(2013, 4, 17, 12, 0, tzinfo=pytz.utc)
+    assert task2.computed_start == \
+        datetime.datetime(2013, 4, 17, 12, 0, tzinfo=pytz.utc)
+    assert task2.computed_end == \
+        datetime.datetime(2013, 4, 17, 15, 0, tzinfo=pytz.utc)
+    assert task2.computed_resources == [user1]
+    assert project.computed_start == \
+        datetime.datetime(2013, 4, 16, 9, 0, tzinfo=pytz.utc)
+    assert project.computed_end == \
+        datetime.datetime(2013, 4, 17, 15, 0, tzinfo=pytz.utc)
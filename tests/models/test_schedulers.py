@@ -96,6 +96,25 @@ class SchedulerBaseTester(unittest.TestCase):
         self.test_scheduler_base.studio = new_studio
         assert self.test_scheduler_base.studio == new_studio
 
+    def test_incremental_argument_is_skipped(self):
+        """testing if the incremental attribute will be False if the
+        incremental argument is skipped
+        """
+        assert self.test_scheduler_base.incremental is False
+
+    def test_incremental_argument_is_working_properly(self):
+        """testing if the incremental argument value is passed to the
+        incremental attribute
+        """
+        self.kwargs['incremental'] = True
+        new_scheduler_base = SchedulerBase(**self.kwargs)
+        assert new_scheduler_base.incremental is True
+
+    def test_report_attribute_is_None_by_default(self):
+        """testing if the report attribute is None before scheduling
+        """
+        assert self.test_scheduler_base.report is None
+
     def test_schedule_method_will_raise_not_implemented_error(self):
         """testing if the schedule() method will raise a NotImplementedError
         """
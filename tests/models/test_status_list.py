@@ -192,6 +192,67 @@ class StatusListTest(unittest.TestCase):
         assert a_status_list[0] == a_status_list["complete"]
         assert a_status_list[1] == a_status_list["wip"]
 
+    def test_indexing_get_string_indexes_returns_None_for_unknown_keys(self):
+        """testing if indexing with an unknown string returns None
+        """
+        assert self.test_status_list['unknown'] is None
+
+    def test_indexing_get_string_indexes_follows_statuses_changes(self):
+        """testing if indexing with strings follows the changes in the
+        statuses attribute
+        """
+        wip = self.test_status_list['WIP']
+        assert wip is not None
+
+        self.test_status_list.statuses.remove(wip)
+        assert self.test_status_list['WIP'] is None
+
+        new_status = Status(name='Stopped', code='STOP')
+        self.test_status_list.statuses.append(new_status)
+        assert self.test_status_list['stop'] is new_status
+        assert self.test_status_list['Stopped'] is new_status
+
+        self.test_status_list.statuses = [wip]
+        assert self.test_status_list['stop'] is None
+        assert self.test_status_list['wip'] is wip
+
+        self.test_status_list[0] = new_status
+        assert self.test_status_list['wip'] is None
+        assert self.test_status_list['stop'] is new_status
+
+    def test_indexing_get_string_indexes_follows_status_code_changes(self):
+        """testing if indexing with strings follows the changes in the name
+        and code of the statuses
+        """
+        status = self.test_status_list['OH']
+        status.code = 'HOLD'
+        assert self.test_status_list['OH'] is None
+        assert self.test_status_list['hold'] is status
+
+        status.name = 'Held'
+        assert self.test_status_list['on hold'] is None
+        assert self.test_status_list['held'] is status
+
+    def test_indexing_get_string_indexes_does_not_compare_statuses(self):
+        """testing if indexing with strings doesn't compare the given string
+        with the statuses one by one after the first lookup
+        """
+        self.test_status_list['WFD']
+        comparisons = []
+
+        def __eq__(status, other):
+            comparisons.append(other)
+            return False
+
+        Status.__eq__, original_eq = __eq__, Status.__eq__
+        try:
+            status = self.test_status_list['CMPL']
+        finally:
+            Status.__eq__ = original_eq
+
+        assert status is self.test_status_list.statuses[5]
+        assert comparisons == []
+
     def test_indexing_set(self):
         """testing indexing of statuses in the statusList, set
         """
@@ -1775,6 +1775,202 @@ project Studio_{{studio.id}} "Studio_{{studio.id}}" 2013-04-15 - 2013-06-30 {
         assert studio.last_scheduled_by_id == self.test_user1.id
         assert studio.last_scheduled_by == self.test_user1
 
+    def test_schedule_will_store_the_schedule_report_in_database(self):
+        """testing if the schedule method will store the report of the
+        scheduler in the last_schedule_report attribute
+        """
+        import datetime
+        import pytz
+        from stalker import Studio, PythonScheduler
+        self.test_studio.now = \
+            datetime.datetime(2013, 4, 15, 22, 56, tzinfo=pytz.utc)
+        self.test_studio.start = \
+            datetime.datetime(2013, 4, 15, 22, 56, tzinfo=pytz.utc)
+        self.test_studio.end = \
+            datetime.datetime(2013, 7, 30, 0, 0, tzinfo=pytz.utc)
+
+        scheduler = PythonScheduler()
+        self.test_studio.scheduler = scheduler
+        self.test_studio.schedule()
+        assert self.test_studio.last_schedule_report == scheduler.report
+
+        from stalker.db.session import DBSession
+        DBSession.add(self.test_studio)
+        DBSession.commit()
+        studio_id = self.test_studio.id
+        report = scheduler.report
+
+        DBSession.remove()
+        studio = Studio.query.get(studio_id)
+        assert studio.last_schedule_report == report
+        assert sorted(studio.last_schedule_report['stages']) == \
+            ['export', 'solve', 'write']
+
+    def test_schedule_async_will_not_work_without_a_scheduler(self):
+        """testing if a RuntimeError will be raised when the scheduler
+        attribute is not set to a Scheduler instance and schedule_async is
+        called
+        """
+        self.test_studio.scheduler = None
+        with pytest.raises(RuntimeError) as cm:
+            self.test_studio.schedule_async()
+
+        assert str(cm.value) == \
+            'There is no scheduler for this Studio, please assign a ' \
+            'scheduler to the Studio.scheduler attribute, before calling ' \
+            'Studio.schedule_async()'
+
+    def test_schedule_async_will_not_work_with_an_uncommitted_studio(self):
+        """testing if a RuntimeError will be raised when the studio is not
+        committed to the database and schedule_async is called
+        """
+        from stalker import Studio, PythonScheduler
+        new_studio = Studio(name='Uncommitted Studio')
+        new_studio.scheduler = PythonScheduler()
+        with pytest.raises(RuntimeError) as cm:
+            new_studio.schedule_async()
+
+        assert str(cm.value) == \
+            'Studio should be committed to the database before calling ' \
+            'Studio.schedule_async()'
+
+    def test_schedule_async_returns_a_job_and_schedules_the_tasks(self):
+        """testing if the schedule_async method returns a ScheduleJob
+        instance and schedules the tasks in a background thread
+        """
+        import datetime
+        import pytz
+        from stalker import PythonScheduler, ScheduleJob
+        self.test_studio.now = \
+            datetime.datetime(2013, 4, 15, 22, 56, tzinfo=pytz.utc)
+        self.test_studio.start = \
+            datetime.datetime(2013, 4, 15, 22, 56, tzinfo=pytz.utc)
+        self.test_studio.end = \
+            datetime.datetime(2013, 7, 30, 0, 0, tzinfo=pytz.utc)
+        self.test_studio.scheduler = PythonScheduler()
+
+        from stalker.db.session import DBSession
+        DBSession.add(self.test_studio)
+        DBSession.commit()
+
+        job = self.test_studio.schedule_async(scheduled_by=self.test_user1)
+        assert isinstance(job, ScheduleJob)
+
+        result = job.result(timeout=60)
+        assert result.startswith('Scheduled ')
+        assert job.done()
+        assert job.stage == 'done'
+        assert self.test_studio.scheduler.job is None
+
+        # the results are committed by the background thread
+        DBSession.expire_all()
+        assert self.test_studio.last_schedule_message == result
+        assert self.test_studio.last_scheduled_by == self.test_user1
+        assert self.test_task1.computed_start is not None
+        assert self.test_task1.computed_end is not None
+
+    def test_schedule_async_job_can_be_cancelled(self):
+        """testing if the job returned by schedule_async can be cancelled and
+        nothing is written to the database
+        """
+        import datetime
+        import pytz
+        from stalker import PythonScheduler
+        from stalker.exceptions import ScheduleCancelledError
+        self.test_studio.now = \
+            datetime.datetime(2013, 4, 15, 22, 56, tzinfo=pytz.utc)
+        self.test_studio.start = \
+            datetime.datetime(2013, 4, 15, 22, 56, tzinfo=pytz.utc)
+        self.test_studio.end = \
+            datetime.datetime(2013, 7, 30, 0, 0, tzinfo=pytz.utc)
+
+        scheduler = PythonScheduler()
+        self.test_studio.scheduler = scheduler
+
+        from stalker.db.session import DBSession
+        DBSession.add(self.test_studio)
+        DBSession.commit()
+
+        # cancel the job as soon as the scheduler reaches the solve stage, the
+        # background thread uses its own scheduler so patch the class
+        original_solve = PythonScheduler._solve
+
+        def cancelling_solve(self):
+            self.job.cancel()
+            return original_solve(self)
+
+        PythonScheduler._solve = cancelling_solve
+        try:
+            job = self.test_studio.schedule_async()
+            with pytest.raises(ScheduleCancelledError) as cm:
+                job.result(timeout=60)
+        finally:
+            PythonScheduler._solve = original_solve
+
+        assert str(cm.value) == \
+            'Scheduling is cancelled before the write stage'
+        assert job.cancelled is True
+        assert job.cancel() is False
+
+        DBSession.expire_all()
+        assert self.test_studio.last_schedule_message is None
+        assert self.test_task1.computed_start is None
+
+    def test_schedule_async_reloads_the_projects_of_the_scheduler(self):
+        """testing if the schedule_async method schedules the projects of the
+        scheduler with a new scheduler in the background thread when the
+        projects are expired by a commit
+        """
+        import datetime
+        import pytz
+        from stalker import PythonScheduler
+        self.test_studio.now = \
+            datetime.datetime(2013, 4, 15, 22, 56, tzinfo=pytz.utc)
+        self.test_studio.start = \
+            datetime.datetime(2013, 4, 15, 22, 56, tzinfo=pytz.utc)
+        self.test_studio.end = \
+            datetime.datetime(2013, 7, 30, 0, 0, tzinfo=pytz.utc)
+        scheduler = PythonScheduler(
+            projects=[self.test_project1], compute_resources=True
+        )
+        self.test_studio.scheduler = scheduler
+
+        from stalker.db.session import DBSession
+        DBSession.add(self.test_studio)
+        DBSession.commit()
+
+        # the projects are expired
+        from sqlalchemy import inspect
+        assert 'id' in inspect(self.test_project1).expired_attributes
+
+        schedulers = []
+        original_schedule = PythonScheduler.schedule
+
+        def recording_schedule(self):
+            schedulers.append((self, [project.id for project in self.projects],
+                               list(self.projects)))
+            return original_schedule(self)
+
+        PythonScheduler.schedule = recording_schedule
+        try:
+            job = self.test_studio.schedule_async()
+            job.result(timeout=60)
+        finally:
+            PythonScheduler.schedule = original_schedule
+
+        assert len(schedulers) == 1
+        used_scheduler, project_ids, projects = schedulers[0]
+        assert used_scheduler is not scheduler
+        assert used_scheduler.compute_resources is True
+        assert project_ids == [self.test_project1.id]
+        assert projects[0] is not self.test_project1
+        assert scheduler.projects == [self.test_project1]
+        assert scheduler.report is not None
+        assert scheduler.report['projects'] == 1
+
+        DBSession.expire_all()
+        assert self.test_task1.computed_start is not None
+
     def test_vacation_attribute_is_read_only(self):
         """testing if the vacation attribute is a read-only attribute
         """
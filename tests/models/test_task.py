@@ -4999,3 +4999,494 @@ class TaskDBTestDBCase(UnitTestDBBase):
         assert \
             new_task.remaining_seconds == \
             new_task.schedule_seconds - new_task.total_logged_seconds
+
+
+    def create_task_tree(self):
+        """creates the task hierarchy used in hierarchy_path tests
+        """
+        from stalker.db.session import DBSession
+
+        def create_task(name, parent=None):
+            return Task(
+                name=name,
+                project=self.test_project1,
+                parent=parent,
+                responsible=[self.test_user1]
+            )
+
+        task1 = create_task('Task1')
+        task2 = create_task('Task2', parent=task1)
+        task3 = create_task('Task3', parent=task2)
+        task4 = create_task('Task4', parent=task2)
+        task5 = create_task('Task5')
+        DBSession.add_all([task1, task2, task3, task4, task5])
+        DBSession.commit()
+        return task1, task2, task3, task4, task5
+
+    def stored_hierarchy_paths(self, *tasks):
+        """returns the hierarchy_path values of the given tasks from the
+        database
+        """
+        from sqlalchemy import select
+        from stalker.db.session import DBSession
+        tasks_table = Task.__table__
+        result = DBSession.connection().execute(
+            select([tasks_table.c.id, tasks_table.c.hierarchy_path])
+            .where(tasks_table.c.id.in_([task.id for task in tasks]))
+        )
+        paths = dict(result.fetchall())
+        return [paths[task.id] for task in tasks]
+
+    def test_hierarchy_path_is_filled_on_flush(self):
+        """testing if the hierarchy_path attribute is filled when the tasks
+        are flushed
+        """
+        task1, task2, task3, task4, task5 = self.create_task_tree()
+        expected = [
+            '%s/' % task1.id,
+            '%s/%s/' % (task1.id, task2.id),
+            '%s/%s/%s/' % (task1.id, task2.id, task3.id),
+            '%s/%s/%s/' % (task1.id, task2.id, task4.id),
+            '%s/' % task5.id,
+        ]
+        assert [task.hierarchy_path
+                for task in [task1, task2, task3, task4, task5]] == expected
+        assert self.stored_hierarchy_paths(
+            task1, task2, task3, task4, task5
+        ) == expected
+
+    def test_hierarchy_path_is_updated_when_a_sub_tree_is_moved(self):
+        """testing if the hierarchy_path of a task and all of its children are
+        updated when the parent of the task is changed
+        """
+        from stalker.db.session import DBSession
+        task1, task2, task3, task4, task5 = self.create_task_tree()
+        task2.parent = task5
+        task6 = Task(
+            name='Task6',
+            project=self.test_project1,
+            parent=task3,
+            responsible=[self.test_user1]
+        )
+        DBSession.add(task6)
+        DBSession.commit()
+
+        expected = [
+            '%s/' % task1.id,
+            '%s/%s/' % (task5.id, task2.id),
+            '%s/%s/%s/' % (task5.id, task2.id, task3.id),
+            '%s/%s/%s/' % (task5.id, task2.id, task4.id),
+            '%s/%s/%s/%s/' % (task5.id, task2.id, task3.id, task6.id),
+        ]
+        assert [task.hierarchy_path
+                for task in [task1, task2, task3, task4, task6]] == expected
+        assert self.stored_hierarchy_paths(
+            task1, task2, task3, task4, task6
+        ) == expected
+
+        # to the root
+        task3.parent = None
+        DBSession.commit()
+        assert self.stored_hierarchy_paths(task3, task6) == [
+            '%s/' % task3.id, '%s/%s/' % (task3.id, task6.id)
+        ]
+
+    def test_hierarchy_index_is_used_for_parents_descendants_and_level(self):
+        """testing if the parents, descendants and level attributes are using
+        the hierarchy index with at most one query
+        """
+        from sqlalchemy import event
+        from stalker.db.session import DBSession
+        task1, task2, task3, task4, task5 = self.create_task_tree()
+        task1_id, task2_id, task3_id, task4_id = \
+            task1.id, task2.id, task3.id, task4.id
+        DBSession.expunge_all()
+        task4 = Task.query.get(task4_id)
+
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        engine = DBSession.connection().engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            assert task4.level == 3
+            assert statements == []
+
+            parents = task4.parents
+            assert [task.id for task in parents] == [task1_id, task2_id]
+            assert len(statements) == 1
+
+            # they are in the identity map now
+            assert task4.parents == parents
+            assert len(statements) == 1
+
+            task1 = Task.query.get(task1_id)
+            assert len(statements) == 1
+            assert [task.id for task in task1.descendants] == \
+                [task2_id, task3_id, task4_id]
+            assert len(statements) == 2
+        finally:
+            event.remove(engine, 'before_cursor_execute',
+                         before_cursor_execute)
+
+    def test_hierarchy_is_walked_when_there_are_pending_changes(self):
+        """testing if the parents, descendants and level attributes are
+        walking the hierarchy when there are unflushed hierarchy changes
+        """
+        task1, task2, task3, task4, task5 = self.create_task_tree()
+        task2.parent = task5
+        assert task4.level == 3
+        assert task4.parents == [task5, task2]
+        assert task5.descendants == [task2, task3, task4]
+        assert task1.descendants == []
+
+    def test_walk_hierarchy_with_prefetch_runs_one_query(self):
+        """testing if the walk_hierarchy() method loads the whole hierarchy
+        with one query when prefetch is True
+        """
+        from sqlalchemy import event
+        from stalker.db.session import DBSession
+        task1, task2, task3, task4, task5 = self.create_task_tree()
+        task1_id = task1.id
+        dfs = [task.id for task in task1.walk_hierarchy()]
+        bfs = [task.id for task in task1.walk_hierarchy(method=1)]
+        assert dfs == [task1.id, task2.id, task3.id, task4.id]
+        DBSession.expunge_all()
+        task1 = Task.query.get(task1_id)
+
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        engine = DBSession.connection().engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            assert [task.id for task in
+                    task1.walk_hierarchy(prefetch=True)] == dfs
+            assert len(statements) == 1
+            assert [task.id for task in
+                    task1.walk_hierarchy(method=1)] == bfs
+            assert len(statements) == 1
+        finally:
+            event.remove(engine, 'before_cursor_execute',
+                         before_cursor_execute)
+
+    def test_walk_hierarchy_with_prefetch_respects_pending_changes(self):
+        """testing if the walk_hierarchy() method with prefetch doesn't
+        override the already loaded and changed children
+        """
+        task1, task2, task3, task4, task5 = self.create_task_tree()
+        task1.children.append(task5)
+        assert list(task1.walk_hierarchy(prefetch=True)) == \
+            [task1, task2, task3, task4, task5]
+
+    def test_walk_dependencies_with_prefetch_runs_one_query(self):
+        """testing if the walk_dependencies() method loads all the
+        dependencies with one query when prefetch is True
+        """
+        from sqlalchemy import event
+        from stalker.db.session import DBSession
+
+        def create_task(name, depends=None):
+            return Task(
+                name=name,
+                project=self.test_project1,
+                depends=depends or [],
+                responsible=[self.test_user1]
+            )
+
+        task1 = create_task('Task1')
+        task2 = create_task('Task2', depends=[task1])
+        task3 = create_task('Task3', depends=[task1])
+        task4 = create_task('Task4', depends=[task2, task3])
+        DBSession.add_all([task1, task2, task3, task4])
+        DBSession.commit()
+        expected = [task4.id, task2.id, task3.id, task1.id, task1.id]
+        task4_id = task4.id
+        DBSession.expunge_all()
+        task4 = Task.query.get(task4_id)
+
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        engine = DBSession.connection().engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            assert [task.id for task in
+                    task4.walk_dependencies(prefetch=True)] == expected
+            assert len(statements) == 1
+        finally:
+            event.remove(engine, 'before_cursor_execute',
+                         before_cursor_execute)
+
+
+    def test_dependencies_are_prefetched_once_for_bulk_wiring(self):
+        """testing if the stored dependencies of the tasks are not queried
+        again when new dependencies to the already loaded tasks are added
+        """
+        from sqlalchemy import event
+        from stalker.db.session import DBSession
+        tasks = []
+        for i in range(5):
+            tasks.append(
+                Task(
+                    name='Task%s' % i,
+                    project=self.test_project1,
+                    depends=tasks[-1:],
+                    responsible=[self.test_user1]
+                )
+            )
+        DBSession.add_all(tasks)
+        DBSession.commit()
+
+        new_tasks = []
+        for i in range(5):
+            new_tasks.append(
+                Task(
+                    name='New Task%s' % i,
+                    project=self.test_project1,
+                    responsible=[self.test_user1]
+                )
+            )
+        DBSession.add_all(new_tasks)
+        DBSession.flush()
+
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            if 'RECURSIVE' in statement:
+                statements.append(statement)
+
+        engine = DBSession.connection().engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            # the first one loads the dependencies of all the stored tasks
+            for new_task, task in zip(new_tasks, reversed(tasks)):
+                new_task.depends.append(task)
+        finally:
+            event.remove(engine, 'before_cursor_execute',
+                         before_cursor_execute)
+
+        assert len(statements) == 1
+        for new_task, task in zip(new_tasks, reversed(tasks)):
+            assert new_task.depends == [task]
+
+    def test_circular_dependency_is_detected_over_stored_dependencies(self):
+        """testing if a CircularDependencyError will be raised when a new
+        dependency creates a cycle with the dependencies that are loaded from
+        the database
+        """
+        from stalker.db.session import DBSession
+        from stalker.exceptions import CircularDependencyError
+        tasks = []
+        for i in range(5):
+            tasks.append(
+                Task(
+                    name='Task%s' % i,
+                    project=self.test_project1,
+                    depends=tasks[-1:],
+                    responsible=[self.test_user1]
+                )
+            )
+        DBSession.add_all(tasks)
+        DBSession.commit()
+        first_task = tasks[0]
+        last_task = tasks[-1]
+        with pytest.raises(CircularDependencyError) as cm:
+            first_task.depends.append(last_task)
+
+        assert str(cm.value) == \
+            '%s (Task) and %s (Task) creates a circular dependency in ' \
+            'their "depends" attribute' % (last_task, first_task)
+        DBSession.rollback()
+
+        # a task can not be the parent of a task depending on it
+        with pytest.raises(CircularDependencyError):
+            last_task.parent = first_task
+
+        # but the other way is possible
+        new_task = Task(
+            name='New Task',
+            project=self.test_project1,
+            responsible=[self.test_user1]
+        )
+        DBSession.add(new_task)
+        new_task.depends.append(last_task)
+        assert new_task.depends == [last_task]
+
+    def count_statements(self, callable_):
+        """returns the number of SQL statements executed by the given callable
+        and its return value
+        """
+        from sqlalchemy import event
+        from stalker.db.session import DBSession
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        engine = DBSession.connection().engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            value = callable_()
+        finally:
+            event.remove(engine, 'before_cursor_execute',
+                         before_cursor_execute)
+        return len(statements), value
+
+    def create_logged_tasks(self):
+        """creates a container task with three leaf tasks and time logs
+        """
+        from stalker import TimeLog
+        from stalker.db.session import DBSession
+        container = Task(
+            name='Container',
+            project=self.test_project1,
+            responsible=[self.test_user1]
+        )
+        tasks = []
+        for i in range(3):
+            tasks.append(
+                Task(
+                    name='Leaf %s' % i,
+                    parent=container,
+                    resources=[self.test_user1],
+                    responsible=[self.test_user1],
+                    schedule_timing=10,
+                    schedule_unit='h'
+                )
+            )
+        DBSession.add(container)
+        DBSession.commit()
+
+        start = datetime.datetime(2013, 4, 8, 10, 0, tzinfo=pytz.utc)
+        time_logs = []
+        for i, task in enumerate(tasks):
+            time_logs.append(
+                TimeLog(
+                    task=task,
+                    resource=self.test_user1,
+                    start=start + datetime.timedelta(days=i),
+                    duration=datetime.timedelta(hours=i + 1)
+                )
+            )
+        DBSession.add_all(time_logs)
+        DBSession.commit()
+        return container, tasks, time_logs
+
+    def test_total_logged_seconds_of_a_leaf_task_is_cached(self):
+        """testing if the total_logged_seconds value of a leaf task is cached
+        in the session and invalidated when the time logs are changed
+        """
+        from stalker.db.session import DBSession
+        container, tasks, time_logs = self.create_logged_tasks()
+        task = tasks[1]
+        # refresh the task
+        assert task.is_leaf
+
+        count, value = self.count_statements(
+            lambda: (task.total_logged_seconds, task.total_logged_seconds)
+        )
+        assert value == (7200, 7200)
+        assert count == 1
+
+        time_logs[1].end = time_logs[1].start + datetime.timedelta(hours=3)
+        DBSession.commit()
+        assert task.total_logged_seconds == 10800
+
+    def test_load_total_logged_seconds_loads_all_tasks_at_once(self):
+        """testing if the load_total_logged_seconds() method loads the
+        total_logged_seconds values of all the given tasks with one query
+        """
+        container, tasks, time_logs = self.create_logged_tasks()
+        empty_task = Task(
+            name='Empty Task',
+            project=self.test_project1,
+            responsible=[self.test_user1]
+        )
+        from stalker.db.session import DBSession
+        DBSession.add(empty_task)
+        DBSession.commit()
+
+        task_list = tasks + [empty_task]
+        # refresh the tasks
+        assert all(task.is_leaf for task in task_list)
+
+        count, value = self.count_statements(
+            lambda: Task.load_total_logged_seconds(task_list)
+        )
+        # one query for the container check and one for the time logs
+        assert count == 2
+        assert value == {
+            tasks[0].id: 3600,
+            tasks[1].id: 7200,
+            tasks[2].id: 10800,
+            empty_task.id: 0,
+        }
+
+        count, value = self.count_statements(
+            lambda: [task.total_logged_seconds for task in task_list]
+        )
+        assert count == 0
+        assert value == [3600, 7200, 10800, 0]
+
+        assert Task.load_total_logged_seconds([container]) == {
+            container.id: 6 * 3600
+        }
+
+
+def test_total_logged_seconds_is_the_sum_of_all_time_logs_with_sqlite3(
+        setup_sqlite3):
+    """testing if the total_logged_seconds is the sum of all time_logs with
+    SQLite3
+    """
+    from stalker import db
+    db.setup()
+    db.init()
+
+    from stalker.db.session import DBSession
+    assert str(DBSession.connection().engine.url) == 'sqlite://'
+
+    from stalker import Project, Repository, Task, TimeLog, User
+    user1 = User(
+        login='user1',
+        name='User1',
+        email='user1@users.com',
+        password='1234'
+    )
+    repo = Repository(name='Test Repository', code='TR')
+    project = Project(name='Test Project 1', code='TP1', repository=repo)
+    task = Task(
+        name='Task1',
+        project=project,
+        resources=[user1],
+        schedule_timing=10,
+        schedule_unit='h',
+    )
+    DBSession.add_all([user1, repo, project, task])
+    DBSession.commit()
+
+    assert task.total_logged_seconds == 0
+
+    now = datetime.datetime(2013, 4, 16, 6, 0, tzinfo=pytz.utc)
+    tlog1 = TimeLog(
+        task=task,
+        resource=user1,
+        start=now,
+        end=now + datetime.timedelta(hours=8)
+    )
+    tlog2 = TimeLog(
+        task=task,
+        resource=user1,
+        start=now + datetime.timedelta(days=1),
+        end=now + datetime.timedelta(days=1, hours=4)
+    )
+    DBSession.add_all([tlog1, tlog2])
+    DBSession.commit()
+
+    assert task.total_logged_seconds == 12 * 3600
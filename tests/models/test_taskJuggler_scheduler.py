@@ -170,7 +170,8 @@ class TaskJugglerSchedulerDBTester(UnitTestDBBase):
 
         tjp_sched._create_tjp_file()
         tjp_sched._create_tjp_file_content()
-        tjp_sched._fill_tjp_file()
+        with pytest.warns(DeprecationWarning):
+            tjp_sched._fill_tjp_file()
 
         # check
         assert os.path.exists(tjp_sched.tjp_file_full_path)
@@ -178,6 +179,483 @@ class TaskJugglerSchedulerDBTester(UnitTestDBBase):
         # clean up the test
         tjp_sched._clean_up()
 
+    def test_tjp_content_can_be_set(self):
+        """testing if setting the tjp_content attribute writes the given
+        content to the tjp file and updates the tjp_digest
+        """
+        tjp_sched = TaskJugglerScheduler()
+        tjp_sched.projects = [self.test_proj1]
+
+        tjp_sched.tjp_content = 'project Test'
+        assert tjp_sched.tjp_content == 'project Test'
+
+        tjp_sched._create_tjp_file()
+        tjp_sched._create_tjp_file_content()
+        digest = tjp_sched.tjp_digest
+        assert 'task Project_%s' % self.test_proj1.id in tjp_sched.tjp_content
+
+        tjp_sched.tjp_content = 'project Test'
+        with open(tjp_sched.tjp_file_full_path) as f:
+            assert f.read() == 'project Test'
+        assert tjp_sched.tjp_content == 'project Test'
+        assert tjp_sched.tjp_digest != digest
+
+        # clean up the test
+        tjp_sched._clean_up()
+
+    def test_fill_tjp_file_writes_the_assigned_tjp_content(self):
+        """testing if the deprecated _fill_tjp_file() method warns and writes
+        the assigned tjp_content to the tjp file
+        """
+        tjp_sched = TaskJugglerScheduler()
+        tjp_sched.projects = [self.test_proj1]
+        tjp_sched.tjp_content = 'project Test'
+
+        with pytest.warns(DeprecationWarning):
+            tjp_sched._fill_tjp_file()
+
+        with open(tjp_sched.tjp_file_full_path) as f:
+            assert f.read() == 'project Test'
+
+        # clean up the test
+        tjp_sched._clean_up()
+
+    def test_tjp_file_is_filled_by_create_tjp_file_content(self):
+        """testing if the tjp file is directly filled by the
+        _create_tjp_file_content() method
+        """
+        tjp_sched = TaskJugglerScheduler()
+        tjp_sched.projects = [self.test_proj1]
+
+        tjp_sched._create_tjp_file()
+        tjp_sched._create_tjp_file_content()
+
+        # check
+        assert os.path.exists(tjp_sched.tjp_file_full_path)
+        with open(tjp_sched.tjp_file_full_path) as f:
+            tjp_content = f.read()
+
+        assert 'task Project_%s' % self.test_proj1.id in tjp_content
+        assert 'task Task_%s' % self.test_task1.id in tjp_content
+        assert tjp_sched.tjp_content == tjp_content
+
+        # clean up the test
+        tjp_sched._clean_up()
+        assert tjp_sched.tjp_content == ''
+
+    def test_fetch_task_rows_postgresql_returns_typed_payloads(self):
+        """testing if the _fetch_task_rows_postgresql() method returns the
+        time logs and dependencies as typed values which are equal to the
+        values returned by the _fetch_task_rows_generic() method
+        """
+        from stalker import TimeLog
+        from stalker.db.session import DBSession
+        DBSession.add_all([
+            TimeLog(
+                resource=self.test_user1,
+                task=self.test_task1,
+                start=datetime.datetime(2013, 4, 16, 9, 0, tzinfo=pytz.utc),
+                end=datetime.datetime(2013, 4, 16, 12, 0, tzinfo=pytz.utc)
+            ),
+            TimeLog(
+                resource=self.test_user2,
+                task=self.test_task1,
+                start=datetime.datetime(2013, 4, 16, 6, 0, tzinfo=pytz.utc),
+                end=datetime.datetime(2013, 4, 16, 8, 0, tzinfo=pytz.utc)
+            ),
+        ])
+        DBSession.commit()
+
+        project_ids = [self.test_proj1.id]
+        pg_rows = list(
+            TaskJugglerScheduler._fetch_task_rows_postgresql(project_ids)
+        )
+        generic_rows = list(
+            TaskJugglerScheduler._fetch_task_rows_generic(project_ids)
+        )
+        assert pg_rows == generic_rows
+
+        rows = dict((row[0], row) for row in pg_rows)
+        assert rows[self.test_task1.id][11] == [
+            (self.test_user2.id, '2013-04-16-06:00:00', '2013-04-16-08:00:00'),
+            (self.test_user1.id, '2013-04-16-09:00:00', '2013-04-16-12:00:00'),
+        ]
+        # test_task2 depends to test_task1
+        dependencies = rows[self.test_task2.id][12]
+        assert len(dependencies) == 1
+        path, dependency_target, gap_timing, gap_unit, gap_model = \
+            dependencies[0]
+        assert path == [self.test_proj1.id, self.test_task1.id]
+        assert dependency_target == 'onend'
+        assert gap_timing == 0
+        assert gap_unit == 'h'
+        assert gap_model == 'length'
+
+    def test_compact_bookings_merges_contiguous_time_logs(self):
+        """testing if the _compact_bookings() method merges the contiguous
+        and overlapping time logs of the same resource and leaves the others
+        untouched
+        """
+        time_logs = [
+            (1, '2013-04-16-09:00:00', '2013-04-16-10:00:00'),
+            (2, '2013-04-16-10:00:00', '2013-04-16-11:00:00'),
+            (1, '2013-04-16-10:00:00', '2013-04-16-11:00:00'),
+            (1, '2013-04-16-11:00:00', '2013-04-16-12:00:00'),
+            (1, '2013-04-16-13:00:00', '2013-04-16-14:00:00'),
+            (1, '2013-04-16-13:30:00', '2013-04-16-13:45:00'),
+            (2, '2013-04-16-11:00:00', '2013-04-16-12:00:00'),
+        ]
+        assert TaskJugglerScheduler._compact_bookings(time_logs) == [
+            (1, '2013-04-16-09:00:00', '2013-04-16-12:00:00'),
+            (2, '2013-04-16-10:00:00', '2013-04-16-12:00:00'),
+            (1, '2013-04-16-13:00:00', '2013-04-16-14:00:00'),
+        ]
+
+    def test_tjp_file_content_has_compacted_bookings(self):
+        """testing if the contiguous time logs of the same resource are
+        exported as one booking
+        """
+        from stalker import TimeLog
+        from stalker.db.session import DBSession
+        for i in range(3):
+            DBSession.add(
+                TimeLog(
+                    resource=self.test_user1,
+                    task=self.test_task1,
+                    start=datetime.datetime(2013, 4, 16, 6 + i, 0,
+                                            tzinfo=pytz.utc),
+                    end=datetime.datetime(2013, 4, 16, 7 + i, 0,
+                                          tzinfo=pytz.utc)
+                )
+            )
+        DBSession.commit()
+
+        lines = list(TaskJugglerScheduler._tjp_task_lines(
+            [self.test_proj1.id],
+            TaskJugglerScheduler._fetch_task_rows([self.test_proj1.id])
+        ))
+        bookings = [line.strip() for line in lines if 'booking' in line]
+        assert bookings == [
+            'booking User_%s 2013-04-16-06:00:00 - 2013-04-16-09:00:00 '
+            '{ overtime 2 }' % self.test_user1.id
+        ]
+
+    def test_tjp_file_content_contains_all_projects(self):
+        """testing if the tasks of all of the projects are exported to the
+        tjp file
+        """
+        from stalker import Project, Task
+        from stalker.db.session import DBSession
+        test_proj2 = Project(
+            name='Test Project 2',
+            code='TP2',
+            repository=self.test_repo
+        )
+        parent_task = Task(
+            name='Parent Task',
+            project=test_proj2,
+        )
+        child_task = Task(
+            name='Child Task',
+            parent=parent_task,
+            resources=[self.test_user6],
+            depends=[self.test_task1],
+            schedule_timing=4,
+            schedule_unit='h',
+        )
+        DBSession.add_all([test_proj2, parent_task, child_task])
+        DBSession.commit()
+
+        tjp_sched = TaskJugglerScheduler()
+        tjp_sched._create_tjp_file()
+        tjp_sched._create_tjp_file_content()
+        tjp_content = tjp_sched.tjp_content
+        tjp_sched._clean_up()
+
+        expected_tasks = """task Project_%(p2)s "Project_%(p2)s" {
+  task Task_%(parent)s "Task_%(parent)s" {
+    task Task_%(child)s "Task_%(child)s" {
+      depends Project_%(p1)s.Task_%(t1)s {onend}
+      effort 4.0h
+      allocate User_%(u6)s
+    }
+  }
+}""" % {
+            'p1': self.test_proj1.id,
+            'p2': test_proj2.id,
+            't1': self.test_task1.id,
+            'parent': parent_task.id,
+            'child': child_task.id,
+            'u6': self.test_user6.id
+        }
+        assert expected_tasks in tjp_content
+        assert 'task Project_%s "Project_%s" {\n  task Task_%s' % (
+            self.test_proj1.id, self.test_proj1.id, self.test_task1.id
+        ) in tjp_content
+
+    def test_parallel_argument_is_skipped(self):
+        """testing if the parallel attribute will be False if the parallel
+        argument is skipped
+        """
+        tjp_sched = TaskJugglerScheduler()
+        assert tjp_sched.parallel is False
+
+    def test_parallel_argument_is_working_properly(self):
+        """testing if the parallel argument value is passed to the parallel
+        attribute
+        """
+        tjp_sched = TaskJugglerScheduler(parallel=True)
+        assert tjp_sched.parallel is True
+
+    def test_use_cache_argument_is_skipped(self):
+        """testing if the use_cache attribute will be False if the use_cache
+        argument is skipped
+        """
+        tjp_sched = TaskJugglerScheduler()
+        assert tjp_sched.use_cache is False
+
+    def test_use_cache_argument_is_working_properly(self):
+        """testing if the use_cache argument value is passed to the use_cache
+        attribute
+        """
+        tjp_sched = TaskJugglerScheduler(use_cache=True)
+        assert tjp_sched.use_cache is True
+
+    def test_project_groups_are_independent(self):
+        """testing if the _project_groups() method partitions the projects in
+        to groups that are not sharing resources or dependencies
+        """
+        from stalker import Project, Task
+        from stalker.db.session import DBSession
+        projects = []
+        tasks = []
+        for i in range(2, 5):
+            project = Project(
+                name='Test Project %s' % i,
+                code='TP%s' % i,
+                repository=self.test_repo
+            )
+            projects.append(project)
+        test_proj2, test_proj3, test_proj4 = projects
+
+        # proj2 is using a different resource
+        task3 = Task(
+            name='Task3',
+            project=test_proj2,
+            resources=[self.test_user6],
+            schedule_timing=4,
+            schedule_unit='h',
+        )
+        # proj3 is sharing a resource with proj1
+        task4 = Task(
+            name='Task4',
+            project=test_proj3,
+            resources=[self.test_user1],
+            schedule_timing=4,
+            schedule_unit='h',
+        )
+        # proj4 has a task depending to a task in proj2
+        task5 = Task(
+            name='Task5',
+            project=test_proj4,
+            depends=[task3],
+            schedule_timing=4,
+            schedule_unit='h',
+        )
+        DBSession.add_all(projects + [task3, task4, task5])
+        DBSession.commit()
+
+        project_ids = [self.test_proj1.id] + [p.id for p in projects]
+        groups = TaskJugglerScheduler._project_groups(project_ids)
+        assert sorted(groups) == sorted([
+            sorted([self.test_proj1.id, test_proj3.id]),
+            sorted([test_proj2.id, test_proj4.id])
+        ])
+
+        # without proj4 they are still independent
+        groups = TaskJugglerScheduler._project_groups(
+            [self.test_proj1.id, test_proj2.id]
+        )
+        assert groups == [[self.test_proj1.id], [test_proj2.id]]
+
+    def test_parse_csv_file_merges_multiple_csv_files(self):
+        """testing if the _parse_csv_file() method writes the results of all
+        the given csv files to the database
+        """
+        import tempfile
+        csv_paths = []
+        for task, start, end in [
+                (self.test_task1, '2013-04-16-09:00', '2013-04-18-16:00'),
+                (self.test_task2, '2013-04-18-16:00', '2013-04-24-10:00')]:
+            csv_path = tempfile.mktemp(suffix='.csv')
+            with open(csv_path, 'w') as f:
+                f.write('"Id";"Start";"End"\n')
+                f.write('"Project_%s.Task_%s";"%s";"%s"\n' % (
+                    self.test_proj1.id, task.id, start, end
+                ))
+            csv_paths.append(csv_path)
+
+        # add the project line
+        with open(csv_paths[1], 'a') as f:
+            f.write('"Project_%s";"2013-04-16-09:00";"2013-04-24-10:00"\n' %
+                    self.test_proj1.id)
+
+        tjp_sched = TaskJugglerScheduler()
+        tjp_sched._parse_csv_file(csv_paths)
+        for csv_path in csv_paths:
+            os.remove(csv_path)
+
+        from stalker.db.session import DBSession
+        DBSession.commit()
+
+        assert \
+            datetime.datetime(2013, 4, 16, 9, 0, tzinfo=pytz.utc) == \
+            self.test_task1.computed_start
+        assert \
+            datetime.datetime(2013, 4, 18, 16, 0, tzinfo=pytz.utc) == \
+            self.test_task1.computed_end
+        assert \
+            datetime.datetime(2013, 4, 18, 16, 0, tzinfo=pytz.utc) == \
+            self.test_task2.computed_start
+        assert \
+            datetime.datetime(2013, 4, 24, 10, 0, tzinfo=pytz.utc) == \
+            self.test_task2.computed_end
+
+        assert \
+            datetime.datetime(2013, 4, 16, 9, 0, tzinfo=pytz.utc) == \
+            self.test_proj1.computed_start
+        assert \
+            datetime.datetime(2013, 4, 24, 10, 0, tzinfo=pytz.utc) == \
+            self.test_proj1.computed_end
+
+    def test_parse_csv_file_updates_computed_resources(self):
+        """testing if the _parse_csv_file() method updates the computed
+        resources when the compute_resources is True
+        """
+        import tempfile
+        csv_path = tempfile.mktemp(suffix='.csv')
+        with open(csv_path, 'w') as f:
+            f.write('"Id";"Start";"End";"Resources"\n')
+            f.write(
+                '"Project_%(p)s.Task_%(t)s";"2013-04-16-09:00";'
+                '"2013-04-18-16:00";"User_%(u3)s (User_%(u3)s), '
+                'User_%(u4)s (User_%(u4)s)"\n' % {
+                    'p': self.test_proj1.id,
+                    't': self.test_task1.id,
+                    'u3': self.test_user3.id,
+                    'u4': self.test_user4.id,
+                }
+            )
+
+        tjp_sched = TaskJugglerScheduler(compute_resources=True)
+        tjp_sched._parse_csv_file([csv_path])
+        os.remove(csv_path)
+
+        from stalker.db.session import DBSession
+        DBSession.commit()
+
+        assert sorted(self.test_task1.computed_resources,
+                      key=lambda x: x.id) == \
+            [self.test_user3, self.test_user4]
+
+        # task2 is not touched
+        assert self.test_task2.computed_start is None
+
+    def test_update_computed_resources_only_touches_changed_rows(self):
+        """testing if the _update_computed_resources() method only deletes
+        and inserts the rows that are changed and doesn't touch the rows of
+        the other tasks
+        """
+        from sqlalchemy import select
+        from stalker.db.session import DBSession
+        from stalker.models.task import Task_Computed_Resources
+
+        self.test_task1.computed_resources = \
+            [self.test_user1, self.test_user2]
+        self.test_task2.computed_resources = [self.test_user1]
+        DBSession.commit()
+
+        connection = DBSession.connection()
+        executed_statements = []
+
+        from sqlalchemy import event
+
+        def before_execute(conn, clauseelement, multiparams, params):
+            from sqlalchemy.sql.dml import Insert, Delete
+            if isinstance(clauseelement, (Insert, Delete)):
+                executed_statements.append((clauseelement, multiparams))
+
+        event.listen(connection, 'before_execute', before_execute)
+        try:
+            TaskJugglerScheduler._update_computed_resources(
+                connection,
+                {self.test_task1.id: [self.test_user2.id, self.test_user3.id]}
+            )
+        finally:
+            event.remove(connection, 'before_execute', before_execute)
+
+        # one delete and one insert
+        assert len(executed_statements) == 2
+        assert executed_statements[0][1] == ([
+            {'b_task_id': self.test_task1.id,
+             'b_resource_id': self.test_user1.id}
+        ],)
+        assert executed_statements[1][1] == ([
+            {'task_id': self.test_task1.id,
+             'resource_id': self.test_user3.id}
+        ],)
+
+        result = connection.execute(
+            select([
+                Task_Computed_Resources.c.task_id,
+                Task_Computed_Resources.c.resource_id
+            ])
+        )
+        assert sorted(tuple(row) for row in result) == sorted([
+            (self.test_task1.id, self.test_user2.id),
+            (self.test_task1.id, self.test_user3.id),
+            (self.test_task2.id, self.test_user1.id),
+        ])
+
+    def test_update_computed_resources_does_nothing_if_nothing_changed(self):
+        """testing if the _update_computed_resources() method doesn't run
+        any delete or insert statements if the computed resources are not
+        changed
+        """
+        from stalker.db.session import DBSession
+        self.test_task1.computed_resources = \
+            [self.test_user1, self.test_user2]
+        DBSession.commit()
+
+        connection = DBSession.connection()
+        executed_statements = []
+
+        from sqlalchemy import event
+
+        def before_execute(conn, clauseelement, multiparams, params):
+            executed_statements.append(clauseelement)
+
+        event.listen(connection, 'before_execute', before_execute)
+        try:
+            TaskJugglerScheduler._update_computed_resources(
+                connection,
+                {self.test_task1.id: [self.test_user2.id, self.test_user1.id]}
+            )
+        finally:
+            event.remove(connection, 'before_execute', before_execute)
+
+        from sqlalchemy.sql.dml import Insert, Delete
+        assert [
+            statement for statement in executed_statements
+            if isinstance(statement, (Insert, Delete))
+        ] == []
+
+    def test_parse_tjp_date_is_working_properly(self):
+        """testing if the _parse_tjp_date() method is working properly
+        """
+        assert TaskJugglerScheduler._parse_tjp_date('2013-04-16-09:30') == \
+            datetime.datetime(2013, 4, 16, 9, 30, tzinfo=pytz.utc)
+
     def test_tjp_file_content_is_correct(self):
         """testing if the tjp file content is correct
         """
@@ -321,6 +799,319 @@ taskreport breakdown "{{csv_path}}"{
             'TaskJugglerScheduler.studio should be an instance of ' \
             'stalker.models.studio.Studio, not NoneType'
 
+    def create_csv_writing_stub_tj3(self, counter_path):
+        """creates a stub tj3 writing a csv file for test_task1 and counting
+        its runs in the given file
+        """
+        return create_stub_tj3(
+            'echo run >> "%(counter)s"\n'
+            'csv_path="$3/$(basename "$1" .tjp).csv"\n'
+            'echo \'"Id";"Start";"End"\' > "$csv_path"\n'
+            'echo \'"Project_%(p)s";"2013-04-16-09:00";"2013-04-18-16:00"\' '
+            '>> "$csv_path"\n'
+            'echo \'"Project_%(p)s.Task_%(t)s";"2013-04-16-09:00";'
+            '"2013-04-18-16:00"\' >> "$csv_path"\n'
+            'echo "stub tj3" 1>&2' % {
+                'counter': counter_path,
+                'p': self.test_proj1.id,
+                't': self.test_task1.id,
+            }
+        )
+
+    @pytest.mark.skipif(os.name == 'nt', reason='needs a posix shell')
+    def test_schedule_uses_cached_results_if_tjp_content_is_not_changed(self):
+        """testing if the schedule() method doesn't run tj3 and uses the
+        cached results if use_cache is True and the tjp content is not
+        changed
+        """
+        import tempfile
+        from stalker import defaults, Studio
+        from stalker.db.session import DBSession
+
+        test_studio = Studio(
+            name='Test Studio',
+            now=datetime.datetime(2013, 4, 16, 0, 0, tzinfo=pytz.utc)
+        )
+        test_studio.start = \
+            datetime.datetime(2013, 4, 16, 0, 0, tzinfo=pytz.utc)
+        test_studio.end = \
+            datetime.datetime(2013, 4, 30, 0, 0, tzinfo=pytz.utc)
+        DBSession.add(test_studio)
+        DBSession.commit()
+
+        counter_path = tempfile.mktemp()
+        stub_path = self.create_csv_writing_stub_tj3(counter_path)
+        tj_command = defaults['tj_command']
+        defaults['tj_command'] = stub_path
+        TaskJugglerScheduler.clear_results_cache()
+        try:
+            tjp_sched = TaskJugglerScheduler(studio=test_studio,
+                                             use_cache=True)
+            assert tjp_sched.schedule() == 'stub tj3'
+            DBSession.commit()
+            assert self.test_task1.computed_end == \
+                datetime.datetime(2013, 4, 18, 16, 0, tzinfo=pytz.utc)
+
+            # reset the computed dates, the cached results should be written
+            # back without running tj3
+            self.test_task1.computed_start = None
+            self.test_task1.computed_end = None
+            DBSession.commit()
+
+            tjp_sched = TaskJugglerScheduler(studio=test_studio,
+                                             use_cache=True)
+            assert tjp_sched.schedule() == 'stub tj3'
+            DBSession.commit()
+            with open(counter_path) as f:
+                assert f.read().split() == ['run']
+            assert self.test_task1.computed_start == \
+                datetime.datetime(2013, 4, 16, 9, 0, tzinfo=pytz.utc)
+            assert self.test_task1.computed_end == \
+                datetime.datetime(2013, 4, 18, 16, 0, tzinfo=pytz.utc)
+
+            # change a scheduling input, tj3 should run again
+            self.test_task1.schedule_timing = 20
+            DBSession.commit()
+            tjp_sched.schedule()
+            with open(counter_path) as f:
+                assert f.read().split() == ['run', 'run']
+        finally:
+            defaults['tj_command'] = tj_command
+            TaskJugglerScheduler.clear_results_cache()
+            os.remove(stub_path)
+            if os.path.exists(counter_path):
+                os.remove(counter_path)
+
+    @pytest.mark.skipif(os.name == 'nt', reason='needs a posix shell')
+    def test_schedule_does_not_use_cache_if_use_cache_is_False(self):
+        """testing if the schedule() method runs tj3 every time if use_cache
+        is False
+        """
+        import tempfile
+        from stalker import defaults, Studio
+        from stalker.db.session import DBSession
+
+        test_studio = Studio(
+            name='Test Studio',
+            now=datetime.datetime(2013, 4, 16, 0, 0, tzinfo=pytz.utc)
+        )
+        test_studio.start = \
+            datetime.datetime(2013, 4, 16, 0, 0, tzinfo=pytz.utc)
+        test_studio.end = \
+            datetime.datetime(2013, 4, 30, 0, 0, tzinfo=pytz.utc)
+        DBSession.add(test_studio)
+        DBSession.commit()
+
+        counter_path = tempfile.mktemp()
+        stub_path = self.create_csv_writing_stub_tj3(counter_path)
+        tj_command = defaults['tj_command']
+        defaults['tj_command'] = stub_path
+        try:
+            tjp_sched = TaskJugglerScheduler(studio=test_studio)
+            tjp_sched.schedule()
+            tjp_sched.schedule()
+            with open(counter_path) as f:
+                assert f.read().split() == ['run', 'run']
+        finally:
+            defaults['tj_command'] = tj_command
+            os.remove(stub_path)
+            if os.path.exists(counter_path):
+                os.remove(counter_path)
+
+    @pytest.mark.skipif(os.name == 'nt', reason='needs a posix shell')
+    def test_schedule_fills_the_report(self):
+        """testing if the schedule() method fills the report attribute with
+        the stage timings, the row counts, the tjp size and the tj3 peak
+        memory
+        """
+        import tempfile
+        from stalker import defaults, Studio
+        from stalker.db.session import DBSession
+
+        test_studio = Studio(
+            name='Test Studio',
+            now=datetime.datetime(2013, 4, 16, 0, 0, tzinfo=pytz.utc)
+        )
+        test_studio.start = \
+            datetime.datetime(2013, 4, 16, 0, 0, tzinfo=pytz.utc)
+        test_studio.end = \
+            datetime.datetime(2013, 4, 30, 0, 0, tzinfo=pytz.utc)
+        DBSession.add(test_studio)
+        DBSession.commit()
+
+        counter_path = tempfile.mktemp()
+        stub_path = self.create_csv_writing_stub_tj3(counter_path)
+        tj_command = defaults['tj_command']
+        defaults['tj_command'] = stub_path
+        try:
+            tjp_sched = TaskJugglerScheduler(studio=test_studio)
+            tjp_sched.schedule()
+        finally:
+            defaults['tj_command'] = tj_command
+            os.remove(stub_path)
+            if os.path.exists(counter_path):
+                os.remove(counter_path)
+
+        report = tjp_sched.report
+        assert report['scheduler'] == 'TaskJugglerScheduler'
+        assert sorted(report['stages']) == ['export', 'parse', 'tj3', 'write']
+        assert report['total'] >= sum(report['stages'].values())
+        assert report['projects'] == 1
+        assert report['exported_rows'] == 2
+        assert report['tjp_bytes'] > 0
+        assert report['tj3_runs'] == 1
+        if hasattr(os, 'wait4'):
+            assert report['tj3_peak_memory_kb'] > 0
+        # the stub only returns test_task1
+        assert report['rows_updated']['tasks'] == 1
+        assert report['rows_updated']['projects'] == 1
+
+        import json
+        assert json.loads(json.dumps(report)) == report
+
+    @pytest.mark.skipif(os.name == 'nt', reason='needs a posix shell')
+    def test_simulate_returns_the_results_without_writing_to_the_database(
+            self):
+        """testing if the simulate() method returns the results of tj3
+        without changing the database
+        """
+        import tempfile
+        from stalker import defaults, Studio
+        from stalker.db.session import DBSession
+
+        test_studio = Studio(
+            name='Test Studio',
+            now=datetime.datetime(2013, 4, 16, 0, 0, tzinfo=pytz.utc)
+        )
+        test_studio.start = \
+            datetime.datetime(2013, 4, 16, 0, 0, tzinfo=pytz.utc)
+        test_studio.end = \
+            datetime.datetime(2013, 4, 30, 0, 0, tzinfo=pytz.utc)
+        DBSession.add(test_studio)
+        DBSession.commit()
+
+        counter_path = tempfile.mktemp()
+        stub_path = self.create_csv_writing_stub_tj3(counter_path)
+        tj_command = defaults['tj_command']
+        defaults['tj_command'] = stub_path
+        try:
+            tjp_sched = TaskJugglerScheduler(studio=test_studio)
+            results = tjp_sched.simulate()
+        finally:
+            defaults['tj_command'] = tj_command
+            os.remove(stub_path)
+            if os.path.exists(counter_path):
+                os.remove(counter_path)
+
+        assert results == {
+            self.test_proj1.id: (
+                datetime.datetime(2013, 4, 16, 9, 0, tzinfo=pytz.utc),
+                datetime.datetime(2013, 4, 18, 16, 0, tzinfo=pytz.utc),
+                None
+            ),
+            self.test_task1.id: (
+                datetime.datetime(2013, 4, 16, 9, 0, tzinfo=pytz.utc),
+                datetime.datetime(2013, 4, 18, 16, 0, tzinfo=pytz.utc),
+                None
+            ),
+        }
+
+        DBSession.expire_all()
+        assert self.test_task1.computed_start is None
+        assert self.test_proj1.computed_start is None
+
+    def test_results_cache_is_limited_by_tj_results_cache_size(self):
+        """testing if the results cache doesn't hold more results than the
+        defaults.tj_results_cache_size and removes the least recently used
+        results first
+        """
+        from stalker import defaults
+        cache_size = defaults['tj_results_cache_size']
+        defaults['tj_results_cache_size'] = 2
+        TaskJugglerScheduler.clear_results_cache()
+        try:
+            TaskJugglerScheduler._cache_results('a', ({}, {}, 'a'))
+            TaskJugglerScheduler._cache_results('b', ({}, {}, 'b'))
+            # use a, so b becomes the least recently used one
+            assert TaskJugglerScheduler._get_cached_results('a') == \
+                ({}, {}, 'a')
+            TaskJugglerScheduler._cache_results('c', ({}, {}, 'c'))
+
+            assert TaskJugglerScheduler._get_cached_results('b') is None
+            assert TaskJugglerScheduler._get_cached_results('a') is not None
+            assert TaskJugglerScheduler._get_cached_results('c') is not None
+        finally:
+            defaults['tj_results_cache_size'] = cache_size
+            TaskJugglerScheduler.clear_results_cache()
+
+    def create_test_studio(self):
+        """creates a studio for the tests
+        """
+        from stalker import Studio
+        from stalker.db.session import DBSession
+        test_studio = Studio(
+            name='Test Studio',
+            now=datetime.datetime(2013, 4, 16, 0, 0, tzinfo=pytz.utc)
+        )
+        test_studio.start = \
+            datetime.datetime(2013, 4, 16, 0, 0, tzinfo=pytz.utc)
+        test_studio.end = \
+            datetime.datetime(2013, 4, 30, 0, 0, tzinfo=pytz.utc)
+        test_studio.daily_working_hours = 9
+        DBSession.add(test_studio)
+        return test_studio
+
+    def schedule_with_failing_stage(self, return_code, stage_error=None):
+        """schedules with a stub tj3 returning the given return code and
+        creating an empty csv file, and with a failing _read_csv_file if
+        stage_error is given, returns the raised error and the paths of the
+        tjp and csv files
+        """
+        tjp_sched = TaskJugglerScheduler()
+        tjp_sched.studio = self.create_test_studio()
+        paths = []
+
+        def run_tj3(tjp_file_full_path, temp_file_path):
+            csv_file_full_path = tjp_file_full_path[:-4] + '.csv'
+            with open(csv_file_full_path, 'w'):
+                pass
+            paths.extend([tjp_file_full_path, csv_file_full_path])
+            return return_code, 'tj3 error'
+
+        def read_csv_file(csv_file_full_path):
+            raise stage_error
+
+        tjp_sched._run_tj3 = run_tj3
+        if stage_error is not None:
+            tjp_sched._read_csv_file = read_csv_file
+
+        with pytest.raises(Exception) as cm:
+            tjp_sched.schedule()
+
+        return cm.value, paths
+
+    def test_schedule_removes_the_temp_files_if_tj3_fails(self):
+        """testing if the tjp and csv files are removed when tj3 fails
+        """
+        error, paths = self.schedule_with_failing_stage(1)
+        assert isinstance(error, RuntimeError)
+        assert str(error) == 'tj3 error'
+        assert len(paths) == 2
+        for path in paths:
+            assert not os.path.exists(path)
+
+    def test_schedule_removes_the_temp_files_if_a_stage_fails(self):
+        """testing if the tjp and csv files are removed when reading the csv
+        file fails
+        """
+        error, paths = self.schedule_with_failing_stage(
+            0, ValueError('can not read the csv file')
+        )
+        assert isinstance(error, ValueError)
+        assert len(paths) == 2
+        for path in paths:
+            assert not os.path.exists(path)
+
     def test_tasks_are_correctly_scheduled(self):
         """testing if the tasks are correctly scheduled
         """
@@ -790,3 +1581,165 @@ taskreport breakdown "{{csv_path}}"{
         # print tjp_content
         tjp_sched._clean_up()
         assert tjp_content == expected_tjp_content
+
+
+def test_tjp_file_content_is_correct_with_sqlite3(setup_sqlite3):
+    """testing if the tjp file content is correctly created with SQLite3
+    """
+    from stalker import db
+    db.setup()
+    db.init()
+
+    from stalker.db.session import DBSession
+    assert str(DBSession.connection().engine.url) == 'sqlite://'
+
+    from stalker import Project, Repository, Task, TimeLog, User
+    user1 = User(
+        login='user1',
+        name='User1',
+        email='user1@users.com',
+        password='1234'
+    )
+    user2 = User(
+        login='user2',
+        name='User2',
+        email='user2@users.com',
+        password='1234'
+    )
+    repo = Repository(name='Test Repository', code='TR')
+    proj1 = Project(name='Test Project 1', code='TP1', repository=repo)
+    proj2 = Project(name='Test Project 2', code='TP2', repository=repo)
+    task1 = Task(
+        name='Task1',
+        project=proj1,
+        resources=[user1],
+        alternative_resources=[user2],
+        schedule_timing=10,
+        schedule_unit='h',
+        priority=800
+    )
+    parent_task = Task(name='Parent Task', project=proj2)
+    task2 = Task(
+        name='Task2',
+        parent=parent_task,
+        resources=[user2],
+        depends=[task1],
+        schedule_timing=4,
+        schedule_unit='h',
+    )
+    DBSession.add_all([user1, user2, repo, proj1, proj2, task1, parent_task,
+                       task2])
+    DBSession.commit()
+
+    tlog = TimeLog(
+        task=task1,
+        resource=user1,
+        start=datetime.datetime(2013, 4, 16, 6, 0, tzinfo=pytz.utc),
+        end=datetime.datetime(2013, 4, 16, 9, 0, tzinfo=pytz.utc)
+    )
+    DBSession.add(tlog)
+    DBSession.commit()
+
+    tjp_sched = TaskJugglerScheduler(projects=[proj1, proj2])
+    tjp_sched._create_tjp_file()
+    tjp_sched._create_tjp_file_content()
+    tjp_content = tjp_sched.tjp_content
+    tjp_sched._clean_up()
+
+    expected_tasks = """# tasks
+task Project_%(p1)s "Project_%(p1)s" {
+  task Task_%(t1)s "Task_%(t1)s" {
+    priority 800
+    effort 10.0h
+    allocate User_%(u1)s { alternative User_%(u2)s select minallocated persistent }
+    booking User_%(u1)s 2013-04-16-06:00:00 - 2013-04-16-09:00:00 { overtime 2 }
+  }
+}
+task Project_%(p2)s "Project_%(p2)s" {
+  task Task_%(parent)s "Task_%(parent)s" {
+    task Task_%(t2)s "Task_%(t2)s" {
+      depends Project_%(p1)s.Task_%(t1)s {onend}
+      effort 4.0h
+      allocate User_%(u2)s
+    }
+  }
+}
+""" % {
+        'p1': proj1.id,
+        'p2': proj2.id,
+        't1': task1.id,
+        't2': task2.id,
+        'parent': parent_task.id,
+        'u1': user1.id,
+        'u2': user2.id,
+    }
+    assert expected_tasks in tjp_content
+
+
+def create_stub_tj3(script):
+    """creates an executable shell script to be used instead of tj3 and
+    returns its path
+    """
+    import stat
+    import tempfile
+    fd, path = tempfile.mkstemp(suffix='.sh')
+    with os.fdopen(fd, 'w') as f:
+        f.write('#!/bin/sh\n%s\n' % script)
+    os.chmod(path, stat.S_IRWXU)
+    return path
+
+
+@pytest.mark.skipif(os.name == 'nt', reason='needs a posix shell')
+def test_run_tj3_collects_stderr_lines_to_the_job():
+    """testing if the _run_tj3() method collects the stderr lines of tj3 to
+    the ScheduleJob while tj3 is running
+    """
+    from stalker import defaults, ScheduleJob
+    stub_path = create_stub_tj3(
+        'echo "Reading file" 1>&2\necho "Scheduling" 1>&2\nexit 0'
+    )
+    tj_command = defaults['tj_command']
+    defaults['tj_command'] = stub_path
+    try:
+        tjp_sched = TaskJugglerScheduler()
+        tjp_sched.job = ScheduleJob()
+        return_code, stderr = tjp_sched._run_tj3('some.tjp', '/tmp')
+    finally:
+        defaults['tj_command'] = tj_command
+        os.remove(stub_path)
+
+    assert return_code == 0
+    assert stderr == 'Reading file\nScheduling'
+    assert tjp_sched.job.stderr_lines == ['Reading file', 'Scheduling']
+
+
+@pytest.mark.skipif(os.name == 'nt', reason='needs a posix shell')
+def test_cancelling_the_job_terminates_tj3():
+    """testing if cancelling the ScheduleJob terminates the running tj3
+    process
+    """
+    import time
+    from stalker import defaults, ScheduleJob
+    stub_path = create_stub_tj3('echo "Scheduling" 1>&2\nexec sleep 30')
+    tj_command = defaults['tj_command']
+    defaults['tj_command'] = stub_path
+    try:
+        tjp_sched = TaskJugglerScheduler()
+        job = ScheduleJob()
+        tjp_sched.job = job
+        start = time.time()
+        job.start(lambda: tjp_sched._run_tj3('some.tjp', '/tmp'))
+
+        # wait tj3 to start
+        while not job.stderr_lines and time.time() - start < 10:
+            time.sleep(0.01)
+
+        assert job.cancel() is True
+        return_code, stderr = job.result(timeout=10)
+    finally:
+        defaults['tj_command'] = tj_command
+        os.remove(stub_path)
+
+    assert time.time() - start < 10
+    assert return_code != 0
+    assert stderr == 'Scheduling'
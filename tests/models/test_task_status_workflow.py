@@ -333,6 +333,90 @@ class TaskStatusWorkflowTestCase(unittest.TestCase):
 
         assert expected_result == visited_tasks
 
+    def test_batch_status_updates_updates_the_statuses_at_the_end(self):
+        """testing if the Task.batch_status_updates() context manager updates
+        the statuses when the block exits
+        """
+        from stalker import Task
+        self.test_task8.status = self.status_cmpl
+        self.test_task9.status = self.status_cmpl
+        old_status = self.test_task2.status
+        assert old_status != self.status_cmpl
+
+        with Task.batch_status_updates() as batch:
+            self.test_task9.update_parent_statuses()
+            self.test_task8.update_parent_statuses()
+            assert len(batch) == 2
+            assert self.test_asset1.status != self.status_cmpl
+            assert self.test_task2.status == old_status
+
+        assert self.test_asset1.status == self.status_cmpl
+        assert self.test_task7.status == self.status_cmpl
+        assert self.test_task2.status == self.status_cmpl
+
+    def test_batch_status_updates_updates_every_task_once(self):
+        """testing if the Task.batch_status_updates() context manager updates
+        the status of every task only once
+        """
+        from stalker import Task
+        calls = []
+        update_status = self.test_task2.update_status_with_children_statuses
+
+        def counting_update_status():
+            calls.append(1)
+            return update_status()
+
+        self.test_task2.update_status_with_children_statuses = \
+            counting_update_status
+
+        with Task.batch_status_updates():
+            for task in [self.test_task9, self.test_asset1, self.test_task7,
+                         self.test_task8]:
+                task.update_status_with_dependent_statuses()
+                task.update_parent_statuses()
+
+        assert len(calls) == 1
+
+    def test_batch_status_updates_sorts_the_tasks_topologically(self):
+        """testing if the StatusBatch updates the dependencies and the children
+        of a task before the task itself
+        """
+        from stalker.models.task import StatusBatch
+        self.test_task9.depends = [self.test_task6]
+        self.test_task6.depends = [self.test_task4, self.test_task5]
+        sorted_tasks = StatusBatch.sort_tasks([
+            self.test_task2, self.test_task9, self.test_task7,
+            self.test_task6, self.test_asset1, self.test_task4
+        ])
+        index = dict((id(task), i) for i, task in enumerate(sorted_tasks))
+        for before, after in [(self.test_task4, self.test_task6),
+                              (self.test_task6, self.test_task9),
+                              (self.test_task9, self.test_asset1),
+                              (self.test_asset1, self.test_task7),
+                              (self.test_task7, self.test_task2)]:
+            assert index[id(before)] < index[id(after)]
+
+    def test_batch_status_updates_discards_the_updates_on_error(self):
+        """testing if the Task.batch_status_updates() context manager
+        discards the collected updates when an error is raised in the block
+        """
+        from stalker import Task
+        self.test_task8.status = self.status_cmpl
+        self.test_task9.status = self.status_cmpl
+        old_status = self.test_task2.status
+
+        with pytest.raises(RuntimeError):
+            with Task.batch_status_updates():
+                self.test_task9.update_parent_statuses()
+                self.test_task8.update_parent_statuses()
+                raise RuntimeError('an error')
+
+        assert self.test_task2.status == old_status
+
+        # and the updates are not batched anymore
+        self.test_task9.update_parent_statuses()
+        assert self.test_asset1.status == self.status_cmpl
+
     # The following tests will test the status changes in dependency changes
 
     # Leaf Tasks - dependency relation changes
@@ -1143,3 +1143,198 @@ class TimeLogDBTester(UnitTestDBBase):
             datetime.datetime(2014, 3, 16, 10, 0, tzinfo=pytz.utc)
         )
 
+
+    def test_create_in_bulk_creates_the_time_logs(self):
+        """testing if the TimeLog.create_in_bulk() method creates the
+        TimeLogs and returns their ids
+        """
+        from stalker.db.session import DBSession
+        assert self.test_task2.status == self.status_rts
+        rows = [
+            (self.test_task1, self.test_resource1,
+             datetime.datetime(2013, 4, 1, 10, 0, tzinfo=pytz.utc),
+             datetime.datetime(2013, 4, 1, 12, 0, tzinfo=pytz.utc)),
+            (self.test_task2, self.test_resource1,
+             datetime.datetime(2013, 4, 1, 12, 0, tzinfo=pytz.utc),
+             datetime.datetime(2013, 4, 1, 13, 0, tzinfo=pytz.utc)),
+            (self.test_task2, self.test_resource2,
+             datetime.datetime(2013, 3, 22, 1, 0, tzinfo=pytz.utc),
+             datetime.datetime(2013, 3, 22, 5, 0, tzinfo=pytz.utc)),
+        ]
+        ids = TimeLog.create_in_bulk(rows, created_by=self.test_resource2)
+        DBSession.commit()
+
+        assert len(ids) == 3
+        time_logs = [TimeLog.query.get(id_) for id_ in ids]
+        for time_log, (task, resource, start, end) in zip(time_logs, rows):
+            assert time_log.task == task
+            assert time_log.resource == resource
+            assert time_log.start == start
+            assert time_log.end == end
+            assert time_log.duration == end - start
+            assert time_log.created_by == self.test_resource2
+            assert time_log.name.startswith('TimeLog_')
+
+        assert sorted(self.test_task2.time_logs, key=lambda x: x.id) == \
+            time_logs[1:]
+        assert len(self.test_resource1.time_logs) == 3
+        assert self.test_task2.total_logged_seconds == 5 * 3600
+        assert self.test_task2.status == self.status_wip
+
+    def test_create_in_bulk_updates_the_parents_and_the_project(self):
+        """testing if the TimeLog.create_in_bulk() method updates the
+        total_logged_seconds of the parent tasks and the statistics of the
+        project
+        """
+        from stalker import Project, Task
+        from stalker.db.session import DBSession
+        parent = Task(
+            name='Parent Task',
+            project=self.test_project,
+        )
+        self.test_task2.parent = parent
+        DBSession.add(parent)
+        DBSession.commit()
+        assert parent.total_logged_seconds == 0
+        self.test_project.update_statistics()
+        logged_seconds = self.test_project.total_logged_seconds
+
+        TimeLog.create_in_bulk([
+            (self.test_task2, self.test_resource2,
+             datetime.datetime(2013, 3, 22, 1, 0, tzinfo=pytz.utc),
+             datetime.datetime(2013, 3, 22, 5, 0, tzinfo=pytz.utc)),
+            (self.test_task2, self.test_resource2,
+             datetime.datetime(2013, 3, 23, 1, 0, tzinfo=pytz.utc),
+             datetime.datetime(2013, 3, 23, 2, 0, tzinfo=pytz.utc)),
+        ])
+        assert parent.total_logged_seconds == 5 * 3600
+        assert parent.status == self.status_wip
+
+        projects_table = Project.__table__
+        stored_logged_seconds = DBSession.connection().execute(
+            projects_table.select()
+            .where(projects_table.c.id == self.test_project.id)
+        ).fetchone()['total_logged_seconds']
+        assert stored_logged_seconds == logged_seconds + 5 * 3600
+
+        DBSession.commit()
+        assert parent.total_logged_seconds == 5 * 3600
+
+    def test_create_in_bulk_runs_a_fixed_number_of_queries(self):
+        """testing if the number of queries run by the TimeLog.create_in_bulk()
+        method doesn't depend on the number of the rows
+        """
+        from sqlalchemy import event
+        from stalker.db.session import DBSession
+        start = datetime.datetime(2013, 5, 1, 0, 0, tzinfo=pytz.utc)
+        hour = datetime.timedelta(hours=1)
+        rows = []
+        for i in range(50):
+            rows.append((self.test_task1, self.test_resource1,
+                         start + i * hour, start + (i + 1) * hour))
+            rows.append((self.test_task1, self.test_resource2,
+                         start + i * hour, start + (i + 1) * hour))
+
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        engine = DBSession.connection().engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            ids = TimeLog.create_in_bulk(rows)
+        finally:
+            event.remove(engine, 'before_cursor_execute',
+                         before_cursor_execute)
+
+        assert len(ids) == 100
+        assert len(statements) < 20
+        DBSession.commit()
+        assert TimeLog.query.count() == 101
+
+    def test_create_in_bulk_raises_OverBookedError_for_existing_time_logs(
+            self):
+        """testing if the TimeLog.create_in_bulk() method raises an
+        OverBookedError when one of the rows overlaps with an existing TimeLog
+        and creates nothing
+        """
+        from stalker.exceptions import OverBookedError
+        with pytest.raises(OverBookedError) as cm:
+            TimeLog.create_in_bulk([
+                (self.test_task2, self.test_resource2,
+                 datetime.datetime(2013, 3, 22, 1, 0, tzinfo=pytz.utc),
+                 datetime.datetime(2013, 3, 22, 5, 0, tzinfo=pytz.utc)),
+                (self.test_task2, self.test_resource1,
+                 datetime.datetime(2013, 3, 21, 1, 0, tzinfo=pytz.utc),
+                 datetime.datetime(2013, 4, 5, 5, 0, tzinfo=pytz.utc)),
+            ])
+
+        assert str(cm.value) == \
+            'The resource has another TimeLog between %s and %s' % (
+                self.test_time_log.start, self.test_time_log.end
+            )
+        assert TimeLog.query.count() == 1
+        assert self.test_task2.status == self.status_rts
+
+    def test_create_in_bulk_raises_OverBookedError_for_overlapping_rows(self):
+        """testing if the TimeLog.create_in_bulk() method raises an
+        OverBookedError when the rows overlap with each other
+        """
+        from stalker.exceptions import OverBookedError
+        with pytest.raises(OverBookedError) as cm:
+            TimeLog.create_in_bulk([
+                (self.test_task2, self.test_resource2,
+                 datetime.datetime(2013, 3, 22, 1, 0, tzinfo=pytz.utc),
+                 datetime.datetime(2013, 3, 22, 5, 0, tzinfo=pytz.utc)),
+                (self.test_task2, self.test_resource2,
+                 datetime.datetime(2013, 3, 22, 4, 0, tzinfo=pytz.utc),
+                 datetime.datetime(2013, 3, 22, 6, 0, tzinfo=pytz.utc)),
+            ])
+
+        assert str(cm.value) == \
+            'The resource has another TimeLog between %s and %s' % (
+                datetime.datetime(2013, 3, 22, 1, 0, tzinfo=pytz.utc),
+                datetime.datetime(2013, 3, 22, 5, 0, tzinfo=pytz.utc)
+            )
+        assert TimeLog.query.count() == 1
+
+    def test_create_in_bulk_checks_the_task_statuses(self):
+        """testing if the TimeLog.create_in_bulk() method raises a
+        StatusError for the tasks that can not have TimeLogs
+        """
+        from stalker.exceptions import StatusError
+        self.test_task2.status = self.status_cmpl
+        with pytest.raises(StatusError) as cm:
+            TimeLog.create_in_bulk([
+                (self.test_task2, self.test_resource2,
+                 datetime.datetime(2013, 3, 22, 1, 0, tzinfo=pytz.utc),
+                 datetime.datetime(2013, 3, 22, 5, 0, tzinfo=pytz.utc)),
+            ])
+
+        assert str(cm.value) == \
+            'test task 2 is a CMPL task, and it is not allowed to create ' \
+            'TimeLogs for a CMPL task, please supply a RTS, WIP, HREV or ' \
+            'DREV task!'
+
+    def test_create_in_bulk_checks_the_values(self):
+        """testing if the TimeLog.create_in_bulk() method raises a TypeError
+        for wrong values
+        """
+        start = datetime.datetime(2013, 3, 22, 1, 0, tzinfo=pytz.utc)
+        end = datetime.datetime(2013, 3, 22, 5, 0, tzinfo=pytz.utc)
+        for row, message in [
+            (('not a task', self.test_resource1, start, end),
+             'TimeLog.task should be an instance of '
+             'stalker.models.task.Task not str'),
+            ((self.test_task1, None, start, end),
+             'TimeLog.resource can not be None'),
+            ((self.test_task1, 'not a user', start, end),
+             'TimeLog.resource should be a stalker.models.auth.User '
+             'instance not str'),
+            ((self.test_task1, self.test_resource1, start, 'not a date'),
+             'TimeLog.end should be a datetime.datetime instance not str'),
+        ]:
+            with pytest.raises(TypeError) as cm:
+                TimeLog.create_in_bulk([row])
+            assert str(cm.value) == message
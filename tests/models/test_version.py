@@ -1606,6 +1606,44 @@ class VersionDBTester(UnitTestDBBase):
 
         assert expected_result == visited_versions
 
+    def test_walk_inputs_with_prefetch_runs_one_query(self):
+        """testing if the walk_inputs() method loads all the inputs with one
+        query when prefetch is True
+        """
+        from sqlalchemy import event
+        from stalker import Version
+        from stalker.db.session import DBSession
+        v1 = Version(task=self.test_task1)
+        v2 = Version(task=self.test_task1)
+        v3 = Version(task=self.test_task1)
+        v4 = Version(task=self.test_task1)
+        v5 = Version(task=self.test_task1)
+        v5.inputs = [v4]
+        v4.inputs = [v2, v3]
+        v3.inputs = [v1]
+        v2.inputs = [v1]
+        DBSession.add_all([v1, v2, v3, v4, v5])
+        DBSession.commit()
+
+        expected = [v.id for v in [v5, v4, v2, v1, v3, v1]]
+        v5_id = v5.id
+        DBSession.expunge_all()
+        v5 = Version.query.get(v5_id)
+
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        engine = DBSession.connection().engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            assert [v.id for v in v5.walk_inputs(prefetch=True)] == expected
+            assert len(statements) == 1
+        finally:
+            event.remove(engine, 'before_cursor_execute',
+                         before_cursor_execute)
+
     # def test_path_attribute_value_is_calculated_on_init(self):
     #     """testing if the path attribute value is automatically calculated on
     #     Version instance initialize